@@ -0,0 +1,67 @@
+"""
+Dashboard-style polling of machine diagnoses with and without memoization.
+
+Each poll diagnoses every machine; between polls a small fraction of machines
+report a new reading.
+
+    python -m benchmarks.bench_diagnostics --machines 10000 --polls 20 --changed 0.01
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.synthetic import generate_factory
+from benchmarks.timing import summarize
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.diagnostics import DiagnosticCache, diagnose_machines
+from factory_agents_v2.predictor import get_predictor
+
+
+def poll(db, machine_ids, polls: int, changed: float, cache) -> dict:
+    rng = random.Random(0)
+    predictor = get_predictor()
+    samples = []
+    scored_before = predictor.prediction_count
+    for n in range(polls):
+        updates = []
+        for machine_id in rng.sample(machine_ids, int(len(machine_ids) * changed)):
+            reading = db.get_machine_details(machine_id)
+            reading["temperature"] = round(reading["temperature"] + rng.uniform(-1, 1), 1)
+            reading["timestamp"] = f"poll-{n}"
+            updates.append(reading)
+        db.load_records(machine_details=updates)
+
+        start = time.perf_counter()
+        if cache is None:
+            # A fresh cache per poll is equivalent to no memoization.
+            diagnose_machines(machine_ids, db=db, cache=DiagnosticCache(len(machine_ids)))
+        else:
+            diagnose_machines(machine_ids, db=db, cache=cache)
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    result["readings_scored"] = predictor.prediction_count - scored_before
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--machines", type=int, default=10000)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of machines with a new reading per poll.")
+    args = parser.parse_args()
+
+    dataset = generate_factory(args.machines, 100, 10)
+    db = MockDB()
+    db.load_records(**dataset)
+    machine_ids = [m["id"] for m in dataset["machines"]]
+
+    results = {
+        "uncached": poll(db, machine_ids, args.polls, args.changed, None),
+        "memoized": poll(db, machine_ids, args.polls, args.changed, DiagnosticCache(args.machines)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
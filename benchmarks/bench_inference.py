@@ -0,0 +1,114 @@
+"""
+Load test of the prediction path under many concurrent sessions.
+
+Runs `--sessions` coroutines on one event loop, as `adk web` serves concurrent
+sessions, each sending `--requests` single-machine predictions (with
+explanations, as the tools ask for) after a random think time. A probe
+coroutine sleeps 1 ms at a time and records how late it wakes up: the event
+loop lag every other session's I/O would see. Modes:
+
+- `sync`: the old path, `predict_batch` called directly on the event loop;
+- `inline`: requests coalesced into micro-batches, still scored on the loop;
+- `thread` / `process`: coalesced and scored on an executor, for each
+  `--workers` count.
+
+Reports throughput, request latency percentiles, the loop lag and the mean
+batch size. Process workers are started before the clock starts.
+
+    python -m benchmarks.bench_inference --sessions 100 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks.synthetic import generate_factory
+from benchmarks.timing import percentile, summarize
+from factory_agents_v2.inference import InferenceService
+from factory_agents_v2.predictor import MaintenancePredictor
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def load_test(predict, readings, sessions: int, requests: int, think: float, seed: int = 0):
+    rng = random.Random(seed)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+
+    async def session(offset: int):
+        for i in range(requests):
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+            reading = readings[(offset * requests + i) % len(readings)]
+            start = time.perf_counter()
+            await predict(reading)
+            latencies.append(time.perf_counter() - start)
+
+    probe = asyncio.create_task(probe_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(session(s) for s in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    result = summarize(latencies)
+    result["predictions_per_sec"] = len(latencies) / elapsed
+    result["loop_lag_p50_ms"] = percentile(lags, 50) * 1000
+    result["loop_lag_p99_ms"] = percentile(lags, 99) * 1000
+    return result
+
+
+def run_mode(mode: str, workers: int, predictor: MaintenancePredictor, readings, args) -> dict:
+    if mode == "sync":
+        async def predict(reading):
+            return predictor.predict_batch([reading], explain=True)
+
+        return asyncio.run(load_test(predict, readings, args.sessions, args.requests, args.think_ms / 1000))
+
+    service = InferenceService(predictor, executor=mode, workers=workers,
+                               max_batch_delay=args.batch_delay_ms / 1000)
+    service.start()
+
+    async def predict(reading):
+        return await service.predict([reading], explain=True)
+
+    try:
+        result = asyncio.run(load_test(predict, readings, args.sessions, args.requests, args.think_ms / 1000))
+    finally:
+        service.shutdown()
+    result["mean_batch_size"] = service.stats()["mean_batch_size"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50, help="Predictions per session.")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="Mean pause between a session's requests.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=["sync", "inline", "thread", "process"],
+                        default=["sync", "inline", "thread", "process"])
+    parser.add_argument("--batch-delay-ms", type=float, default=2.0)
+    parser.add_argument("--model-format", choices=["auto", "lean", "sklearn"], default="auto")
+    args = parser.parse_args()
+
+    readings = generate_factory(5000, 10, 10)["machine_details"]
+    predictor = MaintenancePredictor(model_format=args.model_format)
+    predictor.predict_batch(readings[:1], explain=True)
+
+    results = {"cpus": os.cpu_count(), "backend": predictor.backend, "sessions": args.sessions,
+               "requests": args.sessions * args.requests}
+    for mode in args.modes:
+        for workers in (args.workers if mode in ("thread", "process") else [1]):
+            name = mode if mode in ("sync", "inline") else f"{mode}_{workers}"
+            results[name] = run_mode(mode, workers, predictor, readings, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+End-to-end latency of repeated agent runs with and without the LLM response cache.
+
+Runs the InventoryAndResourceAgent against the local fake LLM endpoint several
+times with the same ticket; with the cache on, only the first run reaches the
+endpoint.
+
+    python -m benchmarks.bench_llm_cache --runs 20 --delay 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.timing import summarize
+
+TICKET = {"machine_id": "TURBINE-C-01", "issue_description": "Blade imbalance",
+          "required_skills": ["Turbine"]}
+
+
+async def run_agent_once(runner, ticket) -> float:
+    from google.genai import types
+
+    session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    message = types.Content(role="user", parts=[types.Part(text=json.dumps(ticket))])
+    start = time.perf_counter()
+    async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        pass
+    return time.perf_counter() - start
+
+
+async def run(runs: int, cache) -> dict:
+    from google.adk.runners import InMemoryRunner
+    from factory_agents_v2.inventory_and_resource_agent import create_inventory_and_resource_agent
+    from factory_agents_v2 import llm
+
+    llm.set_response_cache(cache)
+    runner = InMemoryRunner(create_inventory_and_resource_agent())
+    return summarize([await run_agent_once(runner, TICKET) for _ in range(runs)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2, help="Fake model latency in seconds.")
+    args = parser.parse_args()
+
+    with FakeLLMServer(delay=args.delay) as server:
+        os.environ["LITELLM_URL"] = server.url
+        from factory_agents_v2.llm import MemoryResponseCache, llm_stats
+
+        results = {}
+        for label, cache in (("uncached", None), ("cached", MemoryResponseCache())):
+            before = server.requests
+            results[label] = asyncio.run(run(args.runs, cache))
+            results[label]["llm_requests"] = server.requests - before
+        results["llm_stats"] = llm_stats()["total"]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
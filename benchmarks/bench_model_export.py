@@ -0,0 +1,70 @@
+"""
+Lean NumPy artifact versus the scikit-learn model.
+
+Cold start (importing the package, loading the model and a first prediction) and peak RSS are measured in a
+fresh interpreter per backend; single-reading and batch latency in this one.
+
+    python -m benchmarks.bench_model_export --iterations 2000 --batch-size 512
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.synthetic import generate_factory
+from benchmarks.timing import measure
+from factory_agents_v2.predictor import MaintenancePredictor
+
+COLD_START = """
+import json, resource, sys, time
+start = time.perf_counter()
+from factory_agents_v2.predictor import MaintenancePredictor
+predictor = MaintenancePredictor(model_format=sys.argv[1])
+predictor.predict({"temperature": 75.0, "vibration": 2.0, "pressure": 300.0})
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "model_load_seconds": predictor.load_seconds,
+    "backend": predictor.backend,
+    "sklearn_imported": "sklearn" in sys.modules,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def cold_start(model_format: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", COLD_START, model_format],
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(samples, key=lambda s: s["seconds"])
+    return dict(best, seconds=round(best["seconds"], 4), model_load_seconds=round(best["model_load_seconds"], 4))
+
+
+def latency(model_format: str, readings, iterations: int, batch_size: int) -> dict:
+    predictor = MaintenancePredictor(model_format=model_format)
+    predictor.predict(readings[0])
+    batch = readings[:batch_size]
+    return {
+        "predict_single": measure(lambda i: predictor.predict(readings[i % len(readings)]), iterations),
+        "predict_batch": measure(lambda i: predictor.predict_batch(batch), max(1, iterations // 20)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--cold-runs", type=int, default=3, help="Fresh interpreters per backend; the fastest is kept.")
+    args = parser.parse_args()
+
+    readings = generate_factory(args.batch_size, 10, 10)["machine_details"]
+    results = {}
+    for model_format in ("lean", "sklearn"):
+        results[model_format] = {"cold_start": cold_start(model_format, args.cold_runs),
+                                 **latency(model_format, readings, args.iterations, args.batch_size)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Prompt-size of the tool payloads in one end-to-end diagnostic run.
+
+Compares the original full `indent=2` dumps with the compact, projected tool
+payloads on a large synthetic catalog.
+
+    python -m benchmarks.bench_payloads --parts 10000 --technicians 500
+"""
+import argparse
+import json
+
+from benchmarks.synthetic import generate_factory
+from factory_agents_v2.MockDB import MockDB, reset_db, set_db
+from factory_agents_v2.payloads import estimate_tokens, payload_stats, reset_payload_stats
+from factory_agents_v2 import agent, inventory_and_resource_agent as inventory_tools, maintenance_agent as maintenance_tools
+
+
+def measure_payloads(payloads):
+    return {
+        "bytes": sum(len(p.encode("utf-8")) for p in payloads),
+        "tokens": sum(estimate_tokens(p) for p in payloads),
+    }
+
+
+def original_run(db, machine_id, issue, skills):
+    """The tool outputs the original agents produced for one diagnostic."""
+    return [
+        json.dumps(db.get_machine_details(machine_id), indent=2),
+        json.dumps(db.get_machine_info(machine_id)),
+        json.dumps(db.get_inventory(), indent=2),
+        json.dumps(db.get_technicians(), indent=2),
+        json.dumps(db.get_machine_info(machine_id), indent=2),
+    ]
+
+
+def compact_llm_run(machine_id, issue, skills):
+    """Tool outputs when the InventoryAndResourceAgent matches with the ranked lookup tools."""
+    return [
+        maintenance_tools.fetch_machine_readings(machine_id),
+        agent.get_machine_info(machine_id),
+        inventory_tools.find_parts(issue, skills[0]),
+        inventory_tools.find_available_technicians(skills),
+    ]
+
+
+def resolver_run(machine_id, issue, skills):
+    """Tool outputs when the deterministic resolver handles logistics."""
+    return [
+        maintenance_tools.fetch_machine_readings(machine_id),
+        agent.get_machine_info(machine_id),
+        inventory_tools.resolve_maintenance_logistics(machine_id, issue, skills),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--machines", type=int, default=1000)
+    parser.add_argument("--parts", type=int, default=10000)
+    parser.add_argument("--technicians", type=int, default=500)
+    args = parser.parse_args()
+
+    db = MockDB()
+    db.load_records(**generate_factory(args.machines, args.parts, args.technicians))
+    set_db(db)
+    reset_payload_stats()
+    ticket = ("MOTOR-B-02", "High vibration of 8.7 mm/s", ["Motor"])
+    try:
+        results = {
+            "original": measure_payloads(original_run(db, *ticket)),
+            "compact_llm_matching": measure_payloads(compact_llm_run(*ticket)),
+            "deterministic_resolver": measure_payloads(resolver_run(*ticket)),
+        }
+    finally:
+        reset_db()
+    for name in ("compact_llm_matching", "deterministic_resolver"):
+        results[name]["token_reduction"] = round(1 - results[name]["tokens"] / results["original"]["tokens"], 4)
+    results["per_tool"] = payload_stats()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
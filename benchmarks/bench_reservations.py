@@ -0,0 +1,144 @@
+"""
+Thousands of maintenance tickets resolved in parallel against one store.
+
+Every ticket runs the deterministic resolver on a thread pool. Without
+reservations the tickets are handed the same technicians and last units of
+stock; with them, the script checks afterwards that no part went below zero,
+that every held unit is accounted for and that no technician holds two
+assignments, and exits with status 1 if any check fails. Also reports the
+latency, the outcomes and how often a record lock was contended (in-memory
+store).
+
+    python -m benchmarks.bench_reservations --tickets 5000 --threads 32 --backend both
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import KEYWORDS, generate_factory
+from benchmarks.timing import summarize
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.resource_resolver import resolve_maintenance_request
+
+
+def make_tickets(dataset, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    machines = dataset["machines"]
+    tickets = []
+    for _ in range(n):
+        machine = rng.choice(machines)
+        issue = " and ".join(rng.sample(KEYWORDS, 2))
+        tickets.append((machine["id"], issue, [machine["type"]]))
+    return tickets
+
+
+def run(db, tickets, threads: int, reserve: bool):
+    samples, reports = [None] * len(tickets), [None] * len(tickets)
+    # All threads start together to maximise contention on the scarce records.
+    barrier = threading.Barrier(threads)
+
+    def worker(offset: int):
+        barrier.wait()
+        for i in range(offset, len(tickets), threads):
+            start = time.perf_counter()
+            reports[i] = resolve_maintenance_request(*tickets[i], db=db, reserve=reserve)
+            samples[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    result = summarize(samples)
+    result["tickets_per_sec"] = len(tickets) / elapsed
+    result["outcomes"] = dict(collections.Counter(r.get("reason", r["status"]) for r in reports))
+    return result, reports
+
+
+def duplicate_assignments(reports) -> int:
+    """Successful tickets that were given a technician another ticket already got."""
+    technicians = collections.Counter(r["technician_id"] for r in reports if r["status"] == "success")
+    return sum(count - 1 for count in technicians.values())
+
+
+def check_invariants(db, initial_stock, reports) -> dict:
+    held_units = collections.Counter(r["part_id"] for r in reports if r["status"] == "success")
+    stock = {part["id"]: part["quantity"] for part in db.get_inventory()}
+    negative = [part_id for part_id, quantity in stock.items() if quantity < 0]
+    unaccounted = [part_id for part_id, quantity in initial_stock.items()
+                   if quantity - stock[part_id] != held_units.get(part_id, 0)]
+    technicians = {tech["id"]: tech for tech in db.get_technicians()}
+    misassigned = [r["technician_id"] for r in reports if r["status"] == "success"
+                   and technicians[r["technician_id"]]["current_assignment"] != r.get("machine_id")]
+    return {"negative_stock": len(negative), "unaccounted_parts": len(unaccounted),
+            "duplicate_technicians": duplicate_assignments(reports), "misassigned_technicians": len(misassigned)}
+
+
+def bench_backend(make_db, dataset, tickets, threads: int) -> dict:
+    results = {}
+    db = make_db()
+    baseline, reports = run(db, tickets, threads, reserve=False)
+    baseline["duplicate_technicians"] = duplicate_assignments(reports)
+    results["without_reservations"] = baseline
+
+    db = make_db()
+    initial_stock = {part["id"]: part["quantity"] for part in dataset["inventory"]}
+    reserved, reports = run(db, tickets, threads, reserve=True)
+    for ticket, report in zip(tickets, reports):
+        report["machine_id"] = ticket[0]
+    reserved["violations"] = check_invariants(db, initial_stock, reports)
+    if isinstance(db, MockDB):
+        reserved["lock_contention"] = db.lock_contention
+    results["with_reservations"] = reserved
+
+    start = time.perf_counter()
+    released = db.expire_holds(time.time() + 3600)
+    results["expire_all_holds"] = {"released": released, "seconds": time.perf_counter() - start,
+                                   "technicians_available_after": len(db.get_technicians(available_only=True))}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--parts", type=int, default=2000)
+    parser.add_argument("--technicians", type=int, default=1000)
+    parser.add_argument("--backend", choices=["memory", "sqlite", "both"], default="both")
+    args = parser.parse_args()
+
+    dataset = generate_factory(1000, args.parts, args.technicians)
+    tickets = make_tickets(dataset, args.tickets)
+
+    def memory_db():
+        db = MockDB()
+        db.load_records(**dataset)
+        return db
+
+    def sqlite_db():
+        from factory_agents_v2.sqlite_store import SQLiteStore
+
+        db = SQLiteStore(os.path.join(tempfile.mkdtemp(), "factory.db"))
+        db.load_records(**dataset)
+        return db
+
+    results = {}
+    if args.backend in ("memory", "both"):
+        results["memory"] = bench_backend(memory_db, dataset, tickets, args.threads)
+    if args.backend in ("sqlite", "both"):
+        results["sqlite"] = bench_backend(sqlite_db, dataset, tickets, args.threads)
+    print(json.dumps(results, indent=2))
+
+    if any(any(backend["with_reservations"]["violations"].values()) for backend in results.values()):
+        print("Reservations were oversubscribed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
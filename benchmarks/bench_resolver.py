@@ -0,0 +1,65 @@
+"""
+Latency of the deterministic resolver versus the InventoryAndResourceAgent LLM path.
+
+    python -m benchmarks.bench_resolver              # resolver only
+    python -m benchmarks.bench_resolver --llm 5      # also 5 agent runs (needs LITELLM_URL)
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.synthetic import generate_factory
+from benchmarks.timing import measure, summarize
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.resource_resolver import resolve_maintenance_request
+
+TICKETS = [
+    ("MOTOR-B-02", "High vibration of 8.7 mm/s", ["Motor"]),
+    ("GEARBOX-F-03", "Grinding noise and high vibration of 8.1 mm/s", ["Gearbox"]),
+    ("COMPRESSOR-D-04", "Overheating at 85.4 C", ["Compressor"]),
+    ("TURBINE-C-01", "Blade imbalance", ["Turbine"]),
+]
+
+
+async def run_agent_once(ticket) -> float:
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+    from factory_agents_v2.inventory_and_resource_agent import create_inventory_and_resource_agent
+
+    runner = InMemoryRunner(create_inventory_and_resource_agent())
+    session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    machine_id, issue, skills = ticket
+    message = types.Content(role="user", parts=[types.Part(text=json.dumps(
+        {"machine_id": machine_id, "issue_description": issue, "required_skills": skills}))])
+    start = time.perf_counter()
+    async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--parts", type=int, default=100000)
+    parser.add_argument("--llm", type=int, default=0, help="Number of LLM agent runs to time.")
+    args = parser.parse_args()
+
+    sample = MockDB()
+    results = {"resolver_sample_data": measure(
+        lambda i: resolve_maintenance_request(*TICKETS[i % len(TICKETS)], db=sample), args.iterations)}
+
+    large = MockDB()
+    large.load_records(**generate_factory(10000, args.parts, 500))
+    results[f"resolver_{args.parts}_parts"] = measure(
+        lambda i: resolve_maintenance_request(*TICKETS[i % len(TICKETS)], db=large), args.iterations // 10)
+
+    if args.llm:
+        samples = [asyncio.run(run_agent_once(TICKETS[i % len(TICKETS)])) for i in range(args.llm)]
+        results["llm_agent"] = summarize(samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
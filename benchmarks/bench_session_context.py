@@ -0,0 +1,110 @@
+"""
+Per-turn cost over a long orchestrator session, with and without context compaction.
+
+Runs a shift-long session: one ADK session in which the orchestrator (with the
+scripted offline model from `benchmarks.fake_llm`) diagnoses a machine after
+another, alternating healthy and unhealthy ones, 200 times by default. The
+model waits `--seconds-per-1k-tokens` per thousand prompt tokens, like a real
+model's prefill, so the per-diagnostic latency includes the cost of the
+context it is sent. Three modes are compared: the full history
+(`SESSION_COMPACTION=off`), compacted prompts over the stock session service
+(as under `adk web`), and compacted prompts over `CompactingSessionService`.
+For each the script reports the prompt tokens of the largest model turn and
+the latency of the diagnostics at the start, middle and end of the session;
+`growth` is the ratio of the last window to the middle one, after the
+summaries have filled up. The full-history mode takes several minutes at 200
+diagnostics; `--modes` selects fewer.
+
+    python -m benchmarks.bench_session_context --diagnostics 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.fake_llm import ScriptedLlm, orchestrator_script
+from benchmarks.synthetic import generate_factory
+from factory_agents_v2.MockDB import MockDB, set_db
+from factory_agents_v2.predictor import get_predictor
+from factory_agents_v2.session_context import ContextCompactor, set_compactor
+
+MODES = ("full_history", "compacted_prompt", "compacted_session")
+
+
+async def run_session(runner, model, machine_ids, n: int):
+    from google.genai import types
+
+    session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    latencies, prompt_tokens = [], []
+    for i in range(n):
+        message = types.Content(role="user", parts=[types.Part(text=f"Run diagnostics on {machine_ids[i % len(machine_ids)]}")])
+        first = len(model.prompt_tokens)
+        start = time.perf_counter()
+        async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            pass
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens.append(max(model.prompt_tokens[first:]))
+    return latencies, prompt_tokens
+
+
+def windows(values, size: int):
+    """Mean of the first, middle and last `size` values."""
+    middle = (len(values) - size) // 2
+    return [statistics.fmean(values[:size]), statistics.fmean(values[middle:middle + size]),
+            statistics.fmean(values[-size:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--diagnostics", type=int, default=200)
+    parser.add_argument("--seconds-per-1k-tokens", type=float, default=0.01)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    from google.adk.artifacts import InMemoryArtifactService
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from factory_agents_v2.agent import root_agent
+    from factory_agents_v2.notifications import EmailDispatcher, set_dispatcher
+    from factory_agents_v2.session_service import CompactingSessionService
+
+    dataset = generate_factory(500, 2000, 200)
+    db = MockDB()
+    db.load_records(**dataset)
+    set_db(db)
+    # Alerts are held in the digest window for the whole run, so nothing is sent.
+    set_dispatcher(EmailDispatcher(host="127.0.0.1", port=9, digest_window=3600.0))
+
+    machine_ids = db.get_machine_ids()
+    predictions = get_predictor().predict_batch([db.get_machine_details(m) for m in machine_ids])
+    unhealthy = [m for m, p in zip(machine_ids, predictions) if p["maintenance_required"]]
+    healthy = [m for m, p in zip(machine_ids, predictions) if not p["maintenance_required"]]
+    session_machines = [m for pair in zip(healthy, unhealthy) for m in pair]
+
+    model = ScriptedLlm(script=orchestrator_script, seconds_per_1k_tokens=args.seconds_per_1k_tokens)
+    root_agent.model = model
+
+    results = {}
+    for mode in args.modes:
+        set_compactor(ContextCompactor(enabled=mode != "full_history"))
+        service = CompactingSessionService() if mode == "compacted_session" else InMemorySessionService()
+        runner = Runner(app_name="factory", agent=root_agent, session_service=service,
+                        artifact_service=InMemoryArtifactService())
+        latencies, prompt_tokens = asyncio.run(run_session(runner, model, session_machines, args.diagnostics))
+        latency = windows(latencies, args.window)
+        tokens = windows(prompt_tokens, args.window)
+        results[mode] = {
+            "latency_ms": {"start": round(latency[0] * 1000, 2), "middle": round(latency[1] * 1000, 2),
+                           "end": round(latency[2] * 1000, 2), "growth": round(latency[2] / latency[1], 2)},
+            "max_prompt_tokens": {"start": round(tokens[0]), "middle": round(tokens[1]), "end": round(tokens[2]),
+                                  "growth": round(tokens[2] / tokens[1], 2)},
+            "total_seconds": round(sum(latencies), 2),
+        }
+    set_compactor(None)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
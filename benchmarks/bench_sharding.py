@@ -0,0 +1,150 @@
+"""
+Lookup and matching latency as plants are added: one store versus a store sharded by plant.
+
+For each plant count, every plant gets its own synthetic factory (machines,
+parts, technicians). `single` loads all of them into one `MockDB`, as before
+sharding; `sharded` registers each plant with a `ShardedStore` that loads it on
+first use. Both are timed on the same workload, spread over all plants:
+
+- `machine_lookup`: `get_machine_details` of a random machine;
+- `resolve`: `resolve_maintenance_request` for a random machine, its type as
+  the skill and one of a few issue descriptions;
+- `schedule`: `schedule_tickets` for a batch of tickets from random plants.
+
+The sharded store also reports how long a plant takes to load on first use,
+how many plants a workload touching only a few of them loads, and how often a
+query had to fall back to another plant. `cross_plant` is the share of
+resolved tickets whose technician is from another plant than the machine.
+
+    python -m benchmarks.bench_sharding --plants 1 10 25 50
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.synthetic import generate_factory
+from benchmarks.timing import measure
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.resource_resolver import resolve_maintenance_request
+from factory_agents_v2.scheduler import schedule_tickets
+from factory_agents_v2.sharding import ShardedStore
+
+ISSUES = ["High vibration and grinding noise", "Overheating and high temperature", "Seal leaking, fluid loss",
+          "Clogged filter, pressure drop"]
+
+
+def plant_datasets(n_plants: int, machines: int, parts: int, technicians: int):
+    return {f"P{p:02d}": generate_factory(machines, parts, technicians, seed=p, machine_prefix=f"P{p:02d}-")
+            for p in range(n_plants)}
+
+
+def build_single(datasets) -> MockDB:
+    # One dataset: part and technician IDs need the plant to stay unique.
+    tables = {"machines": [], "machine_details": [], "inventory": [], "human_resources": []}
+    for plant, dataset in datasets.items():
+        tables["machines"].extend(dataset["machines"])
+        tables["machine_details"].extend(dataset["machine_details"])
+        tables["inventory"].extend(dict(part, id=f"{plant}:{part['id']}") for part in dataset["inventory"])
+        tables["human_resources"].extend(dict(tech, id=f"{plant}:{tech['id']}") for tech in dataset["human_resources"])
+    db = MockDB()
+    db.load_records(**tables)
+    return db
+
+
+def build_sharded(datasets) -> ShardedStore:
+    store = ShardedStore()
+    for plant, dataset in datasets.items():
+        store.add_plant(plant, loader=lambda shard, dataset=dataset: shard.load_records(**dataset),
+                        machine_ids=[machine["id"] for machine in dataset["machines"]])
+    return store
+
+
+def cross_plant_share(reports, machine_ids) -> float:
+    resolved = [(report, machine_id) for report, machine_id in zip(reports, machine_ids)
+                if report["status"] == "success"]
+    if not resolved:
+        return 0.0
+    # Machine IDs start with their plant; technicians of another plant carry theirs.
+    foreign = sum(1 for report, machine_id in resolved
+                  if report["technician_id"].split(":")[0] not in (machine_id.split("-")[0], report["technician_id"]))
+    return foreign / len(resolved)
+
+
+def run(db, machines, args, rng):
+    """Times the workload on one store; machines are (machine_id, machine_type) pairs."""
+    lookups = [rng.choice(machines)[0] for _ in range(args.iterations)]
+    tickets = [(rng.choice(machines), rng.choice(ISSUES)) for _ in range(args.iterations)]
+    result = {
+        "machine_lookup": measure(lambda i: db.get_machine_details(lookups[i % len(lookups)]), args.iterations),
+        "resolve": measure(lambda i: resolve_maintenance_request(
+            tickets[i][0][0], tickets[i][1], [tickets[i][0][1]], db=db), args.iterations, warmup=0),
+    }
+    reports = [resolve_maintenance_request(machine_id, issue, [machine_type], db=db)
+               for (machine_id, machine_type), issue in tickets]
+    result["cross_plant"] = round(cross_plant_share(reports, [machine_id for (machine_id, _), _ in tickets]), 3)
+
+    batches = []
+    for _ in range(args.schedule_runs):
+        batch = [{"machine_id": machine_id, "issue_description": rng.choice(ISSUES), "required_skills": [machine_type],
+                  "failure_probability": rng.random()} for machine_id, machine_type in rng.sample(machines, args.batch)]
+        start = time.perf_counter()
+        schedule_tickets(batch, db=db)
+        batches.append(time.perf_counter() - start)
+    result["schedule_batch_ms"] = round(statistics.median(batches) * 1000, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plants", type=int, nargs="+", default=[1, 10, 25, 50])
+    parser.add_argument("--machines", type=int, default=500, help="Machines per plant.")
+    parser.add_argument("--parts", type=int, default=2000, help="Parts per plant.")
+    parser.add_argument("--technicians", type=int, default=100, help="Technicians per plant.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100, help="Tickets per scheduled batch.")
+    parser.add_argument("--schedule-runs", type=int, default=5)
+    parser.add_argument("--touched-plants", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=["single", "sharded"], default=["single", "sharded"])
+    args = parser.parse_args()
+
+    results = {}
+    for n_plants in args.plants:
+        datasets = plant_datasets(n_plants, args.machines, args.parts, args.technicians)
+        machines = [(machine["id"], machine["type"]) for dataset in datasets.values()
+                    for machine in dataset["machines"]]
+        entry = results[f"{n_plants}_plants"] = {}
+
+        if "single" in args.modes:
+            start = time.perf_counter()
+            single = build_single(datasets)
+            entry["single"] = {"build_seconds": round(time.perf_counter() - start, 3)}
+            entry["single"].update(run(single, machines, args, random.Random(0)))
+            del single
+
+        if "sharded" in args.modes:
+            start = time.perf_counter()
+            sharded = build_sharded(datasets)
+            stats = {"build_seconds": round(time.perf_counter() - start, 3)}
+            # A workload confined to a few plants loads only those.
+            for plant in list(datasets)[:args.touched_plants]:
+                sharded.get_machine_details(datasets[plant]["machines"][0]["id"])
+            stats["loaded_after_touching"] = {"touched": min(args.touched_plants, n_plants),
+                                              "loaded": len(sharded.loaded_plants()), "plants": n_plants}
+            # First use of every other plant, i.e. its load and index build.
+            loads = []
+            for plant, dataset in datasets.items():
+                if plant not in sharded.loaded_plants():
+                    start = time.perf_counter()
+                    sharded.get_machine_details(dataset["machines"][0]["id"])
+                    loads.append(time.perf_counter() - start)
+            stats["plant_load_ms"] = round(statistics.median(loads) * 1000, 2) if loads else None
+            stats.update(run(sharded, machines, args, random.Random(0)))
+            stats["fallbacks"] = sharded.fallbacks
+            entry["sharded"] = stats
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start cost of the package, each step in a fresh interpreter.
+
+- import_package: `import factory_agents_v2`, what `adk web` pays before serving;
+- import_tool: importing one tool function;
+- first_prediction: importing a tool and running one prediction;
+- root_agent: building the orchestrator and its sub-agents (ADK and LiteLLM imports).
+
+Also lists which heavy dependencies each step imported. With `--budget` the
+script exits with status 1 if importing the package takes longer, so CI can
+keep startup from regressing:
+
+    python -m benchmarks.bench_startup --runs 5 --budget 1.0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["google.adk", "litellm", "sklearn", "pandas", "joblib", "numpy"]
+
+STEPS = {
+    "import_package": "import factory_agents_v2",
+    "import_tool": "from factory_agents_v2.maintenance_agent import predict_maintenance",
+    "first_prediction": ("import asyncio\n"
+                         "from factory_agents_v2.maintenance_agent import predict_maintenance\n"
+                         "asyncio.run(predict_maintenance({'temperature': 75.0, 'vibration': 2.0, 'pressure': 300.0}))"),
+    "root_agent": "from factory_agents_v2.agent import root_agent",
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "imported": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def run_step(code: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", PROBE, code] + HEAVY_MODULES,
+                             capture_output=True, text=True, check=True, env=_env()).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    seconds = sorted(sample["seconds"] for sample in samples)
+    return {"min_seconds": round(seconds[0], 4), "median_seconds": round(seconds[len(seconds) // 2], 4),
+            "imported": samples[-1]["imported"]}
+
+
+def _env() -> dict:
+    # Measure the lazy path; a warm-up thread would import everything in the background.
+    return dict(os.environ, FACTORY_WARMUP="0")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per step.")
+    parser.add_argument("--steps", nargs="*", choices=list(STEPS), default=list(STEPS))
+    parser.add_argument("--budget", type=float, help="Fail if the median package import exceeds this many seconds.")
+    args = parser.parse_args()
+
+    results = {name: run_step(STEPS[name], args.runs) for name in args.steps}
+    print(json.dumps(results, indent=2))
+    if args.budget is not None:
+        measured = results.get("import_package") or run_step(STEPS["import_package"], args.runs)
+        if measured["median_seconds"] > args.budget:
+            print(f"import_package took {measured['median_seconds']}s, over the {args.budget}s budget")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
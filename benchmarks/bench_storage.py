@@ -0,0 +1,64 @@
+"""
+Lookup latency of the storage backends at scale.
+
+    python -m benchmarks.bench_storage --machines 10000 --parts 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_factory, MACHINE_TYPES
+from benchmarks.timing import measure
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.sqlite_store import SQLiteStore
+
+ISSUES = [
+    "High vibration of 8.7 mm/s and grinding noise",
+    "Overheating with a pressure drop",
+    "Seal leaking, fluid loss observed",
+    "Servo joint fault, axis not moving",
+]
+
+
+def bench_store(store, dataset, iterations: int):
+    machine_ids = [m["id"] for m in dataset["machines"]]
+    return {
+        "get_machine_info": measure(lambda i: store.get_machine_info(machine_ids[i * 7919 % len(machine_ids)]), iterations),
+        "get_machine_details": measure(lambda i: store.get_machine_details(machine_ids[i * 7919 % len(machine_ids)]), iterations),
+        "find_parts": measure(lambda i: store.find_parts(ISSUES[i % len(ISSUES)], MACHINE_TYPES[i % len(MACHINE_TYPES)]), iterations),
+        "find_available_technicians": measure(lambda i: store.find_available_technicians([MACHINE_TYPES[i % len(MACHINE_TYPES)]]), iterations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--machines", type=int, default=10000)
+    parser.add_argument("--parts", type=int, default=100000)
+    parser.add_argument("--technicians", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    dataset = generate_factory(args.machines, args.parts, args.technicians)
+    results = {}
+
+    start = time.perf_counter()
+    memory = MockDB()
+    memory.load_records(**dataset)
+    results["memory"] = {"load_seconds": time.perf_counter() - start,
+                         **bench_store(memory, dataset, args.iterations)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        sqlite = SQLiteStore(os.path.join(tmp, "factory.db"))
+        sqlite.load_records(**dataset)
+        results["sqlite"] = {"load_seconds": time.perf_counter() - start,
+                             **bench_store(sqlite, dataset, args.iterations)}
+        sqlite.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Throughput and latency of the streaming scorer on one core.
+
+    python -m benchmarks.bench_streaming --readings 100000
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.synthetic import generate_factory
+from factory_agents_v2.predictor import get_predictor
+from factory_agents_v2.sensor_history import SensorHistory
+from factory_agents_v2.streaming import StreamingScorer, iterate_readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=100000)
+    parser.add_argument("--machines", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+
+    details = generate_factory(args.machines, 0, 0)["machine_details"]
+    readings = [details[i % len(details)] for i in range(args.readings)]
+    get_predictor().model  # Load outside the measured run.
+
+    # An hour of history per machine, in memory, so the run leaves no files behind.
+    scorer = StreamingScorer(batch_size=args.batch_size, history=SensorHistory(capacity=60))
+    metrics = asyncio.run(scorer.run(iterate_readings(readings)))
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Offline stand-ins for the LLM.
+
+`ScriptedLlm` is an in-process ADK model that replays a deterministic script of
+tool calls, so whole agent runs can be timed without any network; assign it to
+an agent's `model`. `FakeLLMServer` is a local OpenAI-compatible endpoint that
+exercises the real LiteLLM client path instead.
+
+`FakeLLMServer` serves `POST .../chat/completions` on 127.0.0.1 with a canned
+or scripted reply after an optional delay, and counts the requests it receives:
+
+    python -m benchmarks.fake_llm --port 8899 --delay 0.5
+    LITELLM_URL=http://127.0.0.1:8899/v1 adk web
+"""
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from factory_agents_v2.payloads import estimate_tokens
+
+DEFAULT_REPLY = '{"status": "success"}'
+
+# A script step: ("call", tool_name, args) or ("text", reply).
+Step = Tuple[Any, ...]
+
+
+# --- In-process scripted model ---
+
+def _tool_result(response: Dict[str, Any]) -> Any:
+    result = response.get("result", response)
+    if isinstance(result, str):
+        try:
+            return json.loads(result)
+        except ValueError:
+            pass
+    return result
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Deterministic model that answers with scripted tool calls instead of an LLM.
+
+    `script(user_text, results)` is called for every model turn with the latest
+    user message and the tool results received since it (tool name -> decoded
+    result), and returns the next step. The estimated prompt tokens of every
+    request are appended to `prompt_tokens`; with `seconds_per_1k_tokens` each
+    turn also waits in proportion to them, like a real model's prefill.
+    """
+
+    model: str = "scripted"
+    script: Callable[[str, Dict[str, Any]], Step]
+    calls: int = 0
+    prompt_tokens: List[int] = []
+    seconds_per_1k_tokens: float = 0.0
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        user_text, results = "", {}
+        for content in llm_request.contents:
+            for part in content.parts or []:
+                if part.function_response is not None:
+                    results[part.function_response.name] = _tool_result(part.function_response.response or {})
+                elif content.role == "user" and part.text:
+                    user_text, results = part.text, {}
+        self.calls += 1
+        tokens = estimate_tokens(json.dumps([content.model_dump(exclude_none=True, mode="json")
+                                             for content in llm_request.contents]))
+        self.prompt_tokens.append(tokens)
+        if self.seconds_per_1k_tokens:
+            await asyncio.sleep(self.seconds_per_1k_tokens * tokens / 1000)
+        step = self.script(user_text, results)
+        if step[0] == "call":
+            part = types.Part(function_call=types.FunctionCall(name=step[1], args=step[2]))
+        else:
+            part = types.Part(text=step[1])
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def orchestrator_script(user_text: str, results: Dict[str, Any]) -> Step:
+    """
+    The orchestrator's standard operating procedure for "Run diagnostics on <machine_id>".
+
+    Diagnoses the machine, and for a machine that needs maintenance looks up its
+    type, resolves logistics and sends the alert email, as the real model does
+    when following the instruction.
+    """
+    match = re.search(r"[A-Z][A-Z0-9]*(?:-[A-Z0-9]+)+", user_text)
+    machine_id = match.group(0) if match else user_text.strip()
+    diagnosis = results.get("get_machine_diagnosis")
+    if diagnosis is None:
+        return ("call", "get_machine_diagnosis", {"machine_id": machine_id})
+    if "error" in diagnosis:
+        return ("text", diagnosis["error"])
+    if not diagnosis["maintenance_required"]:
+        return ("text", f"Machine {machine_id} is healthy; no maintenance is required.")
+    if "get_machine_info" not in results:
+        return ("call", "get_machine_info", {"machine_id": machine_id})
+    logistics = results.get("resolve_maintenance_logistics")
+    if logistics is None:
+        machine_type = results["get_machine_info"].get("type")
+        return ("call", "resolve_maintenance_logistics", {
+            "machine_id": machine_id,
+            "issue_description": diagnosis["issue_description"],
+            "required_skills": [machine_type] if machine_type else [],
+        })
+    if logistics.get("status") == "success" and "send_email" not in results:
+        return ("call", "send_email", {
+            "receiver_email": "maintenance@example.com",
+            "subject": f"Maintenance scheduled for {machine_id}",
+            "body": f"{diagnosis['issue_description']}. Part {logistics['part_id']}, "
+                    f"technician {logistics['technician_name']}.",
+            "reservation_ids": logistics.get("reservation_ids", []),
+        })
+    return ("text", f"Logistics for {machine_id}: {json.dumps(logistics)}")
+
+
+# --- Local OpenAI-compatible endpoint ---
+
+class FakeLLMServer:
+    """OpenAI-compatible chat completions server running on a background thread."""
+
+    def __init__(self, port: int = 0, delay: float = 0.0,
+                 responder: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        Args:
+            port: Port to listen on; 0 picks a free one (see `url`).
+            delay: Seconds to wait before answering each request, to mimic model latency.
+            responder: Called with the decoded request body; returns the assistant
+                message (`{"content": ...}` and/or `{"tool_calls": [...]}`). Defaults to
+                a fixed text reply.
+        """
+        self.delay = delay
+        self.responder = responder or (lambda request: {"content": DEFAULT_REPLY})
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                payload = json.dumps(server.complete(body)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as `LITELLM_URL`."""
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def complete(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+        message = dict(self.responder(request), role="assistant")
+        message.setdefault("content", None)
+        # Rough token counts at ~4 bytes per token, so usage metrics have realistic values.
+        prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="FakeLLMServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeLLMServer(args.port, args.delay)
+    print(f"Fake LLM listening on {server.url}")
+    server._httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+End-to-end benchmark suite.
+
+Times the hot paths on a synthetic factory: single versus batched model
+inference, the inventory and technician tools (lookup plus JSON serialization)
+at scale, and full orchestrator runs through the ADK runner with the scripted
+offline model from `benchmarks.fake_llm`. Latency percentiles, throughput and
+the process's peak RSS after each benchmark are written to a JSON file, and
+`--compare` prints the p50 change against an earlier results file.
+
+    python -m benchmarks.suite --out benchmarks/results/after.json --compare benchmarks/results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from benchmarks.fake_llm import ScriptedLlm, orchestrator_script
+from benchmarks.synthetic import generate_factory, MACHINE_TYPES
+from benchmarks.timing import measure, summarize
+from factory_agents_v2.MockDB import MockDB, set_db
+from factory_agents_v2.predictor import get_predictor
+
+DEFAULT_OUT = os.path.join(os.path.dirname(__file__), "results", "latest.json")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_predict(dataset, iterations: int, batch_size: int) -> Dict[str, Any]:
+    predictor = get_predictor()
+    readings = dataset["machine_details"]
+    predictor.predict(readings[0])  # load the model outside the timings
+    single = measure(lambda i: predictor.predict(readings[i % len(readings)]), iterations)
+    single["readings_per_sec"] = single["ops_per_sec"]
+
+    batches = [readings[i:i + batch_size] for i in range(0, len(readings), batch_size)]
+    batch = measure(lambda i: predictor.predict_batch(batches[i % len(batches)]), max(1, iterations // 100))
+    batch["batch_size"] = batch_size
+    batch["readings_per_sec"] = batch["ops_per_sec"] * batch_size
+    explained = measure(lambda i: predictor.predict_batch(batches[i % len(batches)], explain=True),
+                        max(1, iterations // 100))
+    explained["batch_size"] = batch_size
+    explained["readings_per_sec"] = explained["ops_per_sec"] * batch_size
+    return {"predict_single": single, "predict_batch": batch, "predict_batch_explain": explained}
+
+
+def bench_tools(iterations: int) -> Dict[str, Any]:
+    from factory_agents_v2 import inventory_and_resource_agent as tools
+
+    return {
+        "get_inventory_by_type": measure(
+            lambda i: tools.get_inventory(MACHINE_TYPES[i % len(MACHINE_TYPES)], in_stock_only=True), iterations),
+        "get_technicians_available": measure(lambda i: tools.get_technicians(), iterations),
+        "find_parts": measure(
+            lambda i: tools.find_parts("High vibration and grinding noise", MACHINE_TYPES[i % len(MACHINE_TYPES)]),
+            iterations),
+    }
+
+
+async def run_orchestrator(runner, machine_ids, runs: int):
+    from google.genai import types
+
+    samples = []
+    for i in range(runs):
+        session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text=f"Run diagnostics on {machine_ids[i % len(machine_ids)]}")])
+        start = time.perf_counter()
+        async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            pass
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_orchestrator(db, runs: int) -> Dict[str, Any]:
+    from google.adk.runners import InMemoryRunner
+    from factory_agents_v2.agent import root_agent
+    from factory_agents_v2.notifications import EmailDispatcher, set_dispatcher
+
+    # Alerts are held in the digest window for the whole run, so nothing is sent.
+    set_dispatcher(EmailDispatcher(host="127.0.0.1", port=9, digest_window=3600.0))
+    model = ScriptedLlm(script=orchestrator_script)
+    # The sub-agents already belong to root_agent, so it is reused rather than rebuilt.
+    root_agent.model = model
+    runner = InMemoryRunner(root_agent)
+
+    predictions = get_predictor().predict_batch([db.get_machine_details(m) for m in db.get_machine_ids()])
+    machine_ids = db.get_machine_ids()
+    unhealthy = [m for m, p in zip(machine_ids, predictions) if p["maintenance_required"]]
+    healthy = [m for m, p in zip(machine_ids, predictions) if not p["maintenance_required"]]
+
+    results = {}
+    for label, ids in (("orchestrator_healthy", healthy), ("orchestrator_unhealthy", unhealthy)):
+        calls = model.calls
+        result = summarize(asyncio.run(run_orchestrator(runner, ids, runs)))
+        result["llm_turns_per_run"] = (model.calls - calls) / runs
+        results[label] = result
+    return results
+
+
+def compare(results: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["benchmarks"]
+    print(f"{'benchmark':32} {'base p50 ms':>12} {'p50 ms':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline or not baseline[name].get("p50_ms"):
+            continue
+        before, after = baseline[name]["p50_ms"], result["p50_ms"]
+        print(f"{name:32} {before:12.4f} {after:12.4f} {(after - before) / before:+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--machines", type=int, default=10000)
+    parser.add_argument("--parts", type=int, default=100000)
+    parser.add_argument("--technicians", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--runs", type=int, default=50, help="Orchestrator runs per scenario.")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Results file to write.")
+    parser.add_argument("--compare", help="Earlier results file to compare p50 latencies against.")
+    args = parser.parse_args()
+
+    dataset = generate_factory(args.machines, args.parts, args.technicians)
+    db = MockDB()
+    db.load_records(**dataset)
+    set_db(db)
+
+    benchmarks: Dict[str, Any] = {}
+    for run in (lambda: bench_predict(dataset, args.iterations, args.batch_size),
+                lambda: bench_tools(args.iterations),
+                lambda: bench_orchestrator(db, args.runs)):
+        for name, result in run().items():
+            result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            benchmarks[name] = result
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "benchmarks": benchmarks,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(benchmarks, indent=2))
+    if args.compare:
+        compare(benchmarks, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Synthetic Factory Generator for benchmarks.
+
+Produces machines, sensor readings, parts and technicians shaped like the
+sample data in `MockDB`, at any scale and deterministically for a given seed.
+"""
+import random
+from typing import Dict, Any, List
+
+MACHINE_TYPES = ["Pump", "Motor", "Turbine", "Compressor", "Gearbox", "HVAC", "Robot"]
+KEYWORDS = [
+    "bearing", "grinding", "vibration", "noise", "high vibration", "seal", "leaking", "leak",
+    "fluid loss", "gear", "slipping", "jammed", "broken tooth", "filter", "clogged", "overheating",
+    "temperature", "pressure drop", "blade", "fatigue", "imbalance", "air flow", "dusty", "servo",
+    "joint", "axis", "not moving", "fault", "lubricant", "oil", "grease", "friction",
+]
+# (temperature, vibration, pressure) ranges that keep a machine healthy.
+NORMAL_RANGES = {"temperature": (50.0, 80.0), "vibration": (0.5, 3.0), "pressure": (100.0, 500.0)}
+
+
+def generate_factory(n_machines: int = 1000, n_parts: int = 10000, n_technicians: int = 100,
+                     seed: int = 0, unhealthy_fraction: float = 0.1,
+                     machine_prefix: str = "") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Generates a synthetic factory dataset.
+
+    `machine_prefix` is prepended to the machine IDs, so several factories
+    (e.g. the plants of a sharded store) can have distinct machines.
+
+    Returns:
+        A dict with "machines", "machine_details", "inventory" and "human_resources"
+        lists, ready for `FactoryStore.load_records(**dataset)`.
+    """
+    rng = random.Random(seed)
+    machines, machine_details = [], []
+    for i in range(n_machines):
+        machine_type = MACHINE_TYPES[i % len(MACHINE_TYPES)]
+        machine_id = f"{machine_prefix}{machine_type.upper()}-{i:06d}"
+        machines.append({
+            "id": machine_id,
+            "name": f"{machine_type} {i}",
+            "type": machine_type,
+            "status": "operational",
+            "last_maintenance": "2025-07-15T08:00:00",
+            "next_maintenance": "2025-08-15T08:00:00",
+        })
+        unhealthy = rng.random() < unhealthy_fraction
+        machine_details.append({
+            "id": machine_id,
+            "temperature": round(rng.uniform(85.0, 110.0) if unhealthy else rng.uniform(*NORMAL_RANGES["temperature"]), 1),
+            "vibration": round(rng.uniform(6.0, 10.0) if unhealthy else rng.uniform(*NORMAL_RANGES["vibration"]), 2),
+            "pressure": round(rng.uniform(*NORMAL_RANGES["pressure"]), 1),
+            "timestamp": "2024-08-02 08:00:00",
+        })
+
+    inventory = []
+    for i in range(n_parts):
+        inventory.append({
+            "id": f"part-{i:07d}",
+            "name": f"Synthetic Part {i}",
+            "keywords": rng.sample(KEYWORDS, 4),
+            "quantity": rng.choice([0, 1, 2, 5, 10, 25]),
+            "location": f"Warehouse {chr(65 + i % 6)}, Bin {i % 50}",
+            "applicable_machine_types": rng.sample(MACHINE_TYPES, 2),
+        })
+
+    human_resources = []
+    for i in range(n_technicians):
+        is_operator = i % 5 == 4
+        human_resources.append({
+            "id": f"{'op' if is_operator else 'tech'}-{i:05d}",
+            "name": f"Technician {i}",
+            "role": "Machine Operator" if is_operator else "Maintenance Technician",
+            "skills": rng.sample(MACHINE_TYPES, 3),
+            "availability": "available" if rng.random() < 0.6 else "busy",
+            "current_assignment": None,
+        })
+
+    return {
+        "machines": machines,
+        "machine_details": machine_details,
+        "inventory": inventory,
+        "human_resources": human_resources,
+    }
@@ -0,0 +1,37 @@
+"""Latency measurement helpers shared by the benchmarks."""
+import time
+from typing import Callable, Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean latency in milliseconds and throughput for a list of durations in seconds."""
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": (total / len(samples) * 1000) if samples else 0.0,
+        "ops_per_sec": (len(samples) / total) if total else 0.0,
+    }
+
+
+def measure(fn: Callable[[int], object], iterations: int, warmup: int = 10) -> Dict[str, float]:
+    """Calls `fn(i)` for each iteration and summarizes the per-call latency."""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
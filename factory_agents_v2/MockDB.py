@@ -3,14 +3,53 @@ Mock Database for a Reactive Smart Factory System.
 
 This data is structured to support a maintenance workflow triggered by user reports.
 The connections link user-described issues to specific parts and technician skills.
+
+Lifecycle: tools share one process-wide instance obtained with `get_db()`, which
+is built on first use. `set_db()` injects a different instance (e.g. one seeded
+with other data) and `reset_db()` drops the shared instance so the next
+`get_db()` starts from fresh sample data, which keeps tests independent. Reads
+and bulk writes on an instance are serialized by its `lock`.
+
+Reservations (`reserve_part`, `assign_technician`) take a lock striped by
+record ID instead, so tickets for different parts and technicians never wait
+for each other; `lock` is only taken for the instant it takes to write the
+record and the in-stock and availability indexes, so readers never see a
+record half-updated. Held reservations sit in an expiry heap and
+are released by the next reservation call after they run out.
+
+Setting `FACTORY_DB_BACKEND=sqlite` makes `get_db()` return a `SQLiteStore` at
+`FACTORY_DB_PATH` instead, seeded with the sample data when it is empty.
+`FACTORY_DB_BACKEND=sharded` returns a `ShardedStore` with one plant per
+subdirectory of `FACTORY_PLANTS_DIR` (see `sharding.load_plants`).
 """
-from typing import Dict, Any, List
+import contextlib
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from factory_agents_v2.storage import (CONFIRMED, EXPIRED, FactoryStore, HELD, NON_ASSIGNABLE_ROLES, RELEASED,
+                                       conflict, default_hold_seconds, invalid_quantity, matching_phrases,
+                                       new_reservation_id, rank_part_matches, tokenize)
+from factory_agents_v2.telemetry import span
+
+# Number of record locks; reservations on records in different stripes run in parallel.
+LOCK_STRIPES = 64
 
-class MockDB:
+class MockDB(FactoryStore):
     """A mock database with logically connected data for factory operations."""
     
-    def __init__(self):
-        """Initialize the mock database with sample data."""
+    def __init__(self, sample_data: bool = True):
+        """Initialize the mock database with sample data, or empty if `sample_data` is False."""
+        self.lock = threading.RLock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._holds_lock = threading.Lock()
+        self.reservations: Dict[str, Dict[str, Any]] = {}
+        self._hold_expiry: List[Tuple[float, str]] = []
+        # Times a reservation had to wait for a record lock held by another thread.
+        self.lock_contention = 0
 
         self.machines = {
             "PUMP-A-01": {
@@ -235,20 +274,314 @@ class MockDB:
             }
         }
 
+        if not sample_data:
+            self.machines, self.machine_details, self.inventory, self.human_resources = {}, {}, {}, {}
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self) -> None:
+        """(Re)builds the inverted indexes used by the `find_*` query methods."""
+        with self.lock:
+            self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        # keyword phrase -> part IDs, and first word of a phrase -> phrases starting with it
+        self.parts_by_keyword: Dict[str, Set[str]] = {}
+        self._keyword_phrases: Dict[str, Set[str]] = {}
+        self.parts_by_machine_type: Dict[str, Set[str]] = {}
+        self.parts_in_stock: Set[str] = set()
+        for part_id, part in self.inventory.items():
+            part.setdefault("version", 0)
+            if part["quantity"] > 0:
+                self.parts_in_stock.add(part_id)
+            for keyword in part["keywords"]:
+                phrase = " ".join(tokenize(keyword))
+                self.parts_by_keyword.setdefault(phrase, set()).add(part_id)
+                self._keyword_phrases.setdefault(phrase.split(" ")[0], set()).add(phrase)
+            for machine_type in part["applicable_machine_types"]:
+                self.parts_by_machine_type.setdefault(machine_type.lower(), set()).add(part_id)
+
+        self.technicians_by_skill: Dict[str, Set[str]] = {}
+        self.technicians_by_availability: Dict[str, Set[str]] = {}
+        for tech_id, tech in self.human_resources.items():
+            tech.setdefault("version", 0)
+            for skill in tech["skills"]:
+                self.technicians_by_skill.setdefault(skill.lower(), set()).add(tech_id)
+            self.technicians_by_availability.setdefault(tech["availability"], set()).add(tech_id)
+
+    def get_machine_ids(self) -> List[str]:
+        """Returns the IDs of every machine."""
+        with self.lock:
+            return list(self.machines)
+
     def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
         """Get detailed data for a specific machine."""
-        if machine_id in self.machine_details:
-            return self.machine_details[machine_id]
+        with self.lock:
+            if machine_id in self.machine_details:
+                return dict(self.machine_details[machine_id])
         return {"error": f"Machine {machine_id} not found"}
 
-    def get_inventory(self) -> List[Dict[str, Any]]:
-        """Returns the entire inventory list."""
-        return list(self.inventory.values())
+    def get_inventory(self, machine_type: Optional[str] = None, in_stock_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the inventory list, optionally only parts for a machine type and/or in stock."""
+        with self.lock:
+            if not machine_type and not in_stock_only:
+                return [dict(part) for part in self.inventory.values()]
+            part_ids = (self.parts_by_machine_type.get(machine_type.lower(), set())
+                        if machine_type else set(self.inventory))
+            if in_stock_only:
+                part_ids = part_ids & self.parts_in_stock
+            return [dict(self.inventory[part_id]) for part_id in sorted(part_ids)]
 
-    def get_technicians(self) -> List[Dict[str, Any]]:
-        """Returns the entire list of technicians."""
-        return list(self.human_resources.values())
+    def get_technicians(self, available_only: bool = False, assignable_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the technician list, optionally only available ones and/or without machine operators."""
+        with self.lock:
+            if available_only:
+                technicians = [self.human_resources[tech_id]
+                               for tech_id in sorted(self.technicians_by_availability.get("available", ()))]
+            else:
+                technicians = list(self.human_resources.values())
+            return [dict(tech) for tech in technicians
+                    if not assignable_only or tech["role"] not in NON_ASSIGNABLE_ROLES]
 
     def get_machine_info(self, machine_id: str) -> Dict[str, Any]:
         """Gets basic info for a machine, like its type."""
-        return self.machines.get(machine_id, {"error": "Machine not found"})
\ No newline at end of file
+        with self.lock:
+            if machine_id in self.machines:
+                return dict(self.machines[machine_id])
+        return {"error": "Machine not found"}
+
+    def find_parts(self, issue_text: str, machine_type: Optional[str] = None,
+                   limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """
+        Finds parts whose keywords appear in the issue text, best matches first.
+
+        Only parts applicable to `machine_type` are returned when it is given, and
+        at most `limit` parts (all of them if None). Each result is a copy of the
+        part with `matched_keywords` added; parts in stock rank ahead of
+        out-of-stock parts with the same number of matches.
+        """
+        with self.lock:
+            phrases = matching_phrases(tokenize(issue_text), self._keyword_phrases)
+            applicable = self.parts_by_machine_type.get(machine_type.lower(), set()) if machine_type else None
+            hit_counts: Dict[str, int] = Counter()
+            for phrase in phrases:
+                part_ids = self.parts_by_keyword[phrase]
+                hit_counts.update(part_ids & applicable if applicable is not None else part_ids)
+
+            return [
+                dict(self.inventory[part_id],
+                     matched_keywords=[p for p in phrases if part_id in self.parts_by_keyword[p]])
+                for part_id in rank_part_matches(hit_counts, self.parts_in_stock, limit)
+            ]
+
+    def find_available_technicians(self, skills: List[str]) -> List[Dict[str, Any]]:
+        """Finds available technicians who have every one of the given skills."""
+        with self.lock:
+            candidates = set(self.technicians_by_availability.get("available", set()))
+            for skill in skills:
+                candidates &= self.technicians_by_skill.get(skill.lower(), set())
+            return [dict(self.human_resources[tech_id]) for tech_id in sorted(candidates)]
+
+    def load_records(self, machines: Iterable[Dict[str, Any]] = (),
+                     machine_details: Iterable[Dict[str, Any]] = (),
+                     inventory: Iterable[Dict[str, Any]] = (),
+                     human_resources: Iterable[Dict[str, Any]] = ()) -> None:
+        """Bulk-inserts (or replaces, by `id`) records and rebuilds the indexes."""
+        with contextlib.ExitStack() as stack, self.lock:
+            # No reservation may be half-way through updating a record that gets replaced.
+            for stripe in self._stripes:
+                stack.enter_context(stripe)
+            for table, records in ((self.machines, machines), (self.machine_details, machine_details),
+                                   (self.inventory, inventory), (self.human_resources, human_resources)):
+                for record in records:
+                    table[record["id"]] = dict(record)
+            self._build_indexes()
+
+
+    # --- Reservations ---
+
+    @contextlib.contextmanager
+    def _record_lock(self, record_id: str):
+        stripe = self._stripes[hash(record_id) % LOCK_STRIPES]
+        if not stripe.acquire(blocking=False):
+            self.lock_contention += 1
+            stripe.acquire()
+        try:
+            yield
+        finally:
+            stripe.release()
+
+    def _hold(self, kind: str, record_id: str, quantity: int, machine_id: Optional[str],
+              hold_seconds: Optional[float], confirm: bool, version: int) -> Dict[str, Any]:
+        expires_at = None if confirm else time.time() + (default_hold_seconds() if hold_seconds is None
+                                                         else hold_seconds)
+        reservation = {"status": CONFIRMED if confirm else HELD, "reservation_id": new_reservation_id(),
+                       "kind": kind, "id": record_id, "quantity": quantity, "machine_id": machine_id,
+                       "expires_at": expires_at, "version": version}
+        with self._holds_lock:
+            self.reservations[reservation["reservation_id"]] = reservation
+            if expires_at is not None:
+                heapq.heappush(self._hold_expiry, (expires_at, reservation["reservation_id"]))
+        return dict(reservation)
+
+    def reserve_part(self, part_id: str, quantity: int = 1, machine_id: Optional[str] = None,
+                     hold_seconds: Optional[float] = None, confirm: bool = False,
+                     expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Atomically takes `quantity` of a part out of stock; see `FactoryStore.reserve_part`."""
+        invalid = invalid_quantity(quantity)
+        if invalid:
+            return invalid
+        self._expire_due()
+        with self._record_lock(part_id):
+            part = self.inventory.get(part_id)
+            if part is None:
+                return {"status": "error", "reason": f"Part {part_id} not found"}
+            if expected_version is not None and part["version"] != expected_version:
+                return conflict("Version changed", part["version"])
+            if part["quantity"] < quantity:
+                return conflict("Insufficient stock", part["version"])
+            with self.lock:
+                part["quantity"] -= quantity
+                part["version"] += 1
+                if part["quantity"] <= 0:
+                    self.parts_in_stock.discard(part_id)
+            version = part["version"]
+        return self._hold("part", part_id, quantity, machine_id, hold_seconds, confirm, version)
+
+    def assign_technician(self, technician_id: str, machine_id: str, hold_seconds: Optional[float] = None,
+                          confirm: bool = False, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Atomically marks an available technician busy; see `FactoryStore.assign_technician`."""
+        self._expire_due()
+        with self._record_lock(technician_id):
+            tech = self.human_resources.get(technician_id)
+            if tech is None:
+                return {"status": "error", "reason": f"Technician {technician_id} not found"}
+            if expected_version is not None and tech["version"] != expected_version:
+                return conflict("Version changed", tech["version"])
+            if tech["availability"] != "available" or tech["role"] in NON_ASSIGNABLE_ROLES:
+                return conflict("Technician not available", tech["version"])
+            self._set_availability(tech, "busy", machine_id)
+            version = tech["version"]
+        return self._hold("technician", technician_id, 1, machine_id, hold_seconds, confirm, version)
+
+    def _set_availability(self, tech: Dict[str, Any], availability: str, assignment: Optional[str]) -> None:
+        # Called with the technician's record lock held.
+        with self.lock:
+            self.technicians_by_availability.get(tech["availability"], set()).discard(tech["id"])
+            self.technicians_by_availability.setdefault(availability, set()).add(tech["id"])
+            tech["availability"] = availability
+            tech["current_assignment"] = assignment
+            tech["version"] += 1
+
+    def _restore(self, reservation: Dict[str, Any]) -> None:
+        record_id = reservation["id"]
+        with self._record_lock(record_id):
+            if reservation["kind"] == "part":
+                part = self.inventory.get(record_id)
+                if part is None:
+                    return
+                with self.lock:
+                    part["quantity"] += reservation["quantity"]
+                    part["version"] += 1
+                    if part["quantity"] > 0:
+                        self.parts_in_stock.add(record_id)
+            else:
+                tech = self.human_resources.get(record_id)
+                # Leave the technician alone if they were reassigned since (e.g. by a bulk load).
+                if tech is not None and tech["current_assignment"] == reservation["machine_id"]:
+                    self._set_availability(tech, "available", None)
+
+    def _finish(self, reservation_id: str, status: str, from_statuses: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        with self._holds_lock:
+            reservation = self.reservations.get(reservation_id)
+            if reservation is None or reservation["status"] not in from_statuses:
+                return None
+            reservation["status"] = status
+            if status != CONFIRMED:
+                del self.reservations[reservation_id]
+            return reservation
+
+    def confirm_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Makes a held reservation permanent."""
+        self._expire_due()
+        reservation = self._finish(reservation_id, CONFIRMED, (HELD, CONFIRMED))
+        if reservation is None:
+            return {"status": "error", "reason": f"Reservation {reservation_id} not found or expired"}
+        reservation["expires_at"] = None
+        return dict(reservation)
+
+    def release_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Cancels a reservation and returns its stock or technician."""
+        reservation = self._finish(reservation_id, RELEASED, (HELD, CONFIRMED))
+        if reservation is None:
+            return {"status": "error", "reason": f"Reservation {reservation_id} not found or already ended"}
+        self._restore(reservation)
+        return dict(reservation)
+
+    def _expire_due(self) -> None:
+        if self._hold_expiry and self._hold_expiry[0][0] <= time.time():
+            self.expire_holds()
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Releases every held reservation whose hold has run out."""
+        now = time.time() if now is None else now
+        expired = []
+        with self._holds_lock:
+            while self._hold_expiry and self._hold_expiry[0][0] <= now:
+                _, reservation_id = heapq.heappop(self._hold_expiry)
+                reservation = self.reservations.get(reservation_id)
+                # Confirmed and released reservations leave stale heap entries behind.
+                if reservation is not None and reservation["status"] == HELD:
+                    reservation["status"] = EXPIRED
+                    del self.reservations[reservation_id]
+                    expired.append(reservation)
+        for reservation in expired:
+            self._restore(reservation)
+        return len(expired)
+
+
+_db: Optional[FactoryStore] = None
+_db_lock = threading.Lock()
+
+
+def _create_db() -> FactoryStore:
+    backend = os.getenv("FACTORY_DB_BACKEND", "memory").lower()
+    if backend == "memory":
+        return MockDB()
+    if backend == "sqlite":
+        from factory_agents_v2.sqlite_store import SQLiteStore
+        from factory_agents_v2.storage import seed_sample_data
+
+        store = SQLiteStore(os.getenv("FACTORY_DB_PATH") or None)
+        if store.is_empty():
+            seed_sample_data(store)
+        return store
+    if backend == "sharded":
+        from factory_agents_v2.sharding import load_plants
+
+        return load_plants(os.getenv("FACTORY_PLANTS_DIR") or None)
+    raise ValueError(f"Unknown FACTORY_DB_BACKEND {backend!r}; expected 'memory', 'sqlite' or 'sharded'")
+
+
+def get_db() -> FactoryStore:
+    """Returns the process-wide database shared by all tools, creating it on first use."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                with span("db_init", backend=os.getenv("FACTORY_DB_BACKEND", "memory")):
+                    _db = _create_db()
+    return _db
+
+
+def set_db(db: FactoryStore) -> None:
+    """Injects the instance returned by `get_db()`."""
+    global _db
+    with _db_lock:
+        _db = db
+
+
+def reset_db() -> None:
+    """Drops the shared instance; the next `get_db()` builds a fresh one."""
+    global _db
+    with _db_lock:
+        _db = None
@@ -1 +1,13 @@
-from . import agent
\ No newline at end of file
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# Loaded once for every module of the package, before any of them reads its settings.
+load_dotenv()
+
+from . import agent
+
+# Inference worker processes import the package too; only the main process warms up.
+if os.getenv("FACTORY_WARMUP", "").lower() in ("1", "true", "yes") and multiprocessing.parent_process() is None:
+    agent.warm_up()
@@ -3,23 +3,37 @@ Orchestrator Agent for a Proactive Smart Factory System.
 
 This root agent uses a MaintenanceAgent to predict failures and an
 InventoryAndResourceAgent to organize the repair.
+
+`root_agent` (and each sub-agent) is built on first access, which is when
+`adk web` first serves the app, so importing this package or a tool function
+does not import ADK or LiteLLM. `warm_up()` builds the agents and loads the
+maintenance model ahead of time on a background thread; `FACTORY_WARMUP=1`
+starts it when the package is imported. Every agent sends the model a compacted
+session (completed diagnostics as summaries, see `session_context`), so long
+sessions do not make each request slower.
 """
-from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
-from factory_agents_v2.MockDB import MockDB
-import os
-import json
-from dotenv import load_dotenv
+import threading
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.telemetry import agent_callbacks, instrumented_tool, span
+from factory_agents_v2.session_context import context_callbacks
+from factory_agents_v2.payloads import to_json
+from factory_agents_v2.fleet import diagnose_fleet
+from factory_agents_v2.diagnostics import diagnose_machines_async
+from factory_agents_v2.notifications import get_dispatcher
+from factory_agents_v2.inference import get_inference_service
+from typing import List, Optional, TYPE_CHECKING
 
 # sub-agents
-from factory_agents_v2.maintenance_agent import maintenance_agent
-from factory_agents_v2.inventory_and_resource_agent import inventory_and_resource_agent
+from factory_agents_v2.maintenance_agent import get_maintenance_agent
+from factory_agents_v2.inventory_and_resource_agent import get_inventory_and_resource_agent, resolve_maintenance_logistics
 
-load_dotenv()
+if TYPE_CHECKING:
+    from google.adk.agents import LlmAgent
 
 # --- Tool Functions for the Orchestrator ---
 
-def send_email(receiver_email: str, subject: str, body: str) -> dict:
+@instrumented_tool
+def send_email(receiver_email: str, subject: str, body: str, reservation_ids: Optional[List[str]] = None) -> dict:
     """
     Sends an email to the provided email id
 
@@ -27,71 +41,80 @@ def send_email(receiver_email: str, subject: str, body: str) -> dict:
         receiver_email (str) : Email address of the receiver.
         subject (str): The core subject line for the alert email.
         body (str): The main content of the alert message, containing details
+        reservation_ids (list): The `reservation_ids` from the logistics report; the
+            part and technician holds are confirmed once the alert is queued.
 
     Returns:
         dict: A dictionary containing the result of the email dispatch.
-        eg: {"status":"success"} if the alert was successfully dispatched.
+        eg: {"status": "queued", "message_id": "msg-1"} once the alert is queued;
+        it is delivered in the background. `expired_reservations` lists holds that
+        ran out before they could be confirmed.
     """
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    import os
+    try:
+        message_id = get_dispatcher().enqueue(receiver_email, subject, body)
+    except Exception as e:
+        return {"status": f"Error: {e}"}
+    result = {"status": "queued", "message_id": message_id}
+    db = get_db()
+    expired = [reservation_id for reservation_id in reservation_ids or []
+               if db.confirm_reservation(reservation_id)["status"] == "error"]
+    if expired:
+        result["expired_reservations"] = expired
+    return result
+
+@instrumented_tool
+async def run_fleet_diagnostics(machine_ids: List[str]) -> str:
+    """
+    Diagnoses many machines at once and organizes logistics for every machine that needs maintenance.
 
-    sender_email = "swetha26072002@gmail.com"
-    password = "dsrnyzgfdgylpywx"
+    Args:
+        machine_ids: The machines to check. An empty list checks every machine in the plant.
 
-    receiver_email = receiver_email
+    Returns:
+        A JSON report with `healthy` machine IDs and, for each machine that needs
+        maintenance, its failure probability, inferred issue and logistics report.
+    """
+    report = await diagnose_fleet(machine_ids or None)
+    return to_json("run_fleet_diagnostics", report)
 
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = "santoshbablu3@gmail.com"
-    msg['Subject'] = subject
+@instrumented_tool
+async def get_machine_diagnosis(machine_id: str) -> str:
+    """
+    Returns the maintenance verdict for a machine's latest readings, reusing the last diagnosis if they have not changed.
 
-    msg.attach(MIMEText(body, 'plain'))
+    Args:
+        machine_id: The machine to diagnose.
 
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, password)
-        server.send_message(msg)
-        return {"status":"Email sent successfully"}
-    
-    except Exception as e:
-        return {"status":f"Error: {e}"}
-    
-    finally:
-        server.quit()
+    Returns:
+        A JSON object with the sensor `readings`, `maintenance_required` (True/False),
+        `failure_probability`, `main_factor` (the sensor that drove the verdict),
+        `contributions` and `deviations` per sensor and `issue_description` (when
+        maintenance is required), or an `error`.
+    """
+    diagnosis = await diagnose_machines_async([machine_id])
+    return to_json("get_machine_diagnosis", diagnosis[0])
 
+@instrumented_tool
 def get_machine_info(machine_id: str) -> str:
     """Gets basic info for a machine, especially its 'type' for finding the contact email."""
-    machine_info = MockDB().get_machine_info(machine_id)
-    return json.dumps(machine_info)
+    machine_info = get_db().get_machine_info(machine_id)
+    return to_json("get_machine_info", machine_info)
 
 
-def create_orchestrator_agent() -> LlmAgent:
+def create_orchestrator_agent() -> "LlmAgent":
     """Creates the root agent for orchestrating proactive maintenance."""
+    from google.adk.agents import LlmAgent
+    from factory_agents_v2.llm import create_llm_model
 
     tools = [
         send_email,
+        get_machine_diagnosis,
         get_machine_info,
+        resolve_maintenance_logistics,
+        run_fleet_diagnostics,
     ]
     
-    llm_model = LiteLlm(
-        model="gpt-4o",
-        base_url=os.getenv("LITELLM_URL"),
-        api_key="sk-1",
-        headers={
-            "appid": os.getenv("AGENT_ID"),
-            "tenantid": os.getenv("TENANT_ID"),
-            "userid": "user_123_456",
-            "sessionid": "session_123_456",
-            "teamid": "team_123_456"
-        }
-    )
+    llm_model = create_llm_model("OrchestratorAgent")
     instruction = """
     You are the Smart Factory Orchestrator, a high-level coordinator for proactive maintenance. 
     Your job is to use your sub-agents to diagnose potential machine failures and organize a response.
@@ -103,22 +126,26 @@ def create_orchestrator_agent() -> LlmAgent:
     **Your Standard Operating Procedure:**
 
     **1. Diagnose the Machine:**
-        -   When a user asks you to check a machine (e.g., "Run diagnostics on machine_id"), your first and only initial action is to invoke `MaintenanceAgent` with the provided `machine_id`.
+        -   When a user asks you to check a machine (e.g., "Run diagnostics on machine_id"), your first and only initial action is to call `get_machine_diagnosis` with the provided `machine_id`. Its verdict is authoritative for the machine's latest readings: use `maintenance_required` as the prediction and `issue_description` as the issue, and go straight to step 2.
+        -   Invoke `MaintenanceAgent` with the `machine_id` only if `get_machine_diagnosis` returns an `error`, or if the user asks about trends or recent behaviour over time.
+        -   If the user asks about several machines, a whole line or the whole plant, do not diagnose them one by one: call `run_fleet_diagnostics` once with their `machine_id`s (an empty list for the whole plant). Its report already contains the prediction and logistics for every machine, so go straight to step 4 and handle each machine that needs maintenance there.
 
     **2. Analyze the Diagnostic Report:**
-        -   The `MaintenanceAgent` will return a summary, including whether maintenance is predicted as `True` or `False`.
+        -   `get_machine_diagnosis` (or the `MaintenanceAgent` summary) tells you whether maintenance is predicted as `True` or `False`.
         -   **If the prediction is `False`:** Your job is done. Report to the user that the machine is healthy and no maintenance is required.
         -   **If the prediction is `True`:** Proceed to the next step.
 
     **3. Formulate and Delegate the Logistics Task:**
         -   You must create a clear task for your logistics agent. To do this, you need to infer the `issue_description` and `required_skills`.
-        -   **Infer Issue:** The `MaintenanceAgent`'s report will mention the sensor values that caused the prediction (e.g., "high vibration of 8.7 mm/s"). Use this as the `issue_description`.
+        -   **Infer Issue:** Use the diagnosis's `issue_description`. If you used the `MaintenanceAgent`, its report will mention the sensor values that caused the prediction (e.g., "high vibration of 8.7 mm/s"); use this as the `issue_description`.
         -   **Infer Skills:** Use your `get_machine_info` tool to find the machine's `type` (e.g., "Motor"). This `type` is the `required_skills` (e.g., `["Motor"]`).
-        -   Invoke `InventoryAndResourceAgent` with the `machine_id`, the inferred `issue_description`, and `required_skills`.
+        -   Call your `resolve_maintenance_logistics` tool with the `machine_id`, the inferred `issue_description`, and `required_skills`.
+        -   If it returns `"status": "success"` or `"status": "failure"`, use that JSON as the logistics report and go to step 4.
+        -   Only if it returns `"status": "needs_review"`, invoke `InventoryAndResourceAgent` with the same `machine_id`, `issue_description`, and `required_skills`.
 
     **4. Synthesize the Final Report and Alert:**
-        -   The `InventoryAndResourceAgent` will return a final JSON report detailing its success or failure.
-        -   **If successful (part and technician found):** You MUST send an email alert. Use your tools to find the correct contact email and call `send_email`.
+        -   The logistics report (from `resolve_maintenance_logistics` or `InventoryAndResourceAgent`) is a JSON object detailing success or failure.
+        -   **If successful (part and technician found):** You MUST send an email alert. Use your tools to find the correct contact email and call `send_email`, passing the report's `reservation_ids` so the held part and technician are confirmed.
         -   Formulate a clear, human-readable summary for the user, stating that maintenance has been scheduled, which part is needed, and which technician is assigned.
         -   **If it failed (part out of stock, etc.):** Report the reason for the failure clearly to the user.
     """
@@ -130,11 +157,53 @@ def create_orchestrator_agent() -> LlmAgent:
         model=llm_model,
         tools=tools,
         sub_agents=[
-            maintenance_agent,
-            inventory_and_resource_agent
-        ]
+            get_maintenance_agent(),
+            get_inventory_and_resource_agent()
+        ],
+        **agent_callbacks(),
+        **context_callbacks(),
     )
     
     return orchestrator_agent
 
-root_agent = create_orchestrator_agent()
\ No newline at end of file
+
+_root_agent: Optional["LlmAgent"] = None
+_root_agent_lock = threading.Lock()
+
+
+def get_root_agent() -> "LlmAgent":
+    """Returns the process-wide orchestrator, creating it (and its sub-agents) on first use."""
+    global _root_agent
+    if _root_agent is None:
+        with _root_agent_lock:
+            if _root_agent is None:
+                _root_agent = create_orchestrator_agent()
+    return _root_agent
+
+
+def warm_up(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Builds the agents and starts the inference workers (loading the maintenance model) before the first request needs them.
+
+    Args:
+        background: Run on a daemon thread and return it, so startup is not delayed;
+            a request arriving meanwhile simply waits for the same locks.
+    """
+    def run():
+        with span("warm_up"):
+            get_root_agent()
+            get_inference_service().start()
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="factory-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name: str):
+    # `adk web` reads `root_agent` from this module; it is created on first access.
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,224 @@
+"""
+Memoized Machine Diagnostics for Smart Factory Operations.
+
+A diagnosis (latest readings, model verdict and inferred issue) only changes
+when the machine reports a new reading or the model file is replaced, so it is
+cached under `(machine_id, reading version, model version)`. The reading
+version is the reading's timestamp plus its sensor values; the model version is
+the model file's name and modification time. A lookup whose versions no longer
+match replaces the machine's entry, so stale verdicts are never served, and
+dashboards polling the same machines only cost a database lookup per machine.
+A cached diagnosis is returned exactly as a fresh one would be, so the tool
+results the model sees do not change with cache hits; `DiagnosticCache.stats()`
+counts them instead.
+
+Each diagnosis carries the predictor's explanation (contributions, range
+deviations and main factor), and `rank_by_risk` orders a batch of diagnoses
+by failure probability without scoring anything again. Async callers use
+`diagnose_machines_async`, which scores on the inference service instead of
+the event loop. On a `ShardedStore` each plant has its own cache, created
+with the plant's first diagnosis.
+"""
+import collections
+import copy
+import os
+import threading
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.predictor import FEATURE_ORDER, NORMAL_RANGES, UNITS, MaintenancePredictor, get_predictor
+from factory_agents_v2.sharding import ShardedStore
+from factory_agents_v2.storage import FactoryStore
+
+
+def describe_issue(readings: Dict[str, Any]) -> str:
+    """Builds an issue description from the sensor values outside their normal range."""
+    issues = []
+    for name, (low, high) in NORMAL_RANGES.items():
+        value = readings.get(name)
+        if value is None:
+            continue
+        if value > high:
+            issues.append(f"high {name} of {value} {UNITS[name]}")
+        elif value < low:
+            issues.append(f"low {name} of {value} {UNITS[name]}")
+    if not issues:
+        return "Maintenance predicted with all sensor values within normal ranges"
+    description = ", ".join(issues)
+    return description[0].upper() + description[1:]
+
+
+def reading_version(readings: Dict[str, Any]) -> Tuple:
+    """Identifies one reading of a machine: its timestamp and sensor values."""
+    return (readings.get("timestamp"),) + tuple(readings.get(name) for name in FEATURE_ORDER)
+
+
+class DiagnosticCache:
+    """Bounded LRU cache of the latest diagnosis per machine."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, Tuple[Tuple, Dict[str, Any]]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, machine_id: str, version: Tuple) -> Optional[Dict[str, Any]]:
+        """Returns the cached diagnosis if it was made for `version`, else None."""
+        with self._lock:
+            entry = self._entries.get(machine_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                # New reading or new model: the old verdict is stale.
+                del self._entries[machine_id]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(machine_id)
+            self.hits += 1
+        # Callers may edit the nested readings or explanation; the stored entry itself is never modified.
+        return copy.deepcopy(entry[1])
+
+    def put(self, machine_id: str, version: Tuple, diagnosis: Dict[str, Any]) -> None:
+        diagnosis = copy.deepcopy(diagnosis)
+        with self._lock:
+            self._entries[machine_id] = (version, diagnosis)
+            self._entries.move_to_end(machine_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, machine_id: Optional[str] = None) -> None:
+        """Drops the diagnosis for one machine, or for every machine if None."""
+        with self._lock:
+            if machine_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(machine_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit, miss and invalidation counters and the current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "size": len(self._entries), "max_entries": self.max_entries}
+
+
+def diagnose_machines(machine_ids: List[str], db: Optional[FactoryStore] = None,
+                      predictor: Optional[MaintenancePredictor] = None,
+                      cache: Optional[DiagnosticCache] = None) -> List[Dict[str, Any]]:
+    """
+    Diagnoses machines from their latest readings, reusing cached verdicts.
+
+    Only machines whose reading or model version changed since their last
+    diagnosis are scored, all in one batched model call.
+
+    Returns:
+        A list, in input order, with one entry per machine: `machine_id`,
+        `readings` (the sensor values and `timestamp`), `maintenance_required`,
+        `failure_probability`, `threshold`, `contributions`, `deviations`,
+        `main_factor` (see `MaintenancePredictor.predict_batch`) and
+        `issue_description` (when maintenance is required), or an `error`.
+    """
+    db = db or get_db()
+    predictor = predictor or get_predictor()
+    cache_for = _cache_for(db, cache)
+    results, misses = _lookup(machine_ids, db, cache_for, predictor.model_version)
+    predictions = predictor.predict_batch([details for _, _, _, details in misses], explain=True)
+    return _store(results, misses, predictions, cache_for)
+
+
+async def diagnose_machines_async(machine_ids: List[str], db: Optional[FactoryStore] = None,
+                                  service=None, cache: Optional[DiagnosticCache] = None) -> List[Dict[str, Any]]:
+    """
+    Like `diagnose_machines`, but the machines to score are sent to the inference
+    service (`inference.get_inference_service()` by default), so the event loop
+    keeps serving other sessions meanwhile.
+    """
+    from factory_agents_v2.inference import get_inference_service
+
+    db = db or get_db()
+    service = service or get_inference_service()
+    cache_for = _cache_for(db, cache)
+    results, misses = _lookup(machine_ids, db, cache_for, service.model_version)
+    predictions = await service.predict([details for _, _, _, details in misses], explain=True)
+    return _store(results, misses, predictions, cache_for)
+
+
+def _cache_for(db: FactoryStore, cache: Optional[DiagnosticCache]) -> Callable[[str], DiagnosticCache]:
+    """Maps a machine ID to its cache: the given one, its plant's, or the process-wide one."""
+    if cache is not None:
+        return lambda machine_id: cache
+    if isinstance(db, ShardedStore):
+        return db.diagnostic_cache
+    default = get_diagnostic_cache()
+    return lambda machine_id: default
+
+
+def _lookup(machine_ids: List[str], db: FactoryStore, cache_for: Callable[[str], DiagnosticCache],
+            model_version: str):
+    """Splits the machines into cached diagnoses and (index, machine_id, version, details) still to score."""
+    results: List[Dict[str, Any]] = []
+    misses: List[Tuple[int, str, Tuple, Dict[str, Any]]] = []
+    for machine_id in machine_ids:
+        details = db.get_machine_details(machine_id)
+        if "error" in details:
+            results.append({"machine_id": machine_id, "error": details["error"]})
+            continue
+        version = (model_version,) + reading_version(details)
+        cached = cache_for(machine_id).get(machine_id, version)
+        if cached is not None:
+            results.append(cached)
+            continue
+        misses.append((len(results), machine_id, version, details))
+        results.append(None)
+    return results, misses
+
+
+def _store(results: List[Optional[Dict[str, Any]]], misses: List[Tuple[int, str, Tuple, Dict[str, Any]]],
+           predictions: List[Dict[str, Any]], cache_for: Callable[[str], DiagnosticCache]) -> List[Dict[str, Any]]:
+    for (index, machine_id, version, details), prediction in zip(misses, predictions):
+        diagnosis = {
+            "machine_id": machine_id,
+            "readings": {name: details.get(name) for name in FEATURE_ORDER + ["timestamp"]},
+        }
+        diagnosis.update(prediction)
+        if prediction["maintenance_required"]:
+            diagnosis["issue_description"] = describe_issue(details)
+        cache_for(machine_id).put(machine_id, version, diagnosis)
+        results[index] = diagnosis
+    return results
+
+
+def rank_by_risk(diagnoses: List[Dict[str, Any]], top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Orders diagnoses from the highest failure probability down; errors go last.
+
+    Ties (e.g. models without probabilities) put machines that need maintenance first.
+    """
+    ranked = sorted(diagnoses, key=lambda d: ("error" in d, -d.get("failure_probability", 0.0),
+                                              not d.get("maintenance_required", False)))
+    return ranked[:top_n] if top_n else ranked
+
+
+_cache: Optional[DiagnosticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_diagnostic_cache() -> DiagnosticCache:
+    """Returns the process-wide diagnostic cache, sized by `DIAGNOSTIC_CACHE_SIZE` (default 4096)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiagnosticCache(int(os.getenv("DIAGNOSTIC_CACHE_SIZE") or 4096))
+    return _cache
+
+
+def set_diagnostic_cache(cache: Optional[DiagnosticCache]) -> None:
+    """Replaces the process-wide diagnostic cache (None resets it to the default on next use)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,170 @@
+"""
+Fleet-wide Diagnostics for Smart Factory Operations.
+
+Scores every requested machine with one batched model call (reusing memoized
+diagnoses for machines whose readings have not changed), then organizes the
+repair for the unhealthy machines: the batch scheduler assigns parts and
+technicians to all their tickets at once, and only tickets it cannot settle are
+sent to concurrent InventoryAndResourceAgent runs, bounded by a concurrency
+limit and a per-call timeout. Wall-clock time therefore grows with the number
+of unhealthy machines, not the fleet size.
+The scheduler holds the part and technician of every ticket it settles, so
+concurrent tickets never share them; the holds carry `reservation_ids` to
+confirm and otherwise expire.
+
+Agent runs go through one process-wide runner over the InventoryAndResourceAgent
+of the orchestrator's agent tree (`get_root_agent()`), with a throwaway session
+per ticket. A run ends with the agent's report: its hand-back to the
+orchestrator is not followed, since the fleet report takes the orchestrator's
+place.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.diagnostics import diagnose_machines_async
+from factory_agents_v2.resource_resolver import NEEDS_REVIEW
+from factory_agents_v2.scheduler import schedule_tickets
+
+APP_NAME = "FleetDiagnostics"
+LOGISTICS_AGENT = "InventoryAndResourceAgent"
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Returns the process-wide runner for fleet logistics, creating it (and the agent tree) on first use."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                from google.adk.runners import InMemoryRunner
+                from factory_agents_v2.agent import get_root_agent
+
+                _runner = InMemoryRunner(get_root_agent().find_agent(LOGISTICS_AGENT), app_name=APP_NAME)
+    return _runner
+
+
+def _parse_report(text: str) -> Dict[str, Any]:
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except ValueError:
+            pass
+    return {"status": "failure", "reason": "Unparseable logistics report", "raw": text}
+
+
+class FleetDiagnostics:
+    """Runs bulk predictions and concurrent logistics for many machines."""
+
+    def __init__(self, concurrency: int = 8, timeout: float = 60.0, use_llm: bool = True):
+        """
+        Args:
+            concurrency: Most InventoryAndResourceAgent runs in flight at once.
+            timeout: Seconds allowed for each logistics call before it is reported as timed out.
+            use_llm: Send tickets the resolver cannot settle to the InventoryAndResourceAgent.
+                If False they are reported with `"status": "needs_review"`.
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.use_llm = use_llm
+
+    async def _run_agent(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        from google.genai import types
+
+        runner = get_runner()
+        user_id = "fleet"
+        session = runner.session_service.create_session(
+            app_name=APP_NAME, user_id=user_id, session_id=uuid.uuid4().hex)
+        message = types.Content(role="user", parts=[types.Part(text=json.dumps(ticket))])
+        final_text = ""
+        try:
+            events = runner.run_async(user_id=user_id, session_id=session.id, new_message=message)
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    if event.author == LOGISTICS_AGENT and event.content and event.content.parts:
+                        text = "".join(part.text or "" for part in event.content.parts)
+                        if text.strip():
+                            final_text = text
+                    if event.actions.transfer_to_agent:
+                        break
+        finally:
+            runner.session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+        return _parse_report(final_text)
+
+    async def _logistics(self, ticket: Dict[str, Any], report: Dict[str, Any],
+                         semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        if report["status"] != NEEDS_REVIEW or not self.use_llm:
+            return report
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(self._run_agent(ticket), self.timeout)
+            except asyncio.TimeoutError:
+                return {"status": "failure", "reason": f"Logistics timed out after {self.timeout}s"}
+            except Exception as e:
+                return {"status": "failure", "reason": f"Error: {e}"}
+
+    async def run(self, machine_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Diagnoses the given machines (all machines if None) and returns one aggregated report.
+
+        Returns:
+            A dict with `machines_checked`, `healthy` (IDs), `maintenance_required`
+            (one entry per unhealthy machine with its prediction, inferred issue and
+            logistics report, highest failure probability first), `errors` and
+            `elapsed_seconds`.
+        """
+        start = time.perf_counter()
+        db = get_db()
+        machine_ids = list(machine_ids) if machine_ids is not None else db.get_machine_ids()
+
+        healthy, tickets, errors = [], [], []
+        for diagnosis in await diagnose_machines_async(machine_ids, db=db):
+            machine_id = diagnosis["machine_id"]
+            if "error" in diagnosis:
+                errors.append({"machine_id": machine_id, "error": diagnosis["error"]})
+                continue
+            if not diagnosis["maintenance_required"]:
+                healthy.append(machine_id)
+                continue
+            machine_type = db.get_machine_info(machine_id).get("type")
+            tickets.append({
+                "machine_id": machine_id,
+                "issue_description": diagnosis["issue_description"],
+                "required_skills": [machine_type] if machine_type else [],
+                "failure_probability": diagnosis.get("failure_probability"),
+                "main_factor": diagnosis.get("main_factor"),
+            })
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # The assignment is solved in one blocking call; the event loop keeps serving other requests meanwhile.
+        scheduled = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(schedule_tickets, tickets, db=db, reserve=True))
+        reports = await asyncio.gather(*(self._logistics(ticket, report, semaphore)
+                                         for ticket, report in zip(tickets, scheduled)))
+        for ticket, report in zip(tickets, reports):
+            ticket["logistics"] = report
+        tickets.sort(key=lambda ticket: -(ticket["failure_probability"] or 0.0))
+
+        return {
+            "machines_checked": len(machine_ids),
+            "healthy": healthy,
+            "maintenance_required": tickets,
+            "errors": errors,
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+async def diagnose_fleet(machine_ids: Optional[List[str]] = None, concurrency: int = 8,
+                         timeout: float = 60.0, use_llm: bool = True) -> Dict[str, Any]:
+    """Diagnoses many machines at once; see `FleetDiagnostics.run`."""
+    return await FleetDiagnostics(concurrency, timeout, use_llm).run(machine_ids)
@@ -0,0 +1,277 @@
+"""
+Off-Event-Loop Model Inference for Smart Factory Operations.
+
+ADK runs a synchronous tool on the event loop, so while the model scores one
+request every other session served by the process (`adk web`) waits. The
+prediction tools instead await `get_inference_service().predict(...)`:
+
+- requests from all sessions are coalesced into micro-batches: while the
+  workers are busy new requests queue up, and a free worker waits at most
+  `max_batch_delay` for more before scoring up to `batch_size` readings with
+  one `predict_batch` call;
+- each batch runs on a dedicated executor: a thread pool by default (the lean
+  NumPy model and scikit-learn's tree code spend most of a batch in vectorized
+  loops that release the GIL), or a process pool whose workers load the model
+  once each in their initializer, for models that hold the GIL.
+
+If a batch fails, its requests are scored again one by one, so a malformed
+reading only fails the request that sent it. Callers that batch readings
+themselves (the streaming pipeline) use `score`, which runs one batch on the
+same executor without coalescing.
+
+Configuration comes from the environment: `INFERENCE_EXECUTOR` ("thread"
+(default), "process", or "inline" to score on the event loop),
+`INFERENCE_WORKERS` (default 2), `INFERENCE_BATCH_SIZE` (default 512) and
+`INFERENCE_BATCH_DELAY_MS` (default 2).
+"""
+import asyncio
+import collections
+import os
+import threading
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from factory_agents_v2.predictor import MaintenancePredictor, get_predictor
+from factory_agents_v2.telemetry import span
+
+# Fields `predict_batch(..., explain=True)` adds, removed for requests that did not ask for them.
+EXPLANATION_FIELDS = ("threshold", "contributions", "main_factor", "deviations")
+
+# --- Process pool workers ---
+
+_worker_predictor: Optional[MaintenancePredictor] = None
+
+
+def _init_worker(model_path: str, model_format: str, threshold: Optional[float]) -> None:
+    global _worker_predictor
+    _worker_predictor = MaintenancePredictor(model_path, model_format=model_format, threshold=threshold)
+    _worker_predictor.model  # loaded once per worker, before the first request
+
+
+def _predict_in_worker(readings: List[Dict[str, Any]], explain: bool) -> List[Dict[str, Any]]:
+    return _worker_predictor.predict_batch(readings, explain=explain)
+
+
+def _ready() -> bool:
+    return True
+
+
+class _Request:
+    __slots__ = ("readings", "explain", "future")
+
+    def __init__(self, readings: List[Dict[str, Any]], explain: bool, future: asyncio.Future):
+        self.readings = readings
+        self.explain = explain
+        self.future = future
+
+
+class _LoopState:
+    """The queue and dispatcher of one event loop; futures cannot be shared across loops."""
+
+    def __init__(self, workers: int):
+        self.pending: "collections.deque[_Request]" = collections.deque()
+        self.slots = asyncio.Semaphore(workers)
+        self.dispatcher: Optional[asyncio.Task] = None
+
+
+class InferenceService:
+    """Scores readings for coroutines on an executor, coalescing concurrent requests into micro-batches."""
+
+    def __init__(self, predictor: Optional[MaintenancePredictor] = None, executor: str = "thread",
+                 workers: int = 2, batch_size: int = 512, max_batch_delay: float = 0.002):
+        """
+        Args:
+            predictor: Scores the batches (and, with a process pool, configures the
+                workers' own predictors). Defaults to the process-wide predictor.
+            executor: "thread", "process" or "inline" (score on the event loop).
+            workers: Threads or processes, which is also the number of batches
+                scored at once.
+            batch_size: Most readings per batch; a larger request is never split.
+            max_batch_delay: Seconds a free worker waits for more requests before
+                scoring the ones queued.
+        """
+        if executor not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown inference executor {executor!r}")
+        self.predictor = predictor
+        self.executor_kind = executor
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+        # Each event loop that uses the service updates the counters.
+        self._stats_lock = threading.Lock()
+
+        self.requests = 0
+        self.batches = 0
+        self.readings_scored = 0
+
+    def _get_predictor(self) -> MaintenancePredictor:
+        return self.predictor or get_predictor()
+
+    @property
+    def model_version(self) -> str:
+        """The version of the model the batches are scored with; see `MaintenancePredictor.model_version`."""
+        return self._get_predictor().model_version
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.executor_kind == "inline":
+            return None
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.executor_kind == "process":
+                        import multiprocessing
+
+                        predictor = self._get_predictor()
+                        # Spawned rather than forked: the parent runs threads (warm-up, telemetry, SMTP).
+                        self._executor = ProcessPoolExecutor(
+                            self.workers, mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_init_worker,
+                            initargs=(predictor.model_path, predictor.model_format, predictor.threshold))
+                    else:
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    def start(self) -> None:
+        """Starts the workers and, for a process pool, waits until each has loaded the model."""
+        executor = self._get_executor()
+        if isinstance(executor, ProcessPoolExecutor):
+            with span("inference_start", executor="process", workers=self.workers):
+                for future in [executor.submit(_ready) for _ in range(self.workers)]:
+                    future.result()
+        else:
+            self._get_predictor().model
+
+    def shutdown(self) -> None:
+        """Stops the workers; the service starts new ones if it is used again."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def predict(self, readings: List[Dict[str, Any]], explain: bool = False) -> List[Dict[str, Any]]:
+        """Scores `readings` like `MaintenancePredictor.predict_batch`, without blocking the event loop."""
+        if not readings:
+            return []
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState(self.workers)
+        request = _Request(list(readings), explain, loop.create_future())
+        state.pending.append(request)
+        with self._stats_lock:
+            self.requests += 1
+        if state.dispatcher is None or state.dispatcher.done():
+            state.dispatcher = loop.create_task(self._dispatch(state))
+        return await request.future
+
+    async def _dispatch(self, state: _LoopState) -> None:
+        while state.pending:
+            # Requests keep queuing while every worker is busy, so batches grow with the load.
+            await state.slots.acquire()
+            if self.max_batch_delay > 0:
+                await asyncio.sleep(self.max_batch_delay)
+            batch, size = [], 0
+            while state.pending and (not batch or size + len(state.pending[0].readings) <= self.batch_size):
+                request = state.pending.popleft()
+                batch.append(request)
+                size += len(request.readings)
+            if not batch:
+                state.slots.release()
+                continue
+            asyncio.get_running_loop().create_task(self._score(state, batch))
+
+    async def _score(self, state: _LoopState, batch: List[_Request]) -> None:
+        try:
+            await self._score_batch(batch)
+        finally:
+            state.slots.release()
+
+    async def _score_batch(self, batch: List[_Request]) -> None:
+        readings = [reading for request in batch for reading in request.readings]
+        explain = any(request.explain for request in batch)
+        try:
+            predictions = await self.score(readings, explain)
+        except Exception as e:
+            if len(batch) > 1:
+                # One malformed request must not fail the others coalesced with it: score each on its own.
+                for request in batch:
+                    await self._score_batch([request])
+                return
+            if not batch[0].future.done():
+                batch[0].future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            results = predictions[offset:offset + len(request.readings)]
+            offset += len(request.readings)
+            if explain and not request.explain:
+                for result in results:
+                    for field in EXPLANATION_FIELDS:
+                        result.pop(field, None)
+            if not request.future.done():
+                request.future.set_result(results)
+
+    async def score(self, readings: List[Dict[str, Any]], explain: bool = False) -> List[Dict[str, Any]]:
+        """
+        Scores one batch on the executor as is, without waiting for other requests;
+        for callers that batch readings themselves (see `streaming`).
+        """
+        executor = self._get_executor()
+        if executor is None:
+            predictions = self._get_predictor().predict_batch(readings, explain=explain)
+        elif isinstance(executor, ProcessPoolExecutor):
+            predictions = await asyncio.get_running_loop().run_in_executor(
+                executor, _predict_in_worker, readings, explain)
+        else:
+            predictions = await asyncio.get_running_loop().run_in_executor(
+                executor, self._get_predictor().predict_batch, readings, explain)
+        with self._stats_lock:
+            self.batches += 1
+            self.readings_scored += len(readings)
+        return predictions
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the request, batch and reading counters and the mean batch size."""
+        with self._stats_lock:
+            requests, batches, readings_scored = self.requests, self.batches, self.readings_scored
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "requests": requests,
+            "batches": batches,
+            "readings_scored": readings_scored,
+            "mean_batch_size": readings_scored / batches if batches else 0.0,
+        }
+
+
+_service: Optional[InferenceService] = None
+_service_lock = threading.Lock()
+
+
+def get_inference_service() -> InferenceService:
+    """Returns the process-wide inference service, configured from the environment on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = InferenceService(
+                    executor=(os.getenv("INFERENCE_EXECUTOR") or "thread").lower(),
+                    workers=int(os.getenv("INFERENCE_WORKERS") or 2),
+                    batch_size=int(os.getenv("INFERENCE_BATCH_SIZE") or 512),
+                    max_batch_delay=float(os.getenv("INFERENCE_BATCH_DELAY_MS") or 2) / 1000,
+                )
+    return _service
+
+
+def set_inference_service(service: Optional[InferenceService]) -> None:
+    """Replaces the process-wide inference service (None resets it to the default on next use)."""
+    global _service
+    with _service_lock:
+        previous, _service = _service, service
+    if previous is not None and previous is not service:
+        previous.shutdown()
@@ -2,57 +2,169 @@
 Inventory and Resource Agent for Smart Factory Operations.
 
 This specialist agent receives a maintenance task and determines the availability
-of the necessary parts and personnel.
+of the necessary parts and personnel. The agent is built on first use
+(`get_inventory_and_resource_agent()`), so importing a tool function does not
+import ADK or LiteLLM.
 """
-from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
-from factory_agents_v2.MockDB import MockDB
-import os
-import json
-from typing import List
-from dotenv import load_dotenv
+import threading
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.telemetry import agent_callbacks, instrumented_tool
+from factory_agents_v2.resource_resolver import resolve_maintenance_request
+from factory_agents_v2.session_context import context_callbacks
+from factory_agents_v2.payloads import project, to_json
+from typing import List, Optional, TYPE_CHECKING
 
-load_dotenv()
+if TYPE_CHECKING:
+    from google.adk.agents import LlmAgent
 
 # --- Tool Functions for this Agent ---
 
-def get_inventory() -> str:
-    """Returns the entire inventory catalog to search for required parts."""
-    inventory = MockDB().get_inventory()
-    return json.dumps(inventory, indent=2)
+# Fields returned when the caller does not ask for specific ones.
+PART_FIELDS = ["id", "name", "keywords", "quantity"]
+MATCHED_PART_FIELDS = ["id", "name", "quantity", "matched_keywords"]
+TECHNICIAN_FIELDS = ["id", "name", "skills", "availability"]
+MATCHED_TECHNICIAN_FIELDS = ["id", "name", "skills"]
 
-def get_technicians() -> str:
-    """Returns the entire list of technicians to find one with the right skills."""
-    technicians = MockDB().get_technicians()
-    return json.dumps(technicians, indent=2)
+@instrumented_tool
+def resolve_maintenance_logistics(machine_id: str, issue_description: str, required_skills: List[str]) -> str:
+    """
+    Finds the part and technician for a maintenance task using deterministic matching rules.
+
+    Args:
+        machine_id: The machine that needs maintenance.
+        issue_description: The reported issue, e.g. "High vibration of 8.7 mm/s".
+        required_skills: The skills needed for the job, e.g. ["Motor"].
+
+    Returns:
+        The final JSON report (`"status": "success"` or `"failure"`), or
+        `"status": "needs_review"` when no part matches and the request must be
+        handled manually. On success the part and technician are held for this
+        machine, and `reservation_ids` must be passed on to confirm them.
+    """
+    report = resolve_maintenance_request(machine_id, issue_description, required_skills, reserve=True)
+    return to_json("resolve_maintenance_logistics", report)
+
+@instrumented_tool
+def reserve_maintenance_resources(machine_id: str, part_id: str, technician_id: str) -> str:
+    """
+    Holds one unit of a part and a technician for a machine, so no other task can take them.
+
+    Args:
+        machine_id: The machine that needs maintenance.
+        part_id: The part chosen for the repair.
+        technician_id: The technician chosen for the repair.
+
+    Returns:
+        `{"status": "success", "reservation_ids": [...], "hold_expires_at": ...}`, or
+        `{"status": "failure", "reason": ...}` if the part has run out or the
+        technician was taken meanwhile; nothing is held after a failure.
+    """
+    db = get_db().for_machine(machine_id)
+    part_hold = db.reserve_part(part_id, 1, machine_id)
+    if part_hold["status"] != "held":
+        reason = "Part out of stock" if part_hold["status"] == "conflict" else part_hold["reason"]
+        return to_json("reserve_maintenance_resources", {"status": "failure", "reason": reason, "part_id": part_id})
+    technician_hold = db.assign_technician(technician_id, machine_id)
+    if technician_hold["status"] != "held":
+        db.release_reservation(part_hold["reservation_id"])
+        reason = ("No available technician found" if technician_hold["status"] == "conflict"
+                  else technician_hold["reason"])
+        return to_json("reserve_maintenance_resources", {"status": "failure", "reason": reason})
+    return to_json("reserve_maintenance_resources", {
+        "status": "success",
+        "reservation_ids": [part_hold["reservation_id"], technician_hold["reservation_id"]],
+        "hold_expires_at": min(part_hold["expires_at"], technician_hold["expires_at"]),
+    })
+
+def _store_for(machine_id: str):
+    # Scoped to the machine's plant when the data is sharded by plant.
+    db = get_db()
+    return db.for_machine(machine_id) if machine_id else db
+
+@instrumented_tool
+def get_inventory(machine_type: str = "", in_stock_only: bool = False, fields: Optional[List[str]] = None,
+                  machine_id: str = "") -> str:
+    """
+    Returns the inventory catalog to search for required parts.
+
+    Args:
+        machine_type: Optional machine type (e.g. "Motor"); only parts applicable to it are returned.
+        in_stock_only: If True, only parts with quantity > 0 are returned.
+        fields: Part fields to return. Defaults to id, name, keywords and quantity;
+            location and applicable_machine_types are also available.
+        machine_id: Optional machine the parts are for; the search starts at its plant.
+    """
+    inventory = _store_for(machine_id).get_inventory(machine_type or None, in_stock_only)
+    return to_json("get_inventory", project(inventory, fields or PART_FIELDS))
+
+@instrumented_tool
+def get_technicians(available_only: bool = True, include_operators: bool = False,
+                    fields: Optional[List[str]] = None, machine_id: str = "") -> str:
+    """
+    Returns the technicians to find one with the right skills.
+
+    Args:
+        available_only: If True (the default), only technicians whose availability is "available".
+        include_operators: If True, also lists machine operators, who are never assigned repairs.
+        fields: Technician fields to return. Defaults to id, name, skills and availability;
+            role and current_assignment are also available.
+        machine_id: Optional machine the technician is for; the search starts at its plant.
+    """
+    technicians = _store_for(machine_id).get_technicians(available_only, assignable_only=not include_operators)
+    return to_json("get_technicians", project(technicians, fields or TECHNICIAN_FIELDS))
+
+@instrumented_tool
+def find_parts(issue_description: str, machine_type: str = "", fields: Optional[List[str]] = None,
+               machine_id: str = "") -> str:
+    """
+    Returns only the parts whose keywords match the issue description, best match first.
 
+    Args:
+        issue_description: The reported issue, e.g. "High vibration of 8.7 mm/s".
+        machine_type: Optional machine type (e.g. "Motor") to restrict results to applicable parts.
+        fields: Part fields to return. Defaults to id, name, quantity and matched_keywords.
+        machine_id: Optional machine the part is for; the search starts at its plant.
+    """
+    parts = _store_for(machine_id).find_parts(issue_description, machine_type or None)
+    return to_json("find_parts", project(parts, fields or MATCHED_PART_FIELDS))
+
+@instrumented_tool
+def find_available_technicians(required_skills: List[str], fields: Optional[List[str]] = None,
+                               machine_id: str = "") -> str:
+    """
+    Returns only the available technicians whose skills include all of the required skills.
+
+    Args:
+        required_skills: The skills needed for the job, e.g. ["Motor"].
+        fields: Technician fields to return. Defaults to id, name and skills.
+        machine_id: Optional machine the technician is for; the search starts at its plant.
+    """
+    technicians = _store_for(machine_id).find_available_technicians(required_skills)
+    return to_json("find_available_technicians", project(technicians, fields or MATCHED_TECHNICIAN_FIELDS))
+
+@instrumented_tool
 def get_machine_info(machine_id: str) -> str:
     """Gets basic info for a specific machine, especially its 'type' to determine required skills."""
-    machine_info = MockDB().get_machine_info(machine_id)
-    return json.dumps(machine_info, indent=2)
+    machine_info = get_db().get_machine_info(machine_id)
+    return to_json("get_machine_info", machine_info)
 
 
-def create_inventory_and_resource_agent() -> LlmAgent:
+def create_inventory_and_resource_agent() -> "LlmAgent":
     """Creates the specialist agent for inventory and resource checking."""
+    from google.adk.agents import LlmAgent
+    from factory_agents_v2.llm import create_llm_model
     
     tools = [
+        resolve_maintenance_logistics,
+        reserve_maintenance_resources,
+        find_parts,
+        find_available_technicians,
         get_inventory,
         get_technicians,
         get_machine_info,
     ]
     
-    llm_model = LiteLlm(
-        model="gpt-4o",
-        base_url=os.getenv("LITELLM_URL"),
-        api_key="sk-1",
-        headers={
-            "appid": os.getenv("AGENT_ID"),
-            "tenantid": os.getenv("TENANT_ID"),
-            "userid": "user_123_456",
-            "sessionid": "session_123_456",
-            "teamid": "team_123_456"
-        }
-    )
+    llm_model = create_llm_model("InventoryAndResourceAgent")
     
     instruction = """
     You are a specialist Inventory and Resource Agent. Your job is to take a specific maintenance request from the Orchestrator and determine if it's feasible by checking parts and people.
@@ -62,20 +174,26 @@ def create_inventory_and_resource_agent() -> LlmAgent:
 
     **Your Standard Operating Procedure:**
 
+    0.  **Try the Deterministic Resolver First:**
+        -   Call `resolve_maintenance_logistics` with the `machine_id`, `issue_description` and `required_skills`.
+        -   If it returns `"status": "success"` or `"status": "failure"`, that JSON is your final report: return it unchanged and go to step 4.
+        -   Only if it returns `"status": "needs_review"`, continue with steps 1-3.
+
     1.  **Find the Required Part:**
-        -   Call `get_inventory` to get the parts list.
-        -   Search the list for a part whose `keywords` match the `issue_description`. For "vibration" or "grinding", you should find the "Bearing Assembly".
+        -   Call `find_parts` with the `issue_description`, the machine type from `required_skills` and the `machine_id`. It returns matching parts ranked best first; use the first one.
+        -   Only if `find_parts` returns an empty list, call `get_inventory` with the machine type and `machine_id` and search the list for a part whose `keywords` match the `issue_description`. For "vibration" or "grinding", you should find the "Bearing Assembly".
         -   Note the part's `name`, `id`, and `quantity`.
 
     **Find a Qualified Technician:**
-        -   Call the `get_technicians` tool to get the full technician list.
-        -   Search the list for a technician object where the `skills` list contains the `required_skills` you were given AND the `availability` is "available".
+        -   Call `find_available_technicians` with the `required_skills` and the `machine_id`. Every technician it returns has those skills AND is "available"; use the first one.
+        -   If it returns an empty list, no qualified technician is available.
         -   From the matching technician object, note their `name` and `id`.
 
-    3.  **Formulate the Final JSON Report:**
+    3.  **Reserve and Formulate the Final JSON Report:**
         -   Your final output MUST be a single JSON object constructed from the data you found.
         -   **If you found an available part (quantity > 0) AND a qualified, available technician:**
-            -   Construct a JSON object like this: `{"status": "success", "part_name": "...", "part_id": "...", "technician_name": "...", "technician_id": "..."}`
+            -   Call `reserve_maintenance_resources` with the `machine_id`, the part `id` and the technician `id`. If it fails because the technician was taken, try the next technician from `find_available_technicians`; if the part ran out, report the part as out of stock.
+            -   Construct a JSON object like this: `{"status": "success", "part_name": "...", "part_id": "...", "technician_name": "...", "technician_id": "...", "reservation_ids": [...]}`, with the `reservation_ids` returned by the reservation.
             -   You MUST populate this JSON using the actual values you found. The `part_name` field must contain the `name` from the part object you identified, and `technician_name` must contain the `name` of the technician you selected.
 
         -   **If the part you found has a quantity of 0:**
@@ -93,9 +211,30 @@ def create_inventory_and_resource_agent() -> LlmAgent:
         description="Checks for part availability and finds qualified technicians for a maintenance task.",
         instruction=instruction,
         model=llm_model,
-        tools=tools
+        tools=tools,
+        **agent_callbacks(),
+        **context_callbacks(),
     )
     
     return inventory_and_resource_agent
 
-inventory_and_resource_agent = create_inventory_and_resource_agent()
\ No newline at end of file
+
+_agent: Optional["LlmAgent"] = None
+_agent_lock = threading.Lock()
+
+
+def get_inventory_and_resource_agent() -> "LlmAgent":
+    """Returns the process-wide InventoryAndResourceAgent, creating it on first use."""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = create_inventory_and_resource_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `inventory_and_resource_agent` is created on first access rather than at import time.
+    if name == "inventory_and_resource_agent":
+        return get_inventory_and_resource_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
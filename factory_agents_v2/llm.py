@@ -0,0 +1,472 @@
+"""
+Shared LLM Client for Smart Factory Agents.
+
+Every agent gets its model from `create_llm_model`, so the LiteLLM endpoint,
+credentials and request headers are configured in one place and all agents
+share one pooled HTTP session. Non-streaming responses are cached, keyed on the
+normalized request (model, system instruction, tool declarations and the whole
+conversation including tool results), so repeating a diagnosis for a machine
+whose readings have not changed is answered without an LLM round-trip. Tool
+result fields that change on every call for the same state (reservation and
+message IDs, hold expiry times, cache flags) are replaced by placeholders in the
+key, and a cached response gets the current request's values back, so a reply
+that passes reservation IDs on confirms this run's holds, not the earlier ones.
+
+Configuration comes from the environment: `MODEL_NAME` (default "gpt-4o"),
+`LITELLM_URL`, `AGENT_ID`, `TENANT_ID`, and for the cache `LLM_CACHE`
+("memory" (default), "disk" or "off"), `LLM_CACHE_SIZE`, `LLM_CACHE_TTL`
+(seconds) and `LLM_CACHE_PATH` (SQLite file for the disk cache). Cache
+counters and per-agent latency histograms are exposed through `llm_stats()`, and
+every model hop is also recorded as an "llm" span with its token usage (see
+`telemetry`).
+"""
+import bisect
+import collections
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from google.adk.models.lite_llm import LiteLlm, LiteLLMClient
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from factory_agents_v2.telemetry import record_span
+
+DEFAULT_MODEL_NAME = "gpt-4o"
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "llm_cache.db")
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Tool result fields whose values differ between calls on the same state.
+VOLATILE_FIELDS = frozenset({"reservation_id", "reservation_ids", "hold_expires_at", "expires_at",
+                             "message_id", "cached"})
+
+# (prompt_tokens, completion_tokens) of the running task's last LLM completion.
+_last_usage: contextvars.ContextVar = contextvars.ContextVar("llm_last_usage", default=(None, None))
+
+
+# --- Response caches ---
+
+class ResponseCache(ABC):
+    """Stores LLM responses by request key."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[LlmResponse]:
+        """Returns the cached response for `key`, or None if it is missing or expired."""
+
+    @abstractmethod
+    def put(self, key: str, response: LlmResponse) -> None:
+        """Stores `response` under `key`."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every cached response."""
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache with a time-to-live per entry."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[LlmResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response.model_copy(deep=True)
+
+    def put(self, key: str, response: LlmResponse) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskResponseCache(ResponseCache):
+    """SQLite-backed cache that survives restarts, with LRU eviction and a time-to-live."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 10000,
+                 ttl: Optional[float] = 86400.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, used_at REAL NOT NULL, response TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses(used_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[LlmResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[0] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return LlmResponse.model_validate_json(row[1])
+
+    def put(self, key: str, response: LlmResponse) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, used_at, response) VALUES (?, ?, ?, ?)",
+                (key, now, now, response.model_dump_json(exclude_none=True)))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _strip_call_ids(value: Any) -> Any:
+    # Function call IDs are generated per call, so they would make every key unique.
+    if isinstance(value, dict):
+        return {k: _strip_call_ids(v) for k, v in value.items()
+                if not (k == "id" and ("name" in value and ("args" in value or "response" in value)))}
+    if isinstance(value, list):
+        return [_strip_call_ids(v) for v in value]
+    return value
+
+
+def _placeholder(value: Any, values: List[str]) -> Any:
+    if isinstance(value, list):
+        return [_placeholder(item, values) for item in value]
+    if value is None:
+        return None
+    text = value if isinstance(value, str) else repr(value)
+    if text not in values:
+        values.append(text)
+    return f"<volatile:{values.index(text)}>"
+
+
+def _mask(value: Any, values: List[str]) -> Any:
+    # Replaces volatile fields with numbered placeholders; boolean flags are dropped.
+    if isinstance(value, dict):
+        return {k: _placeholder(v, values) if k in VOLATILE_FIELDS else _mask(v, values)
+                for k, v in value.items() if not (k in VOLATILE_FIELDS and isinstance(v, bool))}
+    if isinstance(value, list):
+        return [_mask(v, values) for v in value]
+    return value
+
+
+def _mask_function_response(response: Dict[str, Any], values: List[str]) -> Dict[str, Any]:
+    # Tools return JSON strings, which ADK wraps as {"result": "..."}.
+    result = response.get("result")
+    if isinstance(result, str):
+        try:
+            decoded = json.loads(result)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, (dict, list)):
+            return dict(response, result=json.dumps(_mask(decoded, values), sort_keys=True))
+    return _mask(response, values)
+
+
+def _value_pattern(values: List[str]) -> "re.Pattern":
+    # Longest first, and only whole values, so "msg-1" does not match inside "msg-12".
+    alternatives = "|".join(re.escape(value) for value in sorted(values, key=len, reverse=True))
+    return re.compile(rf"(?<![\w.-])(?:{alternatives})(?![\w.-])")
+
+
+def _replace_values(text: str, values: List[str]) -> str:
+    if not values:
+        return text
+    return _value_pattern(values).sub(lambda m: f"<volatile:{values.index(m.group(0))}>", text)
+
+
+def request_key(model: str, llm_request: LlmRequest) -> Tuple[str, List[str]]:
+    """
+    Returns the cache key of `llm_request` and the volatile values it abstracts.
+
+    Volatile tool result fields (see `VOLATILE_FIELDS`) become `<volatile:N>`
+    placeholders, numbered in order of appearance, wherever their values occur:
+    in the tool results themselves, in later tool call arguments, and in other
+    agents' turns replayed as text. The N-th returned value is the one behind
+    placeholder N.
+    """
+    config = llm_request.config
+    values: List[str] = []
+    contents = [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents]
+    for content in contents:
+        for part in content.get("parts", []):
+            function_response = part.get("function_response")
+            if function_response and isinstance(function_response.get("response"), dict):
+                function_response["response"] = _mask_function_response(function_response["response"], values)
+    normalized = {
+        "model": llm_request.model or model,
+        "system_instruction": config.system_instruction if config else None,
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in (config.tools or [])]
+        if config else [],
+        "contents": contents,
+    }
+    text = json.dumps(_strip_call_ids(normalized), sort_keys=True, separators=(",", ":"), default=str)
+    text = _replace_values(text, values)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), values
+
+
+def response_cache_key(model: str, llm_request: LlmRequest) -> str:
+    """Hashes everything that determines the model's answer to `llm_request`."""
+    return request_key(model, llm_request)[0]
+
+
+def _mask_response(response: LlmResponse, values: List[str]) -> LlmResponse:
+    """Replaces the request's volatile `values` in `response` with their placeholders, for caching."""
+    if not values:
+        return response
+    return LlmResponse.model_validate_json(
+        _replace_values(response.model_dump_json(exclude_none=True), values))
+
+
+def _unmask_response(response: LlmResponse, values: List[str]) -> LlmResponse:
+    """Puts the current request's volatile `values` back into a cached response."""
+    if not values:
+        return response
+    text = re.sub(r"<volatile:(\d+)>", lambda m: json.dumps(values[int(m.group(1))])[1:-1],
+                  response.model_dump_json(exclude_none=True))
+    return LlmResponse.model_validate_json(text)
+
+
+# --- Stats ---
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(agent_name: str, hit: Optional[bool], seconds: Optional[float] = None) -> None:
+    # hit is None when the response cache was not consulted (streaming or caching off).
+    with _stats_lock:
+        stats = _stats.setdefault(agent_name, {
+            "cache_hits": 0, "cache_misses": 0, "llm_calls": 0, "latency_seconds_sum": 0.0,
+            "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+        if hit:
+            stats["cache_hits"] += 1
+            return
+        if hit is False:
+            stats["cache_misses"] += 1
+        if seconds is not None:
+            stats["llm_calls"] += 1
+            stats["latency_seconds_sum"] += seconds
+            stats["latency_buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def llm_stats() -> Dict[str, Any]:
+    """
+    Returns per-agent cache hits/misses and LLM latency histograms.
+
+    Each agent entry has `cache_hits`, `cache_misses`, `llm_calls`,
+    `latency_seconds_sum` and `latency_buckets`, a mapping from bucket upper bound
+    (seconds, "+Inf" for the last) to the number of LLM calls that took at most that
+    long (non-cumulative). `total` sums the counters over all agents.
+    """
+    bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+    with _stats_lock:
+        agents = {
+            name: dict(stats, latency_buckets=dict(zip(bounds, stats["latency_buckets"])))
+            for name, stats in _stats.items()
+        }
+    total = {key: sum(stats[key] for stats in agents.values())
+             for key in ("cache_hits", "cache_misses", "llm_calls")}
+    return {"agents": agents, "total": total}
+
+
+def reset_llm_stats() -> None:
+    """Clears the cache and latency counters."""
+    with _stats_lock:
+        _stats.clear()
+
+
+# --- Model ---
+
+class MeteredLiteLLMClient(LiteLLMClient):
+    """LiteLLM client that keeps the token usage of the current task's last completion."""
+
+    async def acompletion(self, model, messages, tools, **kwargs):
+        response = await super().acompletion(model, messages, tools, **kwargs)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            _last_usage.set((getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)))
+        return response
+
+
+class CachingLiteLlm(LiteLlm):
+    """LiteLlm that answers repeated non-streaming requests from a `ResponseCache`."""
+
+    cache: Optional[ResponseCache] = None
+    agent_name: str = "agent"
+
+    def __init__(self, model: str, cache: Optional[ResponseCache] = None, agent_name: str = "agent",
+                 **kwargs):
+        kwargs.setdefault("llm_client", MeteredLiteLLMClient())
+        super().__init__(model=model, cache=cache, agent_name=agent_name, **kwargs)
+        # LiteLlm forwards its constructor arguments to every completion call.
+        self._additional_args.pop("cache", None)
+        self._additional_args.pop("agent_name", None)
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        key, volatile = None, []
+        start = time.perf_counter()
+        if not stream and self.cache is not None:
+            key, volatile = request_key(self.model, llm_request)
+            cached = self.cache.get(key)
+            if cached is not None:
+                _record(self.agent_name, hit=True)
+                record_span("llm", self.agent_name, time.perf_counter() - start, cached=True)
+                yield _unmask_response(cached, volatile)
+                return
+
+        _last_usage.set((None, None))
+        responses: List[LlmResponse] = []
+        try:
+            async for response in super().generate_content_async(llm_request, stream=stream):
+                if stream:
+                    yield response
+                else:
+                    # A non-streaming call yields exactly one response; it is timed before
+                    # it is handed on, because ADK runs the requested tools in between.
+                    responses.append(response)
+        except Exception as e:
+            record_span("llm", self.agent_name, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        seconds = time.perf_counter() - start
+        prompt_tokens, completion_tokens = _last_usage.get()
+        _record(self.agent_name, hit=None if key is None else False, seconds=seconds)
+        record_span("llm", self.agent_name, seconds, prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens, cached=False)
+        if key is not None and len(responses) == 1 and not responses[0].error_code:
+            self.cache.put(key, _mask_response(responses[0], volatile))
+        for response in responses:
+            yield response
+
+
+# --- Factory ---
+
+_cache: Optional[ResponseCache] = None
+_cache_configured = False
+_http_configured = False
+_factory_lock = threading.Lock()
+
+
+def _create_cache() -> Optional[ResponseCache]:
+    backend = os.getenv("LLM_CACHE", "memory").lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL", "0")) or None
+    size = int(os.getenv("LLM_CACHE_SIZE", "0"))
+    if backend in ("off", "none", "0", "false"):
+        return None
+    if backend == "disk":
+        return DiskResponseCache(os.getenv("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH,
+                                 max_entries=size or 10000, ttl=ttl or 86400.0)
+    if backend == "memory":
+        return MemoryResponseCache(max_entries=size or 1024, ttl=ttl or 600.0)
+    raise ValueError(f"Unknown LLM_CACHE backend: {backend!r} (expected 'memory', 'disk' or 'off')")
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the response cache shared by all agents (None when caching is off)."""
+    global _cache, _cache_configured
+    if not _cache_configured:
+        with _factory_lock:
+            if not _cache_configured:
+                _cache = _create_cache()
+                _cache_configured = True
+    return _cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replaces the shared response cache for models created afterwards (None disables caching)."""
+    global _cache, _cache_configured
+    with _factory_lock:
+        _cache = cache
+        _cache_configured = True
+
+
+def _configure_http_pool() -> None:
+    # One keep-alive connection pool for every litellm call in the process, instead
+    # of a new HTTP client per model. A session configured elsewhere is kept.
+    global _http_configured
+    if _http_configured:
+        return
+    with _factory_lock:
+        if _http_configured:
+            return
+        import httpx
+        import litellm
+
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+        if litellm.aclient_session is None:
+            litellm.aclient_session = httpx.AsyncClient(limits=limits)
+        if litellm.client_session is None:
+            litellm.client_session = httpx.Client(limits=limits)
+        _http_configured = True
+
+
+def _headers() -> Dict[str, str]:
+    headers = {
+        "appid": os.getenv("AGENT_ID"),
+        "tenantid": os.getenv("TENANT_ID"),
+        "userid": "user_123_456",
+        "sessionid": "session_123_456",
+        "teamid": "team_123_456"
+    }
+    # httpx rejects None header values, so unset IDs are left out.
+    return {name: value for name, value in headers.items() if value is not None}
+
+
+def create_llm_model(agent_name: str, cache: Optional[ResponseCache] = None) -> LiteLlm:
+    """
+    Creates the LLM model for an agent from the shared configuration.
+
+    Args:
+        agent_name: Label used for this agent's stats in `llm_stats()`.
+        cache: Response cache to use; defaults to the shared cache from `LLM_CACHE`.
+    """
+    _configure_http_pool()
+    return CachingLiteLlm(
+        model=os.getenv("MODEL_NAME") or DEFAULT_MODEL_NAME,
+        cache=cache if cache is not None else get_response_cache(),
+        agent_name=agent_name,
+        base_url=os.getenv("LITELLM_URL"),
+        api_key="sk-1",
+        headers=_headers(),
+    )
@@ -2,70 +2,97 @@
 Maintenance Agent for Smart Factory Operations.
 
 This agent analyzes machine sensor data to predict if maintenance is required.
+The agent is built on first use (`get_maintenance_agent()`), so importing a
+tool function does not import ADK or LiteLLM.
 """
-from google.adk.agents import LlmAgent
-from google.adk.models.lite_llm import LiteLlm
-from factory_agents_v2.MockDB import MockDB
-import os
-import json
-from dotenv import load_dotenv
-
-load_dotenv()
+import threading
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.telemetry import agent_callbacks, instrumented_tool
+from factory_agents_v2.inference import get_inference_service
+from factory_agents_v2.diagnostics import diagnose_machines_async, rank_by_risk
+from factory_agents_v2.sensor_history import get_history
+from factory_agents_v2.session_context import context_callbacks
+from factory_agents_v2.payloads import to_json
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google.adk.agents import LlmAgent
 
 # --- Tool Functions for this Agent ---
 
-def fetch_machine_readings(machine_id: str) -> str:
+@instrumented_tool
+def fetch_machine_readings(machine_id: str, window_minutes: int = 0) -> str:
     """
     Retrieves the latest sensor readings (temperature, vibration, pressure) for a specific machine.
-    """
-    readings = MockDB().get_machine_details(machine_id)
-    return json.dumps(readings, indent=2)
 
-def predict_maintenance(sensor_data: dict) -> bool:
+    Args:
+        machine_id: The machine to read.
+        window_minutes: If greater than 0, also returns `aggregates` over the sensor
+            history of the last `window_minutes`: mean, max, slope per minute and EWMA
+            for each sensor.
     """
-    Predicts if the machine needs maintenance using an ML model.
+    readings = get_db().get_machine_details(machine_id)
+    if "error" not in readings:
+        history = get_history()
+        history.observe(machine_id, readings)
+        if window_minutes > 0:
+            readings["aggregates"] = history.aggregates(machine_id, window_minutes)
+    return to_json("fetch_machine_readings", readings)
+
+@instrumented_tool
+async def predict_maintenance(sensor_data: dict) -> str:
+    """
+    Predicts if the machine needs maintenance using an ML model, and explains the verdict.
 
     Args:
         sensor_data: A Python dictionary with the sensor readings.
 
     Returns:
-        A boolean: True if maintenance is predicted, False otherwise.
+        A JSON object with `maintenance_required` (True/False), `failure_probability`,
+        the decision `threshold`, `contributions` (how much each sensor raised or
+        lowered the failure probability), `deviations` (how far each sensor is
+        outside its normal range, 0.0 inside) and `main_factor` (the sensor that
+        raised the probability most).
     """
-    import joblib
-    import pandas as pd
-    
-    model = joblib.load(r"C:\Users\Santhosh\Desktop\mcp-gateway-latest\test-servers\factory_agents_v2\maintenance_model.joblib")
+    prediction = await get_inference_service().predict([sensor_data], explain=True)
+    return to_json("predict_maintenance", prediction[0])
 
-    feature_order = ['temperature', 'vibration', 'pressure']
-    # Create the DataFrame of the sensor data
-    features_df = pd.DataFrame([sensor_data], columns=feature_order)
-
-    # Make the prediction.
-    prediction = model.predict(features_df)
+@instrumented_tool
+async def predict_maintenance_batch(machine_ids: List[str], top_n: int = 0) -> str:
+    """
+    Fetches the latest readings for several machines and predicts maintenance for all of them in one pass.
 
-    result = bool(prediction[0])
-    return result
+    Args:
+        machine_ids: The IDs of the machines to diagnose.
+        top_n: If greater than 0, only the `top_n` riskiest machines are returned.
 
-def create_maintenance_agent() -> LlmAgent:
+    Returns:
+        A JSON list ranked from the highest failure probability down, with one entry
+        per machine: its `machine_id`, the sensor readings (temperature, vibration,
+        pressure), `maintenance_required` (True/False), `failure_probability`,
+        `main_factor` and `deviations` (as for `predict_maintenance`), or an `error`.
+    """
+    results = []
+    for diagnosis in rank_by_risk(await diagnose_machines_async(machine_ids), top_n):
+        for field in ("issue_description", "threshold", "contributions"):
+            diagnosis.pop(field, None)
+        if "readings" in diagnosis:
+            diagnosis["readings"] = {k: v for k, v in diagnosis["readings"].items() if k != "timestamp"}
+        results.append(diagnosis)
+    return to_json("predict_maintenance_batch", results)
+
+def create_maintenance_agent() -> "LlmAgent":
     """Creates the agent for predictive maintenance analysis."""
+    from google.adk.agents import LlmAgent
+    from factory_agents_v2.llm import create_llm_model
 
     tools = [
         fetch_machine_readings,
-        predict_maintenance
+        predict_maintenance,
+        predict_maintenance_batch,
     ]
     
-    llm_model = LiteLlm(
-        model="gpt-4o",
-        base_url=os.getenv("LITELLM_URL"),
-        api_key="sk-1",
-        headers={
-            "appid": os.getenv("AGENT_ID"),
-            "tenantid": os.getenv("TENANT_ID"),
-            "userid": "user_123_456",
-            "sessionid": "session_123_456",
-            "teamid": "team_123_456"
-        }
-    )
+    llm_model = create_llm_model("MaintenanceAgent")
     
     instruction = """
     You are a Predictive Maintenance Agent. Your job is to analyze machine sensor data and report if maintenance is required.
@@ -74,17 +101,22 @@ def create_maintenance_agent() -> LlmAgent:
 
     1.  **Fetch Sensor Data:**
         -   You will be given a `machine_id`. Call the `fetch_machine_readings` tool with this ID.
+        -   If you are asked about trends or recent behaviour, also pass `window_minutes` (e.g. 60) to get rolling aggregates from the sensor history.
 
     2.  **Predict Maintenance:**
         -   Take the sensor data you received and pass it to the `predict_maintenance` tool.
-        -   This tool will return a simple `True` or `False`.
+        -   It returns `maintenance_required`, the `failure_probability`, the `main_factor` (the sensor that drove the verdict) and the `deviations` of each sensor from its normal range.
 
     3.  **Formulate a Human-Readable Report:**
         -   Your final output must be a single, clear sentence summarizing your findings for the Orchestrator.
-        -   **Crucially, your report must include the boolean result AND the key sensor values that influenced the decision.**
+        -   **Crucially, your report must include the boolean result, the failure probability AND the value of the `main_factor` sensor.** Name only that sensor (and any other with a non-zero deviation); do not guess from the raw readings.
+
+        -   **Example Success Report:** "Maintenance is predicted as True for machine MOTOR-B-02 (failure probability 0.97), driven by high vibration of 8.7 mm/s."
+        -   **Example Failure Report:** "Maintenance is predicted as False for machine PUMP-A-01 (failure probability 0.02), as all sensor values are within normal operating ranges."
 
-        -   **Example Success Report:** "Maintenance is predicted as True for machine MOTOR-B-02 due to high vibration readings of 8.7 mm/s."
-        -   **Example Failure Report:** "Maintenance is predicted as False for machine PUMP-A-01, as all sensor values are within normal operating ranges."
+    **Diagnosing Several Machines:**
+        -   If you are given more than one `machine_id`, call `predict_maintenance_batch` once with all of them instead of repeating steps 1 and 2 per machine.
+        -   The results are already ranked by failure probability; report one sentence per machine in that order, naming its `main_factor`. For a large fleet pass `top_n` to get only the riskiest machines.
 
     4. finally **transfer back the control to the orchestrator agent**
     """
@@ -95,8 +127,30 @@ def create_maintenance_agent() -> LlmAgent:
         instruction=instruction,
         model=llm_model,
         tools=tools,
+        **agent_callbacks(),
+        **context_callbacks(),
     )
     
     return maintenance_agent
 
-maintenance_agent = create_maintenance_agent()
+
+_agent: Optional["LlmAgent"] = None
+_agent_lock = threading.Lock()
+
+
+def get_maintenance_agent() -> "LlmAgent":
+    """Returns the process-wide MaintenanceAgent, creating it on first use."""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = create_maintenance_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `maintenance_agent` is created on first access rather than at import time.
+    if name == "maintenance_agent":
+        return get_maintenance_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
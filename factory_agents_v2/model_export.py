@@ -0,0 +1,260 @@
+"""
+Lean Inference Artifact for the Maintenance Model.
+
+`export_model` compiles the scikit-learn model in `maintenance_model.joblib`
+into a NumPy-only `.npz` artifact, and `LeanModel` scores it without importing
+scikit-learn, pandas or joblib:
+
+- tree models (a decision tree or a random forest / extra-trees ensemble) are
+  flattened into node arrays and evaluated for a whole batch at once by
+  stepping every row one level down its tree per iteration;
+- linear classifiers (e.g. logistic regression) keep only their coefficients
+  and intercepts.
+
+The artifact records the SHA-256 of the joblib file it was compiled from, so a
+retrained model is never shadowed by a stale artifact. Export verifies that the
+artifact reproduces the sklearn probabilities before writing it:
+
+    python -m factory_agents_v2.model_export [model.joblib] [--out model.npz]
+"""
+import argparse
+import hashlib
+import os
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LeanModel:
+    """NumPy-only classifier with the `classes_` / `predict_proba` / `predict` interface of sklearn."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.kind = str(arrays["kind"])
+        self.classes_ = arrays["classes"]
+        self.feature_names_in_ = arrays["feature_names"]
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.source_sha256 = str(arrays["source_sha256"])
+        if self.kind == "tree":
+            self.roots = arrays["roots"]
+            self.leaf_proba = arrays["leaf_proba"]
+            self.max_depth = int(arrays["max_depth"])
+            # Leaves point to themselves with an always-true split, so every row can take
+            # exactly max_depth steps without checking which rows have reached a leaf.
+            leaf = arrays["feature"] < 0
+            nodes = np.arange(len(leaf))
+            left = np.where(leaf, nodes, arrays["children_left"])
+            right = np.where(leaf, nodes, arrays["children_right"])
+            # children[2 * node] is the left child and children[2 * node + 1] the right one.
+            self.children = np.stack([left, right], axis=1).ravel()
+            self.feature = np.where(leaf, 0, arrays["feature"])
+            self.threshold = np.where(leaf, np.inf, arrays["threshold"])
+            self.missing_right = ~(arrays["missing_go_to_left"] | leaf)
+        elif self.kind == "linear":
+            self.coef = arrays["coef"]
+            self.intercept = arrays["intercept"]
+        else:
+            raise ValueError(f"Unknown lean model kind {self.kind!r}")
+
+    @classmethod
+    def load(cls, path: str) -> "LeanModel":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path} has artifact format {int(data['format_version'])}, "
+                                 f"expected {FORMAT_VERSION}")
+            return cls({name: data[name] for name in data.files})
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.explain(X, contributions=False)[0]
+
+    def explain(self, X, contributions: bool = True):
+        """
+        Computes class probabilities and, optionally, per-feature contributions in the same pass.
+
+        Returns:
+            `(proba, contributions)`: proba is (n_samples, n_classes); contributions
+            is (n_samples, n_features, n_classes) or None. For tree models the
+            contributions sum with the training prior (`leaf_proba` at the roots) to
+            proba: each split adds the probability change it causes to its feature.
+            For linear models they are `coef * x` in decision-function units.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if self.kind == "linear":
+            scores = X @ self.coef.T + self.intercept
+            if scores.shape[1] == 1:
+                positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+                proba = np.column_stack([1.0 - positive, positive])
+            else:
+                scores -= scores.max(axis=1, keepdims=True)
+                exp = np.exp(scores)
+                proba = exp / exp.sum(axis=1, keepdims=True)
+            if not contributions:
+                return proba, None
+            terms = X[:, :, None] * self.coef.T[None, :, :]
+            if terms.shape[2] == 1:
+                terms = np.concatenate([-terms, terms], axis=2)
+            return proba, terms
+
+        # sklearn compares float32 features against float64 thresholds.
+        X = X.astype(np.float32)
+        has_missing = np.isnan(X).any()
+        rows = np.arange(len(X))
+        # The node each sample has reached, per tree (one row per tree for ensembles).
+        if len(self.roots) == 1:
+            nodes = np.full(len(X), self.roots[0])
+        else:
+            nodes = np.repeat(self.roots, len(X)).reshape(len(self.roots), len(X))
+        totals = np.zeros((len(X), self.n_features_in_, self.leaf_proba.shape[1])) if contributions else None
+        for _ in range(self.max_depth):
+            features = self.feature[nodes]
+            values = X[rows, features]
+            go_right = values > self.threshold[nodes]
+            if has_missing:
+                go_right |= np.isnan(values) & self.missing_right[nodes]
+            children = self.children[2 * nodes + go_right]
+            if contributions:
+                # Leaves loop onto themselves, so their change is zero.
+                change = self.leaf_proba[children] - self.leaf_proba[nodes]
+                if nodes.ndim == 1:
+                    totals[rows, features] += change
+                else:
+                    np.add.at(totals, (np.broadcast_to(rows, features.shape), features), change)
+            nodes = children
+        if nodes.ndim == 1:
+            return self.leaf_proba[nodes], totals
+        if contributions:
+            totals /= len(self.roots)
+        return self.leaf_proba[nodes].mean(axis=0), totals
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def compile_model(model, source_sha256: str = "") -> Dict[str, np.ndarray]:
+    """Converts a fitted sklearn classifier into the arrays of a lean artifact."""
+    if hasattr(model, "tree_"):
+        trees = [model]
+    elif hasattr(model, "estimators_") and all(hasattr(tree, "tree_") for tree in model.estimators_):
+        trees = list(model.estimators_)
+    else:
+        trees = None
+
+    arrays: Dict[str, np.ndarray] = {
+        "format_version": np.array(FORMAT_VERSION),
+        "classes": np.asarray(model.classes_),
+        "feature_names": np.asarray(getattr(model, "feature_names_in_", np.arange(model.n_features_in_)), dtype=str),
+        "source_sha256": np.array(source_sha256),
+    }
+    if trees is not None:
+        roots, left, right, feature, threshold, missing, proba = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in trees:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            roots.append(offset)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(np.where(is_leaf, -1, tree.feature))
+            threshold.append(tree.threshold)
+            missing.append(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)))
+            value = tree.value[:, 0, :].astype(np.float64)
+            proba.append(value / np.maximum(value.sum(axis=1, keepdims=True), np.finfo(np.float64).tiny))
+            offset += tree.node_count
+        arrays.update({
+            "kind": np.array("tree"),
+            "roots": np.array(roots, dtype=np.int64),
+            "children_left": np.concatenate(left).astype(np.int64),
+            "children_right": np.concatenate(right).astype(np.int64),
+            "feature": np.concatenate(feature).astype(np.int64),
+            "threshold": np.concatenate(threshold).astype(np.float64),
+            "missing_go_to_left": np.concatenate(missing).astype(bool),
+            "leaf_proba": np.concatenate(proba),
+            "max_depth": np.array(max(estimator.tree_.max_depth for estimator in trees)),
+        })
+    elif hasattr(model, "coef_") and hasattr(model, "predict_proba"):
+        arrays.update({
+            "kind": np.array("linear"),
+            "coef": np.atleast_2d(np.asarray(model.coef_, dtype=np.float64)),
+            "intercept": np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64)),
+        })
+    else:
+        raise TypeError(f"Cannot export {type(model).__name__}: only tree models and linear classifiers are supported")
+    return arrays
+
+
+def verify_parity(model, lean: LeanModel, X: np.ndarray, atol: float = 1e-9) -> float:
+    """Returns the largest probability difference on `X`; raises if it exceeds `atol` or a label differs."""
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        expected = model.predict_proba(X)
+    actual = lean.predict_proba(X)
+    difference = float(np.abs(expected - actual).max()) if len(X) else 0.0
+    if difference > atol or not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+        raise AssertionError(f"Lean model differs from sklearn by up to {difference}")
+    return difference
+
+
+def parity_samples(model, n: int = 20000, seed: int = 0) -> np.ndarray:
+    """Random rows around every split threshold, beyond the data range and with missing values."""
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    thresholds = [[] for _ in range(n_features)]
+    for estimator in (getattr(model, "estimators_", None) or [model]):
+        tree = getattr(estimator, "tree_", None)
+        if tree is None:
+            continue
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature >= 0 and np.isfinite(threshold):
+                thresholds[feature].append(threshold)
+    columns = []
+    for feature in range(n_features):
+        points = np.array(thresholds[feature] or [0.0])
+        span = max(1.0, float(np.ptp(points)))
+        base = rng.choice(points, n) + rng.normal(0.0, span * 0.5, n)
+        exact = rng.random(n) < 0.1
+        base[exact] = rng.choice(points, exact.sum())
+        columns.append(base)
+    X = np.column_stack(columns)
+    X[rng.random(X.shape) < 0.02] = np.nan
+    if hasattr(model, "coef_"):
+        X = np.nan_to_num(X)
+    return X
+
+
+def export_model(model_path: str, out_path: Optional[str] = None, samples: int = 20000) -> Dict[str, Any]:
+    """Compiles `model_path`, checks parity with sklearn and writes the `.npz` artifact."""
+    import joblib
+
+    out_path = out_path or os.path.splitext(model_path)[0] + ".npz"
+    model = joblib.load(model_path)
+    arrays = compile_model(model, file_sha256(model_path))
+    difference = verify_parity(model, LeanModel(arrays), parity_samples(model, samples))
+    np.savez(out_path, **arrays)
+    return {"artifact": out_path, "kind": str(arrays["kind"]), "bytes": os.path.getsize(out_path),
+            "max_probability_difference": difference}
+
+
+def main():
+    from factory_agents_v2.predictor import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Compile the maintenance model into a lean NumPy artifact.")
+    parser.add_argument("model", nargs="?", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--out", help="Artifact path (defaults to the model path with .npz).")
+    parser.add_argument("--samples", type=int, default=20000, help="Rows used for the parity check.")
+    args = parser.parse_args()
+    print(export_model(args.model, args.out, args.samples))
+
+
+if __name__ == "__main__":
+    main()
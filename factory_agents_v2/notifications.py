@@ -0,0 +1,261 @@
+"""
+Outbound Email Notifications for Smart Factory Alerts.
+
+`send_email` tool calls only enqueue a message and return. A background worker
+thread sends them over one reusable, authenticated SMTP connection, coalescing
+alerts to the same recipient within a short window into a single digest, and
+retrying failed sends with exponential backoff.
+
+Configuration comes from the environment: `SMTP_HOST`, `SMTP_PORT`,
+`SMTP_STARTTLS`, `GMAIL_SENDER_EMAIL`, `GMAIL_PASSWORD` and, optionally,
+`ALERT_RECIPIENT_OVERRIDE` to redirect every alert to one address. To test
+locally, run an SMTP stand-in such as `python -m aiosmtpd -n -l localhost:8025`
+and set `SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=false`.
+"""
+import atexit
+import collections
+import itertools
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Any, List, Optional
+
+from factory_agents_v2.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+class EmailDispatcher:
+    """Background email sender with connection reuse, per-recipient digests and retries."""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None,
+                 sender: Optional[str] = None, password: Optional[str] = None,
+                 use_starttls: Optional[bool] = None, digest_window: float = 5.0,
+                 max_retries: int = 3, backoff: float = 1.0, idle_timeout: float = 60.0):
+        """
+        Args:
+            host, port, sender, password, use_starttls: SMTP settings; default to the
+                environment variables described in the module docstring.
+            digest_window: Seconds to hold the first alert for a recipient so later
+                alerts can be sent with it in one digest.
+            max_retries: Send attempts after the first one before a message is marked failed.
+            backoff: Delay before the first retry; doubled on every further retry.
+            idle_timeout: Seconds an unused SMTP connection is kept open.
+        """
+        self.host = host or os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.port = port or int(os.getenv("SMTP_PORT", "587"))
+        self.sender = sender or os.getenv("GMAIL_SENDER_EMAIL", "")
+        self.password = password if password is not None else os.getenv("GMAIL_PASSWORD", "")
+        if use_starttls is None:
+            use_starttls = os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no")
+        self.use_starttls = use_starttls
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.recipient_override = os.getenv("ALERT_RECIPIENT_OVERRIDE") or None
+
+        self._queue: queue.Queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._status: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self._status_lock = threading.Lock()
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.sent_messages = 0
+        self.failed_messages = 0
+        self.connections_opened = 0
+
+    # --- Public API ---
+
+    def enqueue(self, recipient: str, subject: str, body: str) -> str:
+        """Queues an email and returns its message ID without waiting for delivery."""
+        self._ensure_started()
+        message_id = f"msg-{next(self._ids)}"
+        self._set_status(message_id, "queued")
+        self._queue.put({"id": message_id, "recipient": self.recipient_override or recipient,
+                         "subject": subject, "body": body})
+        return message_id
+
+    def status(self, message_id: str) -> str:
+        """Returns "queued", "sent", "failed" or "unknown" for a message ID."""
+        with self._status_lock:
+            return self._status.get(message_id, "unknown")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Sends everything queued or held for a digest now. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        self._ensure_started()
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Flushes pending messages, closes the connection and stops the worker."""
+        if self._thread is None:
+            return
+        self._ensure_started()
+        done = threading.Event()
+        self._queue.put((_STOP, done))
+        # On timeout the worker is still sending; keep it so a later stop() or flush() can wait for it.
+        if done.wait(timeout):
+            self._thread = None
+
+    # --- Worker ---
+
+    def _ensure_started(self) -> None:
+        # A worker that died is replaced; the messages it left in the queue are sent by the new one.
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="EmailDispatcher", daemon=True)
+                    self._thread.start()
+
+    def _set_status(self, message_id: str, status: str) -> None:
+        with self._status_lock:
+            self._status[message_id] = status
+            self._status.move_to_end(message_id)
+            while len(self._status) > 10000:
+                self._status.popitem(last=False)
+
+    def _run(self) -> None:
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        deadlines: Dict[str, float] = {}
+        while True:
+            now = time.monotonic()
+            wait = min(deadlines.values(), default=now + self.idle_timeout) - now
+            try:
+                item = self._queue.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                command, done = item
+                for recipient in list(pending):
+                    self._deliver(recipient, pending.pop(recipient))
+                deadlines.clear()
+                if command is _STOP:
+                    self._close()
+                    done.set()
+                    return
+                done.set()
+                continue
+            if item is not None:
+                pending.setdefault(item["recipient"], []).append(item)
+                deadlines.setdefault(item["recipient"], time.monotonic() + self.digest_window)
+
+            now = time.monotonic()
+            for recipient in [r for r, deadline in deadlines.items() if deadline <= now]:
+                del deadlines[recipient]
+                self._deliver(recipient, pending.pop(recipient))
+            if self._server is not None and now - self._last_used > self.idle_timeout:
+                self._close()
+
+    def _deliver(self, recipient: str, messages: List[Dict[str, Any]]) -> None:
+        """Sends a digest; an unexpected error fails its messages instead of killing the worker."""
+        try:
+            self._send_digest(recipient, messages)
+        except Exception:
+            logger.exception("Sending email to %s failed", recipient)
+            self._close()
+            self.failed_messages += len(messages)
+            for message in messages:
+                self._set_status(message["id"], "failed")
+
+    def _compose(self, recipient: str, messages: List[Dict[str, Any]]) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        if len(messages) == 1:
+            msg['Subject'] = messages[0]["subject"]
+            body = messages[0]["body"]
+        else:
+            msg['Subject'] = f"{len(messages)} maintenance alerts"
+            body = "\n\n---\n\n".join(f"{m['subject']}\n\n{m['body']}" for m in messages)
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+    def _send_digest(self, recipient: str, messages: List[Dict[str, Any]]) -> None:
+        msg = self._compose(recipient, messages)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("smtp_send", messages=len(messages)):
+                    self._connection().send_message(msg)
+                self._last_used = time.monotonic()
+                status = "sent"
+                self.sent_messages += len(messages)
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning("Sending email to %s failed (attempt %d): %s", recipient, attempt + 1, e)
+                self._close()
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        else:
+            status = "failed"
+            self.failed_messages += len(messages)
+        for message in messages:
+            self._set_status(message["id"], status)
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close()
+        with span("smtp_connect", host=self.host):
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            try:
+                if self.use_starttls:
+                    server.starttls()
+                if self.sender and self.password:
+                    server.login(self.sender, self.password)
+            except BaseException:
+                # A half-set-up connection is never kept, so close its socket here.
+                server.close()
+                raise
+        self._server = server
+        self.connections_opened += 1
+        return server
+
+    def _close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+_dispatcher: Optional[EmailDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> EmailDispatcher:
+    """Returns the process-wide dispatcher, creating it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = EmailDispatcher()
+                atexit.register(_dispatcher.stop, 10.0)
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher: Optional[EmailDispatcher]) -> None:
+    """Replaces the process-wide dispatcher (None resets it to the default on next use)."""
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
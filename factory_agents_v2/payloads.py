@@ -0,0 +1,70 @@
+"""
+Compact Tool Payloads for Smart Factory Agents.
+
+Tool results are sent to the LLM as prompt tokens, so every tool serializes its
+result through `to_json`: compact separators, no indentation, and only the
+fields the caller asked for. `to_json` also records each payload's size in
+bytes and (estimated) tokens per tool, exposed through `payload_stats()`.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+_encoder = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the prompt tokens of a payload at ~4 bytes per token.
+
+    With `PAYLOAD_TOKENIZER=tiktoken` the exact gpt-4o count is used instead; it is
+    opt-in because tiktoken downloads its vocabulary on first use.
+    """
+    global _encoder
+    if _encoder is None:
+        _encoder = False
+        if os.getenv("PAYLOAD_TOKENIZER") == "tiktoken":
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                pass
+    if _encoder:
+        return len(_encoder.encode(text))
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def project(records: Iterable[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Keeps only `fields` (in that order) of each record; None keeps every field."""
+    if not fields:
+        return list(records)
+    return [{field: record[field] for field in fields if field in record} for record in records]
+
+
+def to_json(tool_name: str, payload: Any) -> str:
+    """Serializes a tool result compactly and records its size under `tool_name`."""
+    text = json.dumps(payload, separators=(",", ":"))
+    size = len(text.encode("utf-8"))
+    tokens = estimate_tokens(text)
+    with _stats_lock:
+        stats = _stats.setdefault(tool_name, {"calls": 0, "bytes": 0, "tokens": 0, "max_bytes": 0})
+        stats["calls"] += 1
+        stats["bytes"] += size
+        stats["tokens"] += tokens
+        stats["max_bytes"] = max(stats["max_bytes"], size)
+    return text
+
+
+def payload_stats() -> Dict[str, Dict[str, int]]:
+    """Returns per-tool call counts and total/max payload bytes and tokens."""
+    with _stats_lock:
+        return {tool: dict(stats) for tool, stats in _stats.items()}
+
+
+def reset_payload_stats() -> None:
+    """Clears the payload counters."""
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,316 @@
+"""
+Shared Maintenance Model Predictor for Smart Factory Operations.
+
+The model is loaded lazily, once per process, and reused by every tool call.
+It is re-read only when the model file's modification time changes. When the
+lean NumPy artifact compiled by `model_export` (`maintenance_model.npz`) is
+present and was compiled from the current joblib file, it is served instead, so
+scikit-learn, pandas and joblib are never imported; otherwise, or if the
+artifact cannot be loaded, the scikit-learn model is used.
+
+`predict_batch(..., explain=True)` also returns, from the same vectorized pass,
+what drove each verdict: the failure probability against the decision
+threshold (`MAINTENANCE_THRESHOLD`, default: the model's own 0.5 cut-off), each
+sensor's contribution to that probability and how far each sensor is outside
+its normal range.
+"""
+import logging
+import os
+import threading
+import time
+import warnings
+from typing import Dict, Any, List, Optional
+
+from factory_agents_v2.telemetry import span
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maintenance_model.joblib")
+FEATURE_ORDER = ['temperature', 'vibration', 'pressure']
+# Normal operating ranges and units; pressure depends on the machine type, so it has no fixed range.
+NORMAL_RANGES = {"temperature": (50.0, 80.0), "vibration": (0.5, 3.0)}
+UNITS = {"temperature": "°C", "vibration": "mm/s"}
+
+logger = logging.getLogger(__name__)
+
+# The scikit-learn model was fitted on a DataFrame; the arrays it is given have the columns in FEATURE_ORDER.
+# Filtered once here: `warnings.catch_warnings()` around each call is not thread-safe.
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning,
+                        module="sklearn")
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class MaintenancePredictor:
+    """A process-wide, lazily loaded wrapper around the maintenance model."""
+
+    def __init__(self, model_path: Optional[str] = None, mmap_mode: Optional[str] = None,
+                 auto_reload: bool = True, model_format: Optional[str] = None,
+                 threshold: Optional[float] = None):
+        """
+        Args:
+            model_path: Path to the joblib model. Defaults to `MAINTENANCE_MODEL_PATH`
+                from the environment, then to the model shipped with this package.
+            mmap_mode: Passed to `joblib.load` (e.g. "r") to memory-map large arrays.
+                Defaults to `MAINTENANCE_MODEL_MMAP` from the environment.
+            auto_reload: Reload the model when the file's mtime changes.
+            model_format: "auto" (the lean artifact next to the model if it is up to
+                date, else scikit-learn), "lean" or "sklearn". Defaults to
+                `MAINTENANCE_MODEL_FORMAT` from the environment, then "auto".
+            threshold: Failure probability at or above which maintenance is required.
+                Defaults to `MAINTENANCE_THRESHOLD` from the environment; if unset the
+                model's own decision (the most probable class) is used.
+        """
+        self.model_path = model_path or os.getenv("MAINTENANCE_MODEL_PATH") or DEFAULT_MODEL_PATH
+        self.mmap_mode = mmap_mode or os.getenv("MAINTENANCE_MODEL_MMAP") or None
+        self.auto_reload = auto_reload
+        self.model_format = (model_format or os.getenv("MAINTENANCE_MODEL_FORMAT") or "auto").lower()
+        if self.model_path.endswith(".npz"):
+            self.model_format = "lean"
+        self.artifact_path = os.path.splitext(self.model_path)[0] + ".npz"
+        self.backend: Optional[str] = None
+        threshold = threshold if threshold is not None else os.getenv("MAINTENANCE_THRESHOLD")
+        self.threshold: Optional[float] = float(threshold) if threshold not in (None, "") else None
+
+        self._model = None
+        self._explainer = None
+        self._mtime: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.prediction_count = 0
+        self.prediction_seconds = 0.0
+
+    def _needs_load(self) -> bool:
+        if self._model is None:
+            return True
+        if not self.auto_reload:
+            return False
+        mtime = self._file_mtimes()
+        # Keep serving the model already in memory if the files disappear.
+        return mtime != self._mtime and any(t is not None for t in mtime)
+
+    def _file_mtimes(self) -> tuple:
+        return (_mtime(self.model_path), _mtime(self.artifact_path) if self.model_format != "sklearn" else None)
+
+    def _load_lean(self):
+        from factory_agents_v2.model_export import LeanModel, file_sha256
+
+        model = LeanModel.load(self.artifact_path)
+        if (self.model_format == "auto" and os.path.exists(self.model_path)
+                and model.source_sha256 != file_sha256(self.model_path)):
+            raise ValueError(f"{self.artifact_path} was compiled from a different model; "
+                             "re-run `python -m factory_agents_v2.model_export`")
+        return model
+
+    def _load(self):
+        start = time.perf_counter()
+        mtime = self._file_mtimes()
+        model, backend = None, "sklearn"
+        if self.model_format in ("auto", "lean") and mtime[1] is not None:
+            try:
+                with span("model_load", path=self.artifact_path, backend="lean"):
+                    model, backend = self._load_lean(), "lean"
+            except Exception as e:
+                if self.model_format == "lean":
+                    raise
+                logger.warning("Falling back to the scikit-learn model: %s", e)
+        elif self.model_format == "lean":
+            raise FileNotFoundError(self.artifact_path)
+        if model is None:
+            import joblib
+
+            with span("model_load", path=self.model_path, backend="sklearn"):
+                model = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+        self._model, self.backend = model, backend
+        self._explainer = model if backend == "lean" else None
+        self._mtime = mtime
+        self.load_count += 1
+        self.load_seconds += time.perf_counter() - start
+        return self._model
+
+    def load(self):
+        """Loads (or reloads) the model from disk and returns it."""
+        with self._lock:
+            return self._load()
+
+    @property
+    def model(self):
+        """The warm model, loaded on first access and reloaded when the file changes."""
+        if self._needs_load():
+            with self._lock:
+                if self._needs_load():
+                    return self._load()
+        return self._model
+
+    @property
+    def explainer(self):
+        """
+        The model as a `LeanModel`, which computes contributions alongside probabilities.
+
+        With the scikit-learn backend the model is compiled in memory on first use;
+        None if it is of a kind `model_export` cannot compile.
+        """
+        model = self.model
+        if self._explainer is None:
+            from factory_agents_v2.model_export import LeanModel, compile_model
+
+            try:
+                self._explainer = LeanModel(compile_model(model))
+            except TypeError as e:
+                logger.warning("Explanations are unavailable: %s", e)
+                self._explainer = False
+        return self._explainer or None
+
+    @property
+    def model_version(self) -> str:
+        """Identifies the model currently served: its file, backend, modification times and threshold."""
+        self.model  # loads or reloads the model if its file changed
+        return f"{os.path.basename(self.model_path)}:{self.backend}@{self._mtime}>={self.threshold}"
+
+    def predict(self, sensor_data: Dict[str, Any]) -> bool:
+        """Predicts if maintenance is needed for a single set of sensor readings."""
+        return self.predict_batch([sensor_data])[0]["maintenance_required"]
+
+    def predict_batch(self, readings: List[Dict[str, Any]], explain: bool = False) -> List[Dict[str, Any]]:
+        """
+        Scores many sets of sensor readings with a single model call.
+
+        Args:
+            readings: A list of dictionaries with the sensor readings.
+            explain: Also return `threshold`, `contributions`, `deviations` and
+                `main_factor`, computed in the same pass over the batch.
+
+        Returns:
+            A list, in input order, of dictionaries with `maintenance_required`
+            and, when the model supports it, `failure_probability`. With `explain`:
+            `contributions` maps each sensor to how much it moved the failure
+            probability away from the model's prior, `deviations` maps each sensor
+            with a normal range to its distance outside it (0.0 inside, in the
+            sensor's unit, negative below the range) and `main_factor` is the sensor
+            that raised the probability most (None if none did).
+        """
+        if not readings:
+            return []
+
+        model = self.model
+        start = time.perf_counter()
+        features = to_feature_array(readings)
+        contributions = None
+        explainer = self.explainer if explain else None
+        if explainer is not None:
+            # The compiled model matches sklearn's probabilities, so it is the only pass needed.
+            probabilities, contributions = explainer.explain(features)
+        elif hasattr(model, "predict_proba"):
+            probabilities = model.predict_proba(features)
+        else:
+            probabilities = None
+            predictions = model.predict(features)
+
+        failure_probability = None
+        if probabilities is not None:
+            classes = list(model.classes_)
+            positive = classes.index(True) if True in classes else None
+            if positive is not None:
+                failure_probability = probabilities[:, positive]
+                if contributions is not None:
+                    contributions = contributions[:, :, positive]
+            else:
+                failure_probability = probabilities[:, 0] * 0.0
+                contributions = None
+            if self.threshold is not None:
+                predictions = failure_probability >= self.threshold
+            else:
+                predictions = model.classes_[probabilities.argmax(axis=1)]
+        # Plain lists: per-element numpy scalar access would dominate the loop below.
+        if contributions is not None:
+            top_factor = contributions.argmax(axis=1).tolist()
+            top_positive = (contributions.max(axis=1) > 0).tolist()
+            contributions = contributions.round(4).tolist()
+        if explain:
+            deviations = range_deviations(features).round(3).tolist()
+            ranged = [(j, name) for j, name in enumerate(FEATURE_ORDER) if name in NORMAL_RANGES]
+        if failure_probability is not None:
+            failure_probability = failure_probability.round(4).tolist()
+        predictions = predictions.astype(bool).tolist()
+
+        results = []
+        for i in range(len(readings)):
+            result = {"maintenance_required": predictions[i]}
+            if failure_probability is not None:
+                result["failure_probability"] = failure_probability[i]
+            if explain:
+                result["threshold"] = self.threshold if self.threshold is not None else 0.5
+                if contributions is not None:
+                    result["contributions"] = dict(zip(FEATURE_ORDER, contributions[i]))
+                    result["main_factor"] = FEATURE_ORDER[top_factor[i]] if top_positive[i] else None
+                # NaN marks a missing reading.
+                result["deviations"] = {name: (None if deviations[i][j] != deviations[i][j] else deviations[i][j])
+                                        for j, name in ranged}
+            results.append(result)
+
+        seconds = time.perf_counter() - start
+        # Batches are scored on several inference threads at once.
+        with self._stats_lock:
+            self.prediction_count += len(readings)
+            self.prediction_seconds += seconds
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns load-time and per-prediction latency counters."""
+        return {
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "load_count": self.load_count,
+            "load_seconds": self.load_seconds,
+            "prediction_count": self.prediction_count,
+            "prediction_seconds": self.prediction_seconds,
+            "mean_prediction_seconds": (self.prediction_seconds / self.prediction_count
+                                        if self.prediction_count else 0.0),
+        }
+
+
+def to_feature_array(readings: List[Dict[str, Any]]):
+    """Builds a contiguous (N, 3) float array from sensor readings in FEATURE_ORDER."""
+    import numpy as np
+
+    nan = float("nan")
+    features = np.array([[reading.get(name, nan) for name in FEATURE_ORDER] for reading in readings],
+                        dtype=np.float64)
+    return features.reshape(len(readings), len(FEATURE_ORDER))
+
+
+def range_deviations(features):
+    """Signed distance of each value outside its normal range, (N, 3) like `features`; 0 inside or without a range, NaN if missing."""
+    import numpy as np
+
+    low = np.array([NORMAL_RANGES.get(name, (-np.inf, np.inf))[0] for name in FEATURE_ORDER])
+    high = np.array([NORMAL_RANGES.get(name, (-np.inf, np.inf))[1] for name in FEATURE_ORDER])
+    inside = np.where(np.isnan(features), np.nan, 0.0)
+    return np.where(features > high, features - high, np.where(features < low, features - low, inside))
+
+
+_predictor: Optional[MaintenancePredictor] = None
+_predictor_lock = threading.Lock()
+
+
+def get_predictor() -> MaintenancePredictor:
+    """Returns the process-wide predictor, creating it on first use."""
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                _predictor = MaintenancePredictor()
+    return _predictor
+
+
+def set_predictor(predictor: Optional[MaintenancePredictor]) -> None:
+    """Replaces the process-wide predictor (None resets it to the default on next use)."""
+    global _predictor
+    with _predictor_lock:
+        _predictor = predictor
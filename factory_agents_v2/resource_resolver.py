@@ -0,0 +1,86 @@
+"""
+Deterministic Resolver for Parts and Technician Matching.
+
+Implements the InventoryAndResourceAgent's matching rules directly against the
+indexed data layer: the best keyword-matching part, `quantity > 0`, a
+technician with the required skills whose `availability` is "available". It
+returns the same success/failure JSON the agent produces, so the LLM is only
+needed when the issue description matches no part at all. Machine Operators
+(`NON_ASSIGNABLE_ROLES`) are never picked, even when they are available.
+
+With `reserve=True` the part and technician are also claimed, as holds that
+expire unless confirmed: if another ticket takes the last unit or the
+technician first, the next candidate technician is tried, and a ticket that
+cannot get both releases whatever it did get.
+
+On a sharded store (see `sharding`) the part and technician are searched in the
+machine's plant, and in the other plants only when it has none left.
+"""
+from typing import Dict, Any, List, Optional
+
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.storage import NON_ASSIGNABLE_ROLES, FactoryStore
+
+NEEDS_REVIEW = "needs_review"
+
+
+def resolve_maintenance_request(machine_id: str, issue_description: str, required_skills: List[str],
+                                db: Optional[FactoryStore] = None, reserve: bool = False,
+                                hold_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Finds the part and technician for a maintenance task without an LLM.
+
+    Returns:
+        One of the InventoryAndResourceAgent report shapes:
+        `{"status": "success", "part_name", "part_id", "technician_name", "technician_id"}`,
+        `{"status": "failure", "reason": "Part out of stock", "part_name", "part_id"}`,
+        `{"status": "failure", "reason": "No available technician found"}`,
+        or `{"status": "needs_review", "reason": ...}` when no part matches the issue
+        and the request should go to the LLM agent. With `reserve`, a success also
+        has `reservation_ids` (part, then technician) and `hold_expires_at`.
+    """
+    db = (db or get_db()).for_machine(machine_id)
+    if reserve:
+        db.expire_holds()
+    machine_type = db.get_machine_info(machine_id).get("type")
+    if not required_skills and machine_type:
+        required_skills = [machine_type]
+
+    parts = db.find_parts(issue_description, machine_type, limit=1)
+    if not parts:
+        return {"status": NEEDS_REVIEW, "reason": "No part matches the issue description"}
+    part = parts[0]
+    if part["quantity"] <= 0:
+        return {"status": "failure", "reason": "Part out of stock",
+                "part_name": part["name"], "part_id": part["id"]}
+
+    technicians = [tech for tech in db.find_available_technicians(required_skills)
+                   if tech["role"] not in NON_ASSIGNABLE_ROLES]
+    if not technicians:
+        return {"status": "failure", "reason": "No available technician found"}
+    if not reserve:
+        return _success(part, technicians[0])
+
+    part_hold = db.reserve_part(part["id"], 1, machine_id, hold_seconds)
+    if part_hold["status"] != "held":
+        return {"status": "failure", "reason": "Part out of stock",
+                "part_name": part["name"], "part_id": part["id"]}
+    for technician in technicians:
+        technician_hold = db.assign_technician(technician["id"], machine_id, hold_seconds)
+        if technician_hold["status"] == "held":
+            report = _success(part, technician)
+            report["reservation_ids"] = [part_hold["reservation_id"], technician_hold["reservation_id"]]
+            report["hold_expires_at"] = min(part_hold["expires_at"], technician_hold["expires_at"])
+            return report
+    db.release_reservation(part_hold["reservation_id"])
+    return {"status": "failure", "reason": "No available technician found"}
+
+
+def _success(part: Dict[str, Any], technician: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "part_name": part["name"],
+        "part_id": part["id"],
+        "technician_name": technician["name"],
+        "technician_id": technician["id"],
+    }
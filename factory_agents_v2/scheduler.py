@@ -0,0 +1,268 @@
+"""
+Batch Technician Scheduling for Smart Factory Operations.
+
+The resolver handles one ticket at a time and takes the first available
+technician with the right skills, so when several machines fail together a
+versatile technician can be spent on a job somebody else could have done,
+leaving another machine unserved. `schedule_tickets` assigns a whole batch of
+tickets at once instead:
+
+1.  Each ticket gets its best matching part, as in the resolver: when the
+    units run out it falls back to another part with as many matching keywords.
+    Short parts go to the tickets with the highest priority (their
+    `failure_probability`).
+2.  Tickets holding a part are matched to available technicians with a
+    minimum-cost bipartite assignment (Hungarian method, via SciPy). The cost
+    serves as many tickets as possible first, then prefers high-priority
+    tickets, then the technicians with the fewest skills, so generalists stay
+    free for the jobs only they can do.
+3.  Part units of tickets no technician can serve are passed on to the next
+    tickets waiting for such a part, and the matching is solved again.
+
+Tickets with the same skill requirement are interchangeable to the matcher, so
+each group is cut to as many tickets as it has eligible technicians before
+solving; the matrix therefore has at most one row per technician for every
+skill group (skill groups x technicians rows) and one column per technician,
+however many tickets are pending.
+
+On a sharded store (see `sharding`) every plant's tickets are first scheduled
+against that plant's own parts and technicians. Only then are the tickets left
+unserved scheduled again, in rounds: in round k each goes to the k-th plant of
+its plant's fallback order, together with the other plants' tickets sent there,
+and gets only the parts and technicians still left there.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Any, FrozenSet, List, Optional, Set
+
+from factory_agents_v2.MockDB import get_db
+from factory_agents_v2.resource_resolver import NEEDS_REVIEW
+from factory_agents_v2.sharding import PLANT_SEPARATOR, ShardedStore, qualify
+from factory_agents_v2.storage import FactoryStore
+
+# Tie-break per skill of the technician: far below any priority difference worth honoring.
+SPECIALIST_WEIGHT = 1e-6
+# Equally good parts considered per ticket when its first choice runs out.
+PART_CANDIDATES = 10
+
+
+def _priority(ticket: Dict[str, Any]) -> float:
+    return float(ticket.get("failure_probability") or ticket.get("priority") or 0.0)
+
+
+def _match(candidates: List[int], skill_key: Dict[int, FrozenSet[str]], priority: Dict[int, float],
+           eligible: Dict[FrozenSet[str], List[int]], breadth: List[int]) -> Dict[int, int]:
+    """Maximum-priority assignment of candidate tickets to technicians; returns ticket -> technician index."""
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
+
+    groups: Dict[FrozenSet[str], List[int]] = defaultdict(list)
+    for i in candidates:
+        groups[skill_key[i]].append(i)
+    rows: List[int] = []
+    for key, members in groups.items():
+        members.sort(key=lambda i: (-priority[i], i))
+        rows.extend(members[:len(eligible[key])])
+    columns = sorted({j for key in groups for j in eligible[key]})
+    if not rows or not columns:
+        return {}
+    column_of = {j: c for c, j in enumerate(columns)}
+
+    # Serving one more ticket always outweighs any total of priorities.
+    serve_weight = len(rows) * (max(priority[i] for i in rows) + 1.0) + 1.0
+    cost = np.zeros((len(rows), len(columns)))
+    for r, i in enumerate(rows):
+        cols = np.array([column_of[j] for j in eligible[skill_key[i]]])
+        cost[r, cols] = -(serve_weight + priority[i]) + SPECIALIST_WEIGHT * np.array(
+            [breadth[columns[c]] for c in cols])
+    # Pairs without a qualified technician cost 0 and are dropped from the result.
+    row_ind, col_ind = linear_sum_assignment(cost)
+    return {rows[r]: columns[c] for r, c in zip(row_ind, col_ind) if cost[r, c] < 0}
+
+
+def schedule_tickets(tickets: List[Dict[str, Any]], db: Optional[FactoryStore] = None, reserve: bool = False,
+                     hold_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Assigns parts and technicians to a batch of maintenance tickets in one pass.
+
+    Args:
+        tickets: Dicts with `machine_id`, `issue_description`, `required_skills`
+            and optionally `failure_probability` (or `priority`), used to decide
+            which tickets win when parts or technicians run short.
+        db: The store to schedule against; defaults to `get_db()`.
+        reserve: Hold the chosen parts and technicians, as
+            `resolve_maintenance_request(..., reserve=True)` does.
+        hold_seconds: Hold duration; defaults to `default_hold_seconds()`.
+
+    Returns:
+        One report per ticket, in input order, in the shapes returned by
+        `resolve_maintenance_request`.
+    """
+    db = db or get_db()
+    if reserve:
+        db.expire_holds()
+    if isinstance(db, ShardedStore):
+        return _schedule_by_plant(tickets, db, reserve, hold_seconds)
+    return _schedule(tickets, db, reserve, hold_seconds)
+
+
+class _Taken:
+    """Part units and technicians given out by earlier passes over the same plant, when nothing is reserved."""
+
+    def __init__(self):
+        self.parts: Counter = Counter()
+        self.technicians: Set[str] = set()
+
+
+def _schedule_by_plant(tickets: List[Dict[str, Any]], db: ShardedStore, reserve: bool,
+                       hold_seconds: Optional[float]) -> List[Dict[str, Any]]:
+    reports: List[Optional[Dict[str, Any]]] = [None] * len(tickets)
+    origin = [db.plant_of(ticket["machine_id"]) for ticket in tickets]
+    unknown = [i for i, plant in enumerate(origin) if plant is None]
+    for i, report in zip(unknown, _schedule([tickets[i] for i in unknown], db, reserve, hold_seconds)):
+        reports[i] = report
+
+    # Reserved holds already show in the plants' stock and staff; otherwise each pass must be told.
+    taken: Dict[str, _Taken] = defaultdict(_Taken)
+    order = {plant: [plant] + db.fallback_order(plant) for plant in set(origin) if plant is not None}
+    pending = [i for i, plant in enumerate(origin) if plant is not None]
+    # Round 0 is every plant's own tickets; round k sends what is left to the k-th fallback plant.
+    for round_ in range(max((len(plants) for plants in order.values()), default=0)):
+        by_plant: Dict[str, List[int]] = defaultdict(list)
+        for i in pending:
+            if round_ < len(order[origin[i]]):
+                by_plant[order[origin[i]][round_]].append(i)
+        if not by_plant:
+            break
+        pending = []
+        for plant, indices in by_plant.items():
+            store = db.for_plant(plant, fallback=False)
+            results = _schedule([tickets[i] for i in indices], store, reserve, hold_seconds,
+                                None if reserve else taken[plant])
+            for i, report in zip(indices, results):
+                if plant != origin[i]:
+                    # IDs as seen from the ticket's plant.
+                    for field in ("part_id", "technician_id"):
+                        if field in report and PLANT_SEPARATOR not in report[field]:
+                            report[field] = qualify(plant, report[field])
+                # The local verdict stands unless another plant can do the job.
+                if reports[i] is None or report["status"] == "success":
+                    reports[i] = report
+                if report["status"] != "success":
+                    pending.append(i)
+    return reports
+
+
+def _schedule(tickets: List[Dict[str, Any]], db: FactoryStore, reserve: bool,
+              hold_seconds: Optional[float], taken: Optional[_Taken] = None) -> List[Dict[str, Any]]:
+    def left(part: Dict[str, Any]) -> int:
+        return part["quantity"] - (taken.parts[part["id"]] if taken is not None else 0)
+
+    reports: List[Optional[Dict[str, Any]]] = [None] * len(tickets)
+    candidates: Dict[int, List[Dict[str, Any]]] = {}
+    skill_key: Dict[int, FrozenSet[str]] = {}
+    priority: Dict[int, float] = {}
+    stock: Dict[str, int] = {}
+    # Diagnoses repeat the same few issue descriptions, so part searches are shared.
+    searches: Dict[tuple, List[Dict[str, Any]]] = {}
+    for i, ticket in enumerate(tickets):
+        machine_type = db.get_machine_info(ticket["machine_id"]).get("type")
+        skills = ticket.get("required_skills") or ([machine_type] if machine_type else [])
+        search = (ticket["issue_description"], machine_type)
+        if search not in searches:
+            searches[search] = db.find_parts(*search, limit=PART_CANDIDATES)
+        parts = searches[search]
+        if not parts:
+            reports[i] = {"status": NEEDS_REVIEW, "reason": "No part matches the issue description"}
+            continue
+        if left(parts[0]) <= 0:
+            reports[i] = _out_of_stock(parts[0])
+            continue
+        best = len(parts[0]["matched_keywords"])
+        candidates[i] = [part for part in parts if left(part) > 0 and len(part["matched_keywords"]) == best]
+        for part in candidates[i]:
+            stock[part["id"]] = left(part)
+        skill_key[i] = frozenset(skill.lower() for skill in skills)
+        priority[i] = _priority(ticket)
+
+    technicians = [tech for tech in db.get_technicians(available_only=True, assignable_only=True)
+                   if taken is None or tech["id"] not in taken.technicians]
+    technician_skills = [frozenset(skill.lower() for skill in tech["skills"]) for tech in technicians]
+    breadth = [len(skills) for skills in technician_skills]
+    eligible = {key: [j for j, skills in enumerate(technician_skills) if key <= skills]
+                for key in set(skill_key.values())}
+
+    # Tickets still competing for a part unit, best first.
+    waiting: List[int] = []
+    for i in sorted(candidates, key=lambda i: (-priority[i], i)):
+        if eligible[skill_key[i]]:
+            waiting.append(i)
+        else:
+            reports[i] = {"status": "failure", "reason": "No available technician found"}
+
+    part_of: Dict[int, Dict[str, Any]] = {}
+    holders: List[int] = []
+    assignment: Dict[int, int] = {}
+    while True:
+        still_waiting = []
+        for i in waiting:
+            part = next((part for part in candidates[i] if stock[part["id"]] > 0), None)
+            if part is None:
+                still_waiting.append(i)
+                continue
+            stock[part["id"]] -= 1
+            part_of[i] = part
+            holders.append(i)
+        waiting = still_waiting
+        assignment = _match(holders, skill_key, priority, eligible, breadth)
+        unserved = [i for i in holders if i not in assignment]
+        freed = {part_of[i]["id"] for i in unserved}
+        if not any(part["id"] in freed for i in waiting for part in candidates[i]):
+            break
+        # Their part units go to the next tickets in line for those parts.
+        for i in unserved:
+            stock[part_of[i]["id"]] += 1
+            reports[i] = {"status": "failure", "reason": "No available technician found"}
+        holders = list(assignment)
+
+    for i in holders:
+        if i not in assignment:
+            reports[i] = {"status": "failure", "reason": "No available technician found"}
+    for i in waiting:
+        reports[i] = _out_of_stock(candidates[i][0])
+
+    for i, j in sorted(assignment.items()):
+        part, technician = part_of[i], technicians[j]
+        report = {
+            "status": "success",
+            "part_name": part["name"],
+            "part_id": part["id"],
+            "technician_name": technician["name"],
+            "technician_id": technician["id"],
+        }
+        if reserve:
+            report = _reserve(db, tickets[i]["machine_id"], report, hold_seconds)
+        elif taken is not None:
+            taken.parts[part["id"]] += 1
+            taken.technicians.add(technician["id"])
+        reports[i] = report
+    return reports
+
+
+def _out_of_stock(part: Dict[str, Any]) -> Dict[str, Any]:
+    return {"status": "failure", "reason": "Part out of stock", "part_name": part["name"], "part_id": part["id"]}
+
+
+def _reserve(db: FactoryStore, machine_id: str, report: Dict[str, Any],
+             hold_seconds: Optional[float]) -> Dict[str, Any]:
+    part_hold = db.reserve_part(report["part_id"], 1, machine_id, hold_seconds)
+    if part_hold["status"] != "held":
+        return {"status": "failure", "reason": "Part out of stock",
+                "part_name": report["part_name"], "part_id": report["part_id"]}
+    technician_hold = db.assign_technician(report["technician_id"], machine_id, hold_seconds)
+    if technician_hold["status"] != "held":
+        # Taken by a concurrent request since the batch was read.
+        db.release_reservation(part_hold["reservation_id"])
+        return {"status": "failure", "reason": "No available technician found"}
+    report["reservation_ids"] = [part_hold["reservation_id"], technician_hold["reservation_id"]]
+    report["hold_expires_at"] = min(part_hold["expires_at"], technician_hold["expires_at"])
+    return report
@@ -0,0 +1,236 @@
+"""
+Sensor History Store for Smart Factory Operations.
+
+Keeps a bounded, append-only ring buffer of (timestamp, temperature, vibration,
+pressure) rows per machine in NumPy arrays. When a directory is configured each
+buffer is a memory-mapped `.npy` file, so history survives restarts. Windowed
+aggregates (mean, max, slope, EWMA) are computed with vectorized NumPy over the
+rows inside the window.
+
+Readings arrive through the streaming pipeline, which records every reading it
+scores in `get_history()` (see `streaming`), and through
+`fetch_machine_readings`, which records the latest reading it fetches. Rows are
+kept in timestamp order: `append` rejects a reading older than the machine's
+last one, and `observe` skips it.
+"""
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple, Union
+
+from factory_agents_v2.predictor import FEATURE_ORDER
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sensor_history")
+DEFAULT_CAPACITY = 10080  # One week of one-minute readings.
+
+
+def parse_timestamp(timestamp: Union[str, float, int, datetime]) -> float:
+    """Converts a reading timestamp (ISO string, datetime or epoch seconds) to epoch seconds."""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class _RingBuffer:
+    """One machine's history: row 0 holds metadata, rows 1..capacity hold readings."""
+
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        import numpy as np
+
+        if path is None:
+            self._data = np.zeros((capacity + 1, 1 + len(FEATURE_ORDER)), dtype=np.float64)
+        elif os.path.exists(path):
+            self._data = np.load(path, mmap_mode="r+")
+        else:
+            self._data = np.lib.format.open_memmap(
+                path, mode="w+", dtype=np.float64, shape=(capacity + 1, 1 + len(FEATURE_ORDER)))
+        self.capacity = self._data.shape[0] - 1
+        self._rows = self._data[1:]
+
+    @property
+    def total(self) -> int:
+        return int(self._data[0, 0])
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def last_timestamp(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return float(self._rows[(self.total - 1) % self.capacity, 0])
+
+    def append(self, timestamp: float, values) -> None:
+        total = self.total
+        self._rows[total % self.capacity, 0] = timestamp
+        self._rows[total % self.capacity, 1:] = values
+        self._data[0, 0] = total + 1
+
+    def ordered(self):
+        """Returns the stored rows, oldest first."""
+        import numpy as np
+
+        total = self.total
+        if total <= self.capacity:
+            return self._rows[:total]
+        head = total % self.capacity
+        return np.concatenate((self._rows[head:], self._rows[:head]))
+
+    def flush(self) -> None:
+        if hasattr(self._data, "flush"):
+            self._data.flush()
+
+
+class SensorHistory:
+    """Bounded per-machine sensor history with windowed aggregates."""
+
+    def __init__(self, directory: Optional[str] = None, capacity: Optional[int] = None):
+        """
+        Args:
+            directory: Where the memory-mapped buffers live. None keeps history in memory only.
+            capacity: Readings kept per machine; the oldest are overwritten first.
+        """
+        self.directory = directory
+        self.capacity = capacity or DEFAULT_CAPACITY
+        self._buffers: Dict[str, _RingBuffer] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _buffer(self, machine_id: str, create: bool = True) -> Optional[_RingBuffer]:
+        buffer = self._buffers.get(machine_id)
+        if buffer is None:
+            path = None
+            if self.directory:
+                path = os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", machine_id) + ".npy")
+                if not create and not os.path.exists(path):
+                    return None
+            elif not create:
+                return None
+            buffer = self._buffers[machine_id] = _RingBuffer(self.capacity, path)
+        return buffer
+
+    def append(self, machine_id: str, reading: Dict[str, Any]) -> None:
+        """
+        Appends one reading in O(1).
+
+        Args:
+            machine_id: The machine the reading belongs to.
+            reading: A dict with `timestamp` and the sensor values, as returned by
+                `get_machine_details`.
+
+        Raises:
+            ValueError: If the reading is older than the machine's last stored one;
+                windows rely on the rows being in timestamp order.
+        """
+        timestamp = parse_timestamp(reading["timestamp"])
+        values = [float(reading[name]) for name in FEATURE_ORDER]
+        with self._lock:
+            buffer = self._buffer(machine_id)
+            last = buffer.last_timestamp()
+            if last is not None and timestamp < last:
+                raise ValueError(f"Reading for {machine_id} at {timestamp} is older than the last one at {last}")
+            buffer.append(timestamp, values)
+
+    def observe(self, machine_id: str, reading: Dict[str, Any]) -> bool:
+        """Appends a reading only if it is newer than the last stored one. Returns True if appended."""
+        timestamp = parse_timestamp(reading["timestamp"])
+        with self._lock:
+            buffer = self._buffer(machine_id)
+            last = buffer.last_timestamp()
+            if last is not None and timestamp <= last:
+                return False
+            buffer.append(timestamp, [float(reading[name]) for name in FEATURE_ORDER])
+            return True
+
+    def window(self, machine_id: str, minutes: float, now: Optional[float] = None) -> Tuple[Any, Any]:
+        """
+        Returns `(timestamps, values)` for the readings of the last `minutes`.
+
+        The window ends at `now` (epoch seconds), defaulting to the latest reading.
+        `values` has one column per feature in `FEATURE_ORDER`.
+        """
+        import numpy as np
+
+        with self._lock:
+            buffer = self._buffer(machine_id, create=False)
+            rows = buffer.ordered().copy() if buffer is not None else np.empty((0, 1 + len(FEATURE_ORDER)))
+        if not len(rows):
+            return rows[:, 0], rows[:, 1:]
+        end = rows[-1, 0] if now is None else now
+        start = np.searchsorted(rows[:, 0], end - minutes * 60.0, side="left")
+        stop = np.searchsorted(rows[:, 0], end, side="right")
+        return rows[start:stop, 0], rows[start:stop, 1:]
+
+    def aggregates(self, machine_id: str, minutes: float, ewma_halflife_minutes: Optional[float] = None,
+                   now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Rolling mean, max, slope (units per minute) and EWMA of each feature over the last `minutes`.
+
+        The EWMA is time-weighted with a half-life of `ewma_halflife_minutes`
+        (a quarter of the window by default).
+        """
+        import numpy as np
+
+        timestamps, values = self.window(machine_id, minutes, now)
+        result: Dict[str, Any] = {"window_minutes": minutes, "count": int(len(timestamps))}
+        if not len(timestamps):
+            return result
+
+        halflife = (ewma_halflife_minutes or minutes / 4.0) * 60.0
+        weights = np.power(0.5, (timestamps[-1] - timestamps) / halflife)
+        ewma = weights @ values / weights.sum()
+
+        x = (timestamps - timestamps.mean()) / 60.0
+        denominator = float(x @ x)
+        slope = x @ (values - values.mean(axis=0)) / denominator if denominator else np.zeros(values.shape[1])
+
+        means = values.mean(axis=0)
+        maxes = values.max(axis=0)
+        for i, name in enumerate(FEATURE_ORDER):
+            result[name] = {
+                "mean": round(float(means[i]), 4),
+                "max": round(float(maxes[i]), 4),
+                "slope_per_minute": round(float(slope[i]), 6),
+                "ewma": round(float(ewma[i]), 4),
+            }
+        return result
+
+    def flush(self) -> None:
+        """Flushes memory-mapped buffers to disk."""
+        with self._lock:
+            for buffer in self._buffers.values():
+                buffer.flush()
+
+
+_history: Optional[SensorHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> SensorHistory:
+    """
+    Returns the process-wide sensor history, creating it on first use.
+
+    It is stored under `SENSOR_HISTORY_DIR` (default: `sensor_history/` next to
+    this package; set it to ":memory:" to keep history in memory only) with
+    `SENSOR_HISTORY_CAPACITY` readings per machine.
+    """
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                directory = os.getenv("SENSOR_HISTORY_DIR") or DEFAULT_HISTORY_DIR
+                capacity = int(os.getenv("SENSOR_HISTORY_CAPACITY") or DEFAULT_CAPACITY)
+                _history = SensorHistory(None if directory == ":memory:" else directory, capacity)
+    return _history
+
+
+def set_history(history: Optional[SensorHistory]) -> None:
+    """Replaces the process-wide sensor history (None resets it to the default on next use)."""
+    global _history
+    with _history_lock:
+        _history = history
@@ -0,0 +1,293 @@
+"""
+Session Context Compaction for Smart Factory Agents.
+
+ADK sends an agent the whole session on every model turn: the user's requests,
+the orchestrator's tool calls and results, and the sub-agents' transcripts (raw
+`fetch_machine_readings`, `get_inventory` and `get_technicians` results and
+their transfers back), replayed as "For context:" messages. Over a shift-long
+session every new diagnostic would resend all of it. Every agent therefore gets
+`compact_request` as its `before_model_callback` (see `context_callbacks()`),
+which rewrites the request before it reaches the model:
+
+- each completed episode (a user request and everything up to the next one)
+  becomes the request plus one structured summary: the machine, the verdict,
+  the part, the technician and the alert status;
+- in the current episode, agent transfers by other agents are dropped and their
+  tool results are cut short, since each sub-agent's answer carries its
+  conclusion;
+- the oldest summaries are dropped beyond a number of episodes, or while the
+  request exceeds a token budget. The current episode is always sent whole.
+
+Only the model request is rewritten; the session keeps the full history, so
+`adk web` still shows the complete conversation. ADK still copies that history
+on every turn; services that build their own `Runner` and do not need the
+history can opt in to storing the summaries in place of the episodes with
+`CompactingSessionService` (see `session_service`). Configuration comes from the
+environment: `SESSION_CONTEXT_EPISODES` (summaries kept, default 20),
+`SESSION_CONTEXT_TOKENS` (prompt budget, default 8000),
+`SESSION_TOOL_RESULT_CHARS` (default 400) and `SESSION_COMPACTION=off` to send
+the full history.
+"""
+import ast
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from factory_agents_v2.payloads import estimate_tokens
+from factory_agents_v2.telemetry import span
+
+FOREIGN_PREFIX = "For context:"
+SUMMARY_PREFIX = "Completed:"
+
+# The lines ADK writes for another agent's turns (see google.adk.flows.llm_flows.contents).
+_CALL = re.compile(r"\[([^\]]+)\] called tool `([^`]+)` with parameters: (.*)", re.S)
+_RESULT = re.compile(r"\[([^\]]+)\] `([^`]+)` tool returned result: (.*)", re.S)
+_SAID = re.compile(r"\[([^\]]+)\] said: (.*)", re.S)
+
+# (kind, tool name or agent, payload), kind being "call", "result" or "text".
+Step = Tuple[str, Optional[str], Any]
+
+
+def _decode(value: Any) -> Any:
+    """Tool results arrive as `{"result": "<json>"}` or as the tool's own dict."""
+    if isinstance(value, dict) and list(value) == ["result"]:
+        value = value["result"]
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _literal(text: str) -> Any:
+    # Foreign calls and results are rendered with Python's repr.
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return text
+
+
+def is_request(content) -> bool:
+    """Whether `content` is a message typed by the user, which starts an episode."""
+    if content.role != "user" or not content.parts:
+        return False
+    first = content.parts[0]
+    return bool(first.text) and not first.text.startswith(FOREIGN_PREFIX)
+
+
+def _steps(contents) -> Iterator[Step]:
+    """The calls, results and replies in `contents`, the agent's own and other agents' alike."""
+    for content in contents:
+        for part in content.parts or []:
+            if part.function_call is not None:
+                yield "call", part.function_call.name, dict(part.function_call.args or {})
+            elif part.function_response is not None:
+                yield "result", part.function_response.name, _decode(part.function_response.response or {})
+            elif part.text and content.role == "model":
+                yield "text", None, part.text
+            elif part.text:
+                for pattern, kind in ((_CALL, "call"), (_RESULT, "result")):
+                    match = pattern.fullmatch(part.text)
+                    if match:
+                        payload = _literal(match.group(3))
+                        yield kind, match.group(2), _decode(payload) if kind == "result" else payload
+                        break
+                else:
+                    match = _SAID.fullmatch(part.text)
+                    if match:
+                        yield "text", match.group(1), match.group(2)
+
+
+def _logistics(report: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {"logistics": report.get("status")}
+    for field, key in (("part_id", "part"), ("technician_name", "technician"), ("reason", "reason")):
+        if report.get(field):
+            summary[key] = report[field]
+    return summary
+
+
+def summarize_episode(contents) -> Dict[str, Any]:
+    """
+    Reduces one completed episode to the facts later turns may refer to.
+
+    Returns:
+        A dict with the `machine`, `maintenance_required`, `failure_probability`
+        and `issue` of the diagnosis, the `logistics` status with its `part`,
+        `technician` or `reason`, the `alert` status, and the final `answer`
+        (shortened); keys without a value in the episode are left out.
+    """
+    summary: Dict[str, Any] = {}
+    answer = None
+    for kind, name, payload in _steps(contents[1:]):
+        if kind == "text":
+            answer = payload
+            report = _decode(payload)
+            # A sub-agent's answer is the logistics JSON itself.
+            if isinstance(report, dict) and report.get("status") and ("part_id" in report or "reason" in report):
+                summary.update(_logistics(report))
+            continue
+        if not isinstance(payload, dict):
+            continue
+        if kind == "call":
+            if payload.get("machine_id"):
+                summary.setdefault("machine", payload["machine_id"])
+            continue
+        if name in ("get_machine_diagnosis", "predict_maintenance"):
+            if "error" in payload:
+                summary["error"] = payload["error"]
+                continue
+            for field, key in (("machine_id", "machine"), ("maintenance_required", "maintenance_required"),
+                               ("failure_probability", "failure_probability"), ("issue_description", "issue")):
+                if payload.get(field) is not None:
+                    summary[key] = payload[field]
+        elif name in ("resolve_maintenance_logistics", "reserve_maintenance_resources"):
+            summary.update(_logistics(payload))
+        elif name == "send_email":
+            summary["alert"] = payload.get("status")
+        elif name == "run_fleet_diagnostics":
+            summary["fleet"] = {"machines_checked": payload.get("machines_checked"),
+                                "maintenance_required": [ticket.get("machine_id") for ticket in
+                                                         payload.get("maintenance_required", [])][:20]}
+    if answer:
+        summary["answer"] = answer if len(answer) <= 200 else answer[:200] + "..."
+    return summary
+
+
+def summary_text(contents) -> str:
+    """The text that stands in for a completed episode: `SUMMARY_PREFIX` and its summary as JSON."""
+    return f"{SUMMARY_PREFIX} {json.dumps(summarize_episode(contents), separators=(',', ':'))}"
+
+
+def is_compacted(contents) -> bool:
+    """Whether an episode already consists of its request and a summary, as the agent or another one sees it."""
+    if len(contents) != 2:
+        return False
+    steps = list(_steps(contents[1:]))
+    return len(steps) == 1 and steps[0][0] == "text" and steps[0][2].startswith(SUMMARY_PREFIX)
+
+
+def _size(content) -> int:
+    """Estimated prompt tokens of one content."""
+    text = []
+    for part in content.parts or []:
+        if part.text:
+            text.append(part.text)
+        elif part.function_call is not None:
+            text.append(json.dumps(part.function_call.args or {}, default=str))
+        elif part.function_response is not None:
+            text.append(json.dumps(part.function_response.response or {}, default=str))
+    return estimate_tokens("".join(text))
+
+
+class ContextCompactor:
+    """Rewrites the contents of a model request into summaries plus the current episode."""
+
+    def __init__(self, max_episodes: int = 20, max_tokens: int = 8000, tool_result_chars: int = 400,
+                 enabled: bool = True):
+        """
+        Args:
+            max_episodes: Most completed episodes kept as summaries.
+            max_tokens: Estimated prompt tokens of the contents above which the oldest
+                summaries are dropped.
+            tool_result_chars: Length other agents' tool results are cut to in the
+                current episode.
+            enabled: False leaves every request unchanged.
+        """
+        self.max_episodes = max_episodes
+        self.max_tokens = max_tokens
+        self.tool_result_chars = tool_result_chars
+        self.enabled = enabled
+
+    def compact(self, contents: List[Any]) -> List[Any]:
+        """Returns the compacted contents; the given list is not modified."""
+        if not self.enabled:
+            return contents
+        starts = [i for i, content in enumerate(contents) if is_request(content)]
+        if not starts:
+            return self._trim_current(contents)
+        history = contents[:starts[0]]
+        bounds = list(zip(starts, starts[1:]))[-self.max_episodes:] if self.max_episodes > 0 else []
+        summaries = [self._summary(contents[start:end]) for start, end in bounds]
+
+        current = self._trim_current(contents[starts[-1]:])
+        budget = self.max_tokens - sum(_size(content) for content in history + current)
+        sizes = [sum(_size(content) for content in summary) for summary in summaries]
+        while summaries and sum(sizes) > budget:
+            summaries.pop(0)
+            sizes.pop(0)
+        return history + [content for summary in summaries for content in summary] + current
+
+    def _summary(self, episode: List[Any]) -> List[Any]:
+        from google.genai import types
+
+        if is_compacted(episode):
+            return episode
+        return [
+            types.Content(role="user", parts=[types.Part(text=episode[0].parts[0].text)]),
+            types.Content(role="model", parts=[types.Part(text=summary_text(episode))]),
+        ]
+
+    def _trim_current(self, episode: List[Any]) -> List[Any]:
+        from google.genai import types
+
+        trimmed = []
+        for content in episode:
+            parts = content.parts or []
+            if content.role != "user" or not parts or parts[0].text != FOREIGN_PREFIX:
+                trimmed.append(content)
+                continue
+            kept = [parts[0]]
+            for part in parts[1:]:
+                text = part.text or ""
+                if "`transfer_to_agent`" in text and (_CALL.fullmatch(text) or _RESULT.fullmatch(text)):
+                    continue
+                if len(text) > self.tool_result_chars and _RESULT.fullmatch(text):
+                    part = types.Part(text=text[:self.tool_result_chars] + "... (truncated)")
+                kept.append(part)
+            if len(kept) > 1:
+                trimmed.append(types.Content(role=content.role, parts=kept))
+        return trimmed
+
+
+_compactor: Optional[ContextCompactor] = None
+_compactor_lock = threading.Lock()
+
+
+def get_compactor() -> ContextCompactor:
+    """Returns the process-wide compactor, configured from the environment on first use."""
+    global _compactor
+    if _compactor is None:
+        with _compactor_lock:
+            if _compactor is None:
+                _compactor = ContextCompactor(
+                    max_episodes=int(os.getenv("SESSION_CONTEXT_EPISODES") or 20),
+                    max_tokens=int(os.getenv("SESSION_CONTEXT_TOKENS") or 8000),
+                    tool_result_chars=int(os.getenv("SESSION_TOOL_RESULT_CHARS") or 400),
+                    enabled=os.getenv("SESSION_COMPACTION", "on").lower() not in ("0", "off", "false", "no"),
+                )
+    return _compactor
+
+
+def set_compactor(compactor: Optional[ContextCompactor]) -> None:
+    """Replaces the process-wide compactor (None resets it to the default on next use)."""
+    global _compactor
+    with _compactor_lock:
+        _compactor = compactor
+
+
+def compact_request(callback_context, llm_request) -> None:
+    """`before_model_callback` that compacts the request's contents in place; the model is still called."""
+    compactor = get_compactor()
+    if not compactor.enabled or not llm_request.contents:
+        return None
+    with span("compact_context", agent=callback_context.agent_name, contents_before=len(llm_request.contents)):
+        llm_request.contents = compactor.compact(llm_request.contents)
+    return None
+
+
+def context_callbacks() -> Dict[str, Callable]:
+    """Keyword arguments that make an `LlmAgent` send compacted session context."""
+    return {"before_model_callback": compact_request}
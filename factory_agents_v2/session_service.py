@@ -0,0 +1,79 @@
+"""
+Compacting Session Storage for Smart Factory Agents.
+
+`compact_request` (see `session_context`) keeps the model's prompt small while
+the session keeps its full history; that is the default, and what `adk web`
+serves. ADK still copies and scans every stored event of a session on every
+turn, so each diagnostic of a very long session is a little slower than the
+one before.
+
+`CompactingSessionService` is an opt-in in-memory session service for runners
+that need that overhead bounded and do not need the conversation afterwards:
+when a new user request arrives, it replaces each completed episode with its
+request and the same structured summary the model would be sent, and keeps
+only the most recent `max_episodes` of them. This is lossy and permanent:
+the stored events are gone, and so is everything the summary leaves out (such
+as reservation IDs). Use it only by building a `Runner` with it:
+
+    Runner(app_name="factory", agent=get_root_agent(), session_service=CompactingSessionService(),
+           artifact_service=InMemoryArtifactService())
+"""
+from typing import List, Optional
+
+from google.adk.events.event import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+from factory_agents_v2.session_context import get_compactor, is_compacted, is_request, summary_text
+
+
+class CompactingSessionService(InMemorySessionService):
+    """In-memory session service that stores completed episodes as summaries."""
+
+    def __init__(self, max_episodes: Optional[int] = None):
+        """
+        Args:
+            max_episodes: Most completed episodes kept per session; defaults to the
+                compactor's `SESSION_CONTEXT_EPISODES`.
+        """
+        super().__init__()
+        self.max_episodes = max_episodes if max_episodes is not None else get_compactor().max_episodes
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.author == "user" and not event.partial and event.content and is_request(event.content):
+            # Every earlier episode is complete once the next request arrives.
+            events = self._compact(session.events)
+            session.events = events
+            storage = self.sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id)
+            if storage is not None and storage is not session:
+                storage.events = [stored.model_copy() for stored in events]
+        return super().append_event(session=session, event=event)
+
+    def _compact(self, events: List[Event]) -> List[Event]:
+        starts = [i for i, event in enumerate(events)
+                  if event.author == "user" and event.content and is_request(event.content)]
+        if not starts:
+            return events
+        bounds = list(zip(starts, starts[1:] + [len(events)]))
+        bounds = bounds[-self.max_episodes:] if self.max_episodes > 0 else []
+        compacted = list(events[:starts[0]])
+        for start, end in bounds:
+            compacted.extend(self._summarize(events[start:end]))
+        return compacted
+
+    @staticmethod
+    def _summarize(episode: List[Event]) -> List[Event]:
+        contents = [event.content for event in episode if event.content and event.content.parts]
+        if is_compacted(contents) or len(contents) < 2:
+            return episode
+        request, last = episode[0], episode[-1]
+        # Authored by the agent that answered last, so ADK routes the next request the same way.
+        author = next((event.author for event in reversed(episode) if event.author != "user"), last.author)
+        summary = Event(
+            invocation_id=last.invocation_id,
+            author=author,
+            branch=last.branch,
+            timestamp=last.timestamp,
+            content=types.Content(role="model", parts=[types.Part(text=summary_text(contents))]),
+        )
+        return [request, summary]
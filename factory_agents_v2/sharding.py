@@ -0,0 +1,568 @@
+"""
+Multi-Plant Sharding of Smart Factory Data.
+
+One `MockDB` holds a single factory, and every query scans its indexes in
+full, so putting every plant of a company in it makes each part and technician
+search grow with the number of plants, and returns parts and people from
+plants on the other side of the country. `ShardedStore` partitions the data by
+plant instead:
+
+- each plant is its own store (a `MockDB` by default), built and indexed only
+  when the plant is first used, with its own diagnostic cache;
+- machine IDs are routed to their plant through a directory of machine IDs, so
+  a machine lookup touches only its plant;
+- a plant's part keywords and technician skills are kept in the same directory,
+  so a search across plants (a query without a machine, or a fallback) loads
+  only the plants that can match it; plants registered without them are loaded
+  to find out;
+- `for_machine(machine_id)` returns a `PlantView` that answers inventory and
+  technician queries from the machine's plant, and searches the other plants
+  (neighbors first, if configured, else the next plants in turn) only when the
+  local stock or staff is exhausted.
+
+Part and technician IDs are local to a plant, so the same catalog number can be
+stocked in several plants: a view returns the records of its own plant with
+their IDs unchanged, and those of another plant as `"<plant>:<id>"`, which the
+reservation methods route back to that plant. Reservation IDs always carry
+their plant.
+
+`load_plants()` builds a sharded store from one directory per plant, reading
+only the columns the directory needs up front, and `FACTORY_DB_BACKEND=sharded`
+makes `get_db()` return one over the plant directories in `FACTORY_PLANTS_DIR`
+(see `MockDB`).
+`FACTORY_FALLBACK_PLANTS` caps how many other plants a fallback searches.
+Listing every plant's inventory or technicians still loads every plant.
+"""
+import csv
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.storage import (LIST_COLUMNS, NON_ASSIGNABLE_ROLES, TABLES, FactoryStore, load_csv,
+                                       matching_phrases, rank_part_matches, seed_sample_data, tokenize)
+from factory_agents_v2.telemetry import span
+
+# Separates the plant from a record or reservation ID of that plant: "<plant>:<id>".
+PLANT_SEPARATOR = ":"
+
+
+def qualify(plant: str, record_id: str) -> str:
+    """The ID of a record or reservation of `plant` as seen from outside the plant."""
+    return f"{plant}{PLANT_SEPARATOR}{record_id}"
+
+
+def _phrase_index(keywords: Iterable[str]) -> Dict[str, Set[str]]:
+    """Keyword phrases by their first word, as `matching_phrases` takes them."""
+    phrases: Dict[str, Set[str]] = {}
+    for keyword in keywords:
+        phrase = " ".join(tokenize(keyword))
+        if phrase:
+            phrases.setdefault(phrase.split(" ")[0], set()).add(phrase)
+    return phrases
+
+
+def _merge_parts(parts: List[Dict[str, Any]], limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Ranks the `find_parts` results of several plants together, as one plant would."""
+    by_id = {part["id"]: part for part in parts}
+    hit_counts = {part["id"]: len(part["matched_keywords"]) for part in parts}
+    in_stock = {part["id"] for part in parts if part["quantity"] > 0}
+    return [by_id[part_id] for part_id in rank_part_matches(hit_counts, in_stock, limit)]
+
+
+class _Shard:
+    """One plant: its store, built on first use, its diagnostic cache and its directory entries."""
+
+    def __init__(self, plant: str, loader: Optional[Callable[[FactoryStore], None]],
+                 machine_ids: Optional[Iterable[str]], keywords: Optional[Iterable[str]] = None,
+                 skills: Optional[Iterable[str]] = None):
+        self.plant = plant
+        self.loader = loader
+        # Known before loading when the plant was registered with them; None means unknown.
+        self.machine_ids = list(machine_ids) if machine_ids is not None else None
+        self.phrases = _phrase_index(keywords) if keywords is not None else None
+        self.skills = {skill.lower() for skill in skills} if skills is not None else None
+        self.store: Optional[FactoryStore] = None
+        self.cache = None
+        self.lock = threading.Lock()
+
+
+class ShardedStore(FactoryStore):
+    """A `FactoryStore` partitioned by plant, with one lazily loaded store per plant."""
+
+    def __init__(self, shard_factory: Optional[Callable[[], FactoryStore]] = None,
+                 max_fallback_plants: Optional[int] = None):
+        """
+        Args:
+            shard_factory: Creates the empty store of a plant; defaults to an empty `MockDB`.
+            max_fallback_plants: Most other plants a query searches when the local
+                plant cannot serve it; all of them if None.
+        """
+        self.shard_factory = shard_factory or (lambda: MockDB(sample_data=False))
+        self.max_fallback_plants = max_fallback_plants
+        # plant -> plants to search first when it runs out, nearest first.
+        self.neighbors: Dict[str, List[str]] = {}
+        self._shards: Dict[str, _Shard] = {}
+        self._machine_plant: Dict[str, str] = {}
+        # Part and technician ID -> the first plant that has it, for IDs given without a plant.
+        self._record_plant: Dict[str, str] = {}
+        self._views: Dict[Tuple[str, bool], "PlantView"] = {}
+        self._lock = threading.RLock()
+        # Queries answered by another plant because the local one had no stock or staff.
+        self.fallbacks = 0
+
+    # --- Plants ---
+
+    def add_plant(self, plant: str, loader: Optional[Callable[[FactoryStore], None]] = None,
+                  machine_ids: Optional[Iterable[str]] = None, neighbors: Optional[List[str]] = None,
+                  keywords: Optional[Iterable[str]] = None, skills: Optional[Iterable[str]] = None) -> None:
+        """
+        Registers a plant; its data is loaded on first use.
+
+        Args:
+            plant: The plant's name; may not contain `PLANT_SEPARATOR`.
+            loader: Fills the plant's empty store, e.g. with `load_records` or `load_csv`.
+            machine_ids: The plant's machines, if known without loading it. Machines
+                of plants registered without them are found by loading those plants.
+            neighbors: Plants to search first when this one runs out of stock or staff.
+            keywords, skills: Every keyword of the plant's parts and skill of its
+                technicians, if known without loading it. Searches across plants
+                skip a plant registered with them that cannot match.
+        """
+        if PLANT_SEPARATOR in plant:
+            raise ValueError(f"Plant name {plant!r} may not contain {PLANT_SEPARATOR!r}")
+        with self._lock:
+            self._shards[plant] = _Shard(plant, loader, machine_ids, keywords, skills)
+            for machine_id in machine_ids or ():
+                self._machine_plant[machine_id] = plant
+            if neighbors is not None:
+                self.neighbors[plant] = list(neighbors)
+
+    @property
+    def plants(self) -> List[str]:
+        """Every registered plant, in registration order."""
+        return list(self._shards)
+
+    def loaded_plants(self) -> List[str]:
+        """The plants whose data has been loaded so far."""
+        return [plant for plant, shard in self._shards.items() if shard.store is not None]
+
+    def shard(self, plant: str) -> FactoryStore:
+        """Returns the store of one plant, loading it on first use."""
+        shard = self._shards.get(plant)
+        if shard is None:
+            raise KeyError(f"Unknown plant {plant!r}")
+        if shard.store is None:
+            with shard.lock:
+                if shard.store is None:
+                    with span("shard_load", plant=plant):
+                        store = self.shard_factory()
+                        if shard.loader is not None:
+                            shard.loader(store)
+                        self._register(plant, store)
+                        shard.store = store
+        return shard.store
+
+    def _register(self, plant: str, store: FactoryStore) -> None:
+        machine_ids = store.get_machine_ids()
+        inventory, technicians = store.get_inventory(), store.get_technicians()
+        with self._lock:
+            shard = self._shards[plant]
+            shard.machine_ids = machine_ids
+            shard.phrases = _phrase_index(keyword for part in inventory for keyword in part["keywords"])
+            shard.skills = {skill.lower() for tech in technicians for skill in tech["skills"]}
+            for machine_id in machine_ids:
+                self._machine_plant[machine_id] = plant
+            for record in inventory + technicians:
+                self._record_plant.setdefault(record["id"], plant)
+
+    def may_match_parts(self, plant: str, issue_text: str) -> bool:
+        """False if the plant has no part with a keyword in `issue_text`; True if it may (or is not known)."""
+        phrases = self._shards[plant].phrases
+        return phrases is None or bool(matching_phrases(tokenize(issue_text), phrases))
+
+    def may_have_skills(self, plant: str, skills: List[str]) -> bool:
+        """False if the plant's technicians lack one of `skills` between them; True if they may have every one."""
+        known = self._shards[plant].skills
+        return known is None or {skill.lower() for skill in skills} <= known
+
+    def _load_until(self, found: Callable[[], Optional[str]], machines: bool) -> Optional[str]:
+        """Loads the plants not loaded yet, one at a time, until `found()` returns a plant."""
+        for shard in list(self._shards.values()):
+            # A plant registered with its machine IDs is known not to have any other machine.
+            if shard.store is None and not (machines and shard.machine_ids is not None):
+                self.shard(shard.plant)
+                plant = found()
+                if plant is not None:
+                    return plant
+        return None
+
+    def plant_of(self, machine_id: str) -> Optional[str]:
+        """The plant a machine belongs to, or None if no plant has it."""
+        plant = self._machine_plant.get(machine_id)
+        if plant is None:
+            plant = self._load_until(lambda: self._machine_plant.get(machine_id), machines=True)
+        return plant
+
+    def _route(self, record_id: str) -> Tuple[Optional[str], str]:
+        """The plant and plant-local ID of a part or technician ID, qualified or not."""
+        plant, separator, local_id = record_id.partition(PLANT_SEPARATOR)
+        if separator and plant in self._shards:
+            return plant, local_id
+        plant = self._record_plant.get(record_id)
+        if plant is None:
+            plant = self._load_until(lambda: self._record_plant.get(record_id), machines=False)
+        return plant, record_id
+
+    def fallback_order(self, plant: str) -> List[str]:
+        """The other plants to search when `plant` runs out, nearest first."""
+        order = self.neighbors.get(plant)
+        if order is None:
+            # The plants registered after this one first, so fallbacks spread over every plant.
+            plants = list(self._shards)
+            index = plants.index(plant)
+            order = plants[index + 1:] + plants[:index]
+        else:
+            order = [other for other in order if other in self._shards and other != plant]
+        return order if self.max_fallback_plants is None else order[:self.max_fallback_plants]
+
+    def for_plant(self, plant: str, fallback: bool = True) -> "PlantView":
+        """The view of one plant; with `fallback`, queries it cannot serve go to the other plants."""
+        if plant not in self._shards:
+            raise KeyError(f"Unknown plant {plant!r}")
+        view = self._views.get((plant, fallback))
+        if view is None:
+            view = self._views[(plant, fallback)] = PlantView(self, plant, fallback)
+        return view
+
+    def for_machine(self, machine_id: str) -> FactoryStore:
+        """The view of the machine's plant, or the whole store for an unknown machine."""
+        plant = self.plant_of(machine_id)
+        return self.for_plant(plant) if plant is not None else self
+
+    def diagnostic_cache(self, machine_id: str):
+        """The diagnostic cache of the machine's plant, created on first use; see `diagnostics`."""
+        from factory_agents_v2.diagnostics import DiagnosticCache, get_diagnostic_cache
+
+        plant = self._machine_plant.get(machine_id)
+        if plant is None:
+            return get_diagnostic_cache()
+        shard = self._shards[plant]
+        if shard.cache is None:
+            with shard.lock:
+                if shard.cache is None:
+                    shard.cache = DiagnosticCache(int(os.getenv("DIAGNOSTIC_CACHE_SIZE") or 4096))
+        return shard.cache
+
+    @staticmethod
+    def _tag(records: List[Dict[str, Any]], plant: str, local: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Records are copies, so they can be labelled in place.
+        for record in records:
+            record["plant"] = plant
+            if plant != local:
+                record["id"] = qualify(plant, record["id"])
+        return records
+
+    def _query(self, plant: str, query: Callable[[FactoryStore], List[Dict[str, Any]]],
+               local: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._tag(query(self.shard(plant)), plant, local)
+
+    # --- Machines ---
+
+    def get_machine_ids(self) -> List[str]:
+        """Returns the IDs of every machine of every plant."""
+        machine_ids = []
+        for plant, shard in list(self._shards.items()):
+            if shard.store is None and shard.machine_ids is not None:
+                machine_ids.extend(shard.machine_ids)
+            else:
+                machine_ids.extend(self.shard(plant).get_machine_ids())
+        return machine_ids
+
+    def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
+        """Get the latest sensor readings of a machine from its plant."""
+        plant = self.plant_of(machine_id)
+        if plant is None:
+            return {"error": f"Machine {machine_id} not found"}
+        return self.shard(plant).get_machine_details(machine_id)
+
+    def get_machine_info(self, machine_id: str) -> Dict[str, Any]:
+        """Gets basic info for a machine, like its type, with its `plant`."""
+        plant = self.plant_of(machine_id)
+        if plant is None:
+            return {"error": "Machine not found"}
+        info = self.shard(plant).get_machine_info(machine_id)
+        if "error" not in info:
+            info["plant"] = plant
+        return info
+
+    # --- Every plant (use `for_machine` or `for_plant` to search one) ---
+
+    def get_inventory(self, machine_type: Optional[str] = None, in_stock_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the inventory of every plant, with plant-qualified IDs."""
+        return [part for plant in self.plants
+                for part in self._query(plant, lambda store: store.get_inventory(machine_type, in_stock_only))]
+
+    def get_technicians(self, available_only: bool = False, assignable_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the technicians of every plant, with plant-qualified IDs."""
+        return [tech for plant in self.plants
+                for tech in self._query(plant, lambda store: store.get_technicians(available_only, assignable_only))]
+
+    def find_parts(self, issue_text: str, machine_type: Optional[str] = None,
+                   limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """Finds the best matching parts across every plant that can match, with plant-qualified IDs."""
+        parts = [part for plant in self.plants if self.may_match_parts(plant, issue_text)
+                 for part in self._query(plant, lambda store: store.find_parts(issue_text, machine_type, limit))]
+        return _merge_parts(parts, limit)
+
+    def find_available_technicians(self, skills: List[str]) -> List[Dict[str, Any]]:
+        """Finds available technicians with every skill across every plant that has it, with plant-qualified IDs."""
+        return [tech for plant in self.plants if self.may_have_skills(plant, skills)
+                for tech in self._query(plant, lambda store: store.find_available_technicians(skills))]
+
+    def load_records(self, machines: Iterable[Dict[str, Any]] = (),
+                     machine_details: Iterable[Dict[str, Any]] = (),
+                     inventory: Iterable[Dict[str, Any]] = (),
+                     human_resources: Iterable[Dict[str, Any]] = (),
+                     plant: Optional[str] = None) -> None:
+        """
+        Bulk-inserts records into the plant named by their `plant` field, or into
+        `plant` if they have none; readings without either go to their machine's
+        plant. Plants that do not exist yet are added.
+        """
+        groups: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+        machine_plant: Dict[str, str] = {}
+        for table, records in (("machines", machines), ("machine_details", machine_details),
+                               ("inventory", inventory), ("human_resources", human_resources)):
+            for record in records:
+                target = record.get("plant") or plant
+                if target is None and table == "machine_details":
+                    target = machine_plant.get(record["id"]) or self.plant_of(record["id"])
+                if target is None:
+                    raise ValueError(f"No plant given for {table} record {record['id']!r}")
+                if table == "machines":
+                    machine_plant[record["id"]] = target
+                groups[target][table].append(record)
+
+        for target, tables in groups.items():
+            if target not in self._shards:
+                self.add_plant(target)
+            store = self.shard(target)
+            store.load_records(**tables)
+            self._register(target, store)
+
+    # --- Reservations ---
+
+    def _qualify_reservation(self, plant: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        if "reservation_id" in result:
+            result["reservation_id"] = qualify(plant, result["reservation_id"])
+            result["id"] = qualify(plant, result["id"])
+            result["plant"] = plant
+        return result
+
+    def reserve_part(self, part_id: str, quantity: int = 1, machine_id: Optional[str] = None,
+                     hold_seconds: Optional[float] = None, confirm: bool = False,
+                     expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Reserves a part in the plant its ID routes to; see `FactoryStore.reserve_part`."""
+        plant, local_id = self._route(part_id)
+        if plant is None:
+            return {"status": "error", "reason": f"Part {part_id} not found"}
+        return self._qualify_reservation(plant, self.shard(plant).reserve_part(
+            local_id, quantity, machine_id, hold_seconds, confirm, expected_version))
+
+    def assign_technician(self, technician_id: str, machine_id: str, hold_seconds: Optional[float] = None,
+                          confirm: bool = False, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Assigns a technician of the plant their ID routes to; see `FactoryStore.assign_technician`."""
+        plant, local_id = self._route(technician_id)
+        if plant is None:
+            return {"status": "error", "reason": f"Technician {technician_id} not found"}
+        return self._qualify_reservation(plant, self.shard(plant).assign_technician(
+            local_id, machine_id, hold_seconds, confirm, expected_version))
+
+    def _reservation_plant(self, reservation_id: str) -> Tuple[Optional[str], str]:
+        plant, separator, local_id = reservation_id.partition(PLANT_SEPARATOR)
+        return (plant, local_id) if separator and plant in self._shards else (None, reservation_id)
+
+    def confirm_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Makes a held reservation permanent in its plant."""
+        plant, local_id = self._reservation_plant(reservation_id)
+        if plant is None:
+            return {"status": "error", "reason": f"Reservation {reservation_id} not found or expired"}
+        return self._qualify_reservation(plant, self.shard(plant).confirm_reservation(local_id))
+
+    def release_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Cancels a reservation in its plant and returns its stock or technician."""
+        plant, local_id = self._reservation_plant(reservation_id)
+        if plant is None:
+            return {"status": "error", "reason": f"Reservation {reservation_id} not found or already ended"}
+        return self._qualify_reservation(plant, self.shard(plant).release_reservation(local_id))
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Releases the expired holds of every loaded plant; plants not loaded have none."""
+        return sum(self._shards[plant].store.expire_holds(now) for plant in self.loaded_plants())
+
+
+class PlantView(FactoryStore):
+    """One plant of a `ShardedStore`: queries are answered locally, and by other plants only when they must."""
+
+    def __init__(self, store: ShardedStore, plant: str, fallback: bool = True):
+        self.store = store
+        self.plant = plant
+        self.fallback = fallback
+
+    def _nearest(self, query: Callable[[FactoryStore], List[Dict[str, Any]]],
+                 served: Callable[[List[Dict[str, Any]]], bool] = bool,
+                 may_serve: Callable[[str], bool] = lambda plant: True) -> List[Dict[str, Any]]:
+        """
+        The local result, or the first other plant's that `served` accepts when the
+        local one is not; other plants for which `may_serve` is False are not queried.
+        """
+        result = self.store._query(self.plant, query, self.plant)
+        if served(result) or not self.fallback:
+            return result
+        for plant in self.store.fallback_order(self.plant):
+            if not may_serve(plant):
+                continue
+            remote = self.store._query(plant, query, self.plant)
+            if served(remote):
+                self.store.fallbacks += 1
+                return remote
+        return result
+
+    def _local_id(self, record_id: str) -> str:
+        # IDs without a plant are this plant's own.
+        return record_id if PLANT_SEPARATOR in record_id else qualify(self.plant, record_id)
+
+    def get_machine_ids(self) -> List[str]:
+        """Returns the IDs of the plant's machines."""
+        return self.store.shard(self.plant).get_machine_ids()
+
+    def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
+        """Get the latest sensor readings for a machine of any plant."""
+        return self.store.get_machine_details(machine_id)
+
+    def get_machine_info(self, machine_id: str) -> Dict[str, Any]:
+        """Gets basic info for a machine of any plant, like its type."""
+        return self.store.get_machine_info(machine_id)
+
+    def get_inventory(self, machine_type: Optional[str] = None, in_stock_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the plant's inventory, or the nearest other plant's if the plant has no such parts."""
+        return self._nearest(lambda store: store.get_inventory(machine_type, in_stock_only))
+
+    def get_technicians(self, available_only: bool = False, assignable_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the plant's technicians, or the nearest other plant's if the plant has none left."""
+        return self._nearest(lambda store: store.get_technicians(available_only, assignable_only))
+
+    def find_parts(self, issue_text: str, machine_type: Optional[str] = None,
+                   limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """
+        Finds the plant's best matching parts. If the best local match is out of
+        stock (or nothing matches), returns those of the nearest plant whose best
+        match is in stock and matches as many keywords.
+        """
+        parts = self.store._query(self.plant, lambda store: store.find_parts(issue_text, machine_type, limit),
+                                  self.plant)
+        if not self.fallback or (parts and parts[0]["quantity"] > 0):
+            return parts
+        best = len(parts[0]["matched_keywords"]) if parts else 1
+        return self._nearest(
+            lambda store: store.find_parts(issue_text, machine_type, limit),
+            lambda found: bool(found) and found[0]["quantity"] > 0 and len(found[0]["matched_keywords"]) >= best,
+            lambda plant: self.store.may_match_parts(plant, issue_text))
+
+    def find_available_technicians(self, skills: List[str]) -> List[Dict[str, Any]]:
+        """Finds the plant's available technicians with every skill, or the nearest other plant's."""
+        # Machine operators are listed too, but a plant with only operators left has no staff for the job.
+        return self._nearest(lambda store: store.find_available_technicians(skills),
+                             lambda found: any(tech["role"] not in NON_ASSIGNABLE_ROLES for tech in found),
+                             lambda plant: self.store.may_have_skills(plant, skills))
+
+    def reserve_part(self, part_id: str, quantity: int = 1, machine_id: Optional[str] = None,
+                     hold_seconds: Optional[float] = None, confirm: bool = False,
+                     expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Reserves a part of this plant, or of the plant its ID names."""
+        return self.store.reserve_part(self._local_id(part_id), quantity, machine_id, hold_seconds, confirm,
+                                       expected_version)
+
+    def assign_technician(self, technician_id: str, machine_id: str, hold_seconds: Optional[float] = None,
+                          confirm: bool = False, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """Assigns a technician of this plant, or of the plant their ID names."""
+        return self.store.assign_technician(self._local_id(technician_id), machine_id, hold_seconds, confirm,
+                                            expected_version)
+
+    def confirm_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Makes a held reservation permanent."""
+        return self.store.confirm_reservation(reservation_id)
+
+    def release_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Cancels a reservation and returns its stock or technician."""
+        return self.store.release_reservation(reservation_id)
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Releases the expired holds of the plant."""
+        return self.store.shard(self.plant).expire_holds(now)
+
+    def load_records(self, machines: Iterable[Dict[str, Any]] = (),
+                     machine_details: Iterable[Dict[str, Any]] = (),
+                     inventory: Iterable[Dict[str, Any]] = (),
+                     human_resources: Iterable[Dict[str, Any]] = ()) -> None:
+        """Bulk-inserts records into this plant (or the plant named by their `plant` field)."""
+        self.store.load_records(machines, machine_details, inventory, human_resources, plant=self.plant)
+
+    def for_machine(self, machine_id: str) -> FactoryStore:
+        """The view of the machine's own plant."""
+        return self.store.for_machine(machine_id)
+
+
+def _csv_column(directory: str, table: str, column: str) -> List[str]:
+    """Every value of one column of a plant's table, list items flattened; empty if the plant has no such table."""
+    path = os.path.join(directory, f"{table}.csv")
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        values = [row.get(column) or "" for row in csv.DictReader(f)]
+    if column in LIST_COLUMNS.get(table, ()):
+        return [item.strip() for value in values for item in value.split(";") if item.strip()]
+    return values
+
+
+def _csv_loader(directory: str) -> Callable[[FactoryStore], None]:
+    def load(store: FactoryStore) -> None:
+        for table in TABLES:
+            path = os.path.join(directory, f"{table}.csv")
+            if os.path.exists(path):
+                load_csv(store, table, path)
+    return load
+
+
+def load_plants(path: Optional[str] = None, max_fallback_plants: Optional[int] = None) -> ShardedStore:
+    """
+    Builds a sharded store with one plant per subdirectory of `path`.
+
+    Each subdirectory holds the plant's tables as `<table>.csv` files (see
+    `storage.load_csv`). Only the machine IDs, part keywords and technician
+    skills are read up front, for routing; a plant's tables are loaded and
+    indexed on its first query. Without a `path`, the store has a single plant,
+    "main", with the sample data.
+
+    Args:
+        path: The directory of plant directories.
+        max_fallback_plants: See `ShardedStore`; defaults to `FACTORY_FALLBACK_PLANTS`
+            (unset: every plant).
+    """
+    if max_fallback_plants is None and os.getenv("FACTORY_FALLBACK_PLANTS"):
+        max_fallback_plants = int(os.getenv("FACTORY_FALLBACK_PLANTS"))
+    store = ShardedStore(max_fallback_plants=max_fallback_plants)
+    if path is None:
+        store.add_plant("main", loader=seed_sample_data)
+        return store
+    for plant in sorted(os.listdir(path)):
+        directory = os.path.join(path, plant)
+        if not os.path.isdir(directory):
+            continue
+        store.add_plant(plant, loader=_csv_loader(directory),
+                        machine_ids=_csv_column(directory, "machines", "id"),
+                        keywords=_csv_column(directory, "inventory", "keywords"),
+                        skills=_csv_column(directory, "human_resources", "skills"))
+    return store
@@ -0,0 +1,457 @@
+"""
+SQLite Storage Backend for Smart Factory Data.
+
+Implements `FactoryStore` on an on-disk SQLite database in WAL mode. Each thread
+gets its own pooled connection, so concurrent tool calls read without sharing a
+cursor; the connections of threads that have exited are closed when the next
+thread opens one, so the pool never outgrows the live threads. Part keywords, applicable machine types and technician skills live in
+indexed side tables so `find_parts` and `find_available_technicians` never scan
+the whole catalog.
+
+Reservations are single conditional UPDATEs (`quantity >= ?`, `availability =
+'available'`, optionally `version = ?`) in short IMMEDIATE transactions, so the
+database itself provides the compare-and-set across threads and processes.
+Each write transaction first releases the holds that have expired.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from factory_agents_v2.storage import (CONFIRMED, FactoryStore, HELD, NON_ASSIGNABLE_ROLES, RELEASED,
+                                       conflict, default_hold_seconds, invalid_quantity, matching_phrases,
+                                       new_reservation_id, tokenize)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "factory.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    status TEXT,
+    last_maintenance TEXT,
+    next_maintenance TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_machines_type ON machines (type);
+
+CREATE TABLE IF NOT EXISTS machine_details (
+    id TEXT PRIMARY KEY,
+    temperature REAL,
+    vibration REAL,
+    pressure REAL,
+    timestamp TEXT
+);
+
+CREATE TABLE IF NOT EXISTS parts (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    keywords TEXT,
+    quantity INTEGER,
+    location TEXT,
+    applicable_machine_types TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS keyword_phrases (
+    phrase TEXT PRIMARY KEY,
+    first_token TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_keyword_phrases_token ON keyword_phrases (first_token);
+CREATE TABLE IF NOT EXISTS part_keywords (
+    phrase TEXT NOT NULL,
+    part_id TEXT NOT NULL REFERENCES parts (id),
+    PRIMARY KEY (phrase, part_id)
+);
+CREATE INDEX IF NOT EXISTS idx_part_keywords_part ON part_keywords (part_id);
+CREATE TABLE IF NOT EXISTS part_machine_types (
+    machine_type TEXT NOT NULL,
+    part_id TEXT NOT NULL REFERENCES parts (id),
+    PRIMARY KEY (machine_type, part_id)
+);
+CREATE INDEX IF NOT EXISTS idx_part_machine_types_part ON part_machine_types (part_id);
+
+CREATE TABLE IF NOT EXISTS technicians (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    role TEXT,
+    skills TEXT,
+    availability TEXT,
+    current_assignment TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_technicians_availability ON technicians (availability);
+CREATE TABLE IF NOT EXISTS technician_skills (
+    skill TEXT NOT NULL,
+    technician_id TEXT NOT NULL REFERENCES technicians (id),
+    PRIMARY KEY (skill, technician_id)
+);
+CREATE INDEX IF NOT EXISTS idx_technician_skills_technician ON technician_skills (technician_id);
+
+CREATE TABLE IF NOT EXISTS reservations (
+    reservation_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    machine_id TEXT,
+    expires_at REAL,
+    version INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_expiry ON reservations (status, expires_at);
+"""
+
+# Columns added after the first release, for databases created before them.
+MIGRATIONS = {
+    "parts": {"version": "INTEGER NOT NULL DEFAULT 0"},
+    "technicians": {"version": "INTEGER NOT NULL DEFAULT 0"},
+}
+
+MACHINE_COLUMNS = ("id", "name", "type", "status", "last_maintenance", "next_maintenance")
+DETAIL_COLUMNS = ("id", "temperature", "vibration", "pressure", "timestamp")
+PART_COLUMNS = ("id", "name", "keywords", "quantity", "location", "applicable_machine_types", "version")
+TECHNICIAN_COLUMNS = ("id", "name", "role", "skills", "availability", "current_assignment", "version")
+
+
+def _upsert(table: str, columns: tuple) -> str:
+    # Updates an existing row in place instead of deleting it (as INSERT OR REPLACE does), so it keeps its
+    # rowid and listings stay in load order, as in MockDB.
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({','.join('?' * len(columns))})"
+            f" ON CONFLICT (id) DO UPDATE SET {updates}")
+
+
+class SQLiteStore(FactoryStore):
+    """A `FactoryStore` backed by SQLite with a per-thread connection pool."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Database file. Defaults to `factory.db` next to this package.
+                A file is required: every thread opens its own connection to it.
+        """
+        self.path = path or DEFAULT_DB_PATH
+        self._local = threading.local()
+        # (owning thread, connection) for every open connection.
+        self._connections: List[Tuple["weakref.ref[threading.Thread]", sqlite3.Connection]] = []
+        self._pool_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        for table, columns in MIGRATIONS.items():
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, definition in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._pool_lock:
+                self._close_finished()
+                self._connections.append((weakref.ref(threading.current_thread()), conn))
+        return conn
+
+    def _close_finished(self) -> None:
+        # Called with the pool lock held. A finished thread can no longer use its connection.
+        live = []
+        for thread_ref, conn in self._connections:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                live.append((thread_ref, conn))
+            else:
+                conn.close()
+        self._connections = live
+
+    def close(self) -> None:
+        """Closes every pooled connection."""
+        with self._pool_lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def is_empty(self) -> bool:
+        """True if the store holds no machines."""
+        return self._connection().execute("SELECT 1 FROM machines LIMIT 1").fetchone() is None
+
+    # --- Reads ---
+
+    def get_machine_ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT id FROM machines ORDER BY rowid")]
+
+    def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT * FROM machine_details WHERE id = ?", (machine_id,)).fetchone()
+        if row is None:
+            return {"error": f"Machine {machine_id} not found"}
+        return dict(row)
+
+    def get_inventory(self, machine_type: Optional[str] = None, in_stock_only: bool = False) -> List[Dict[str, Any]]:
+        if not machine_type and not in_stock_only:
+            rows = self._connection().execute("SELECT * FROM parts ORDER BY rowid").fetchall()
+            return [_part(row) for row in rows]
+        query = "SELECT p.* FROM parts p WHERE 1 = 1"
+        params: List[Any] = []
+        if machine_type:
+            query += (" AND EXISTS (SELECT 1 FROM part_machine_types m"
+                      " WHERE m.machine_type = ? AND m.part_id = p.id)")
+            params.append(machine_type.lower())
+        if in_stock_only:
+            query += " AND p.quantity > 0"
+        query += " ORDER BY p.id"
+        return [_part(row) for row in self._connection().execute(query, params)]
+
+    def get_technicians(self, available_only: bool = False, assignable_only: bool = False) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM technicians WHERE 1 = 1"
+        params: List[Any] = []
+        if available_only:
+            query += " AND availability = 'available'"
+        if assignable_only:
+            query += f" AND role NOT IN ({','.join('?' * len(NON_ASSIGNABLE_ROLES))})"
+            params.extend(NON_ASSIGNABLE_ROLES)
+        query += " ORDER BY id" if available_only else " ORDER BY rowid"
+        return [_technician(row) for row in self._connection().execute(query, params)]
+
+    def get_machine_info(self, machine_id: str) -> Dict[str, Any]:
+        row = self._connection().execute("SELECT * FROM machines WHERE id = ?", (machine_id,)).fetchone()
+        if row is None:
+            return {"error": "Machine not found"}
+        return dict(row)
+
+    def find_parts(self, issue_text: str, machine_type: Optional[str] = None,
+                   limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        tokens = tokenize(issue_text)
+        if not tokens:
+            return []
+        conn = self._connection()
+        unique_tokens = sorted(set(tokens))
+        phrases_by_first_token: Dict[str, List[str]] = {}
+        for phrase, first_token in conn.execute(
+                f"SELECT phrase, first_token FROM keyword_phrases"
+                f" WHERE first_token IN ({','.join('?' * len(unique_tokens))})", unique_tokens):
+            phrases_by_first_token.setdefault(first_token, []).append(phrase)
+        phrases = matching_phrases(tokens, phrases_by_first_token)
+        if not phrases:
+            return []
+
+        query = (f"SELECT p.*, group_concat(k.phrase, '|') AS matched, count(*) AS hits"
+                 f" FROM part_keywords k JOIN parts p ON p.id = k.part_id"
+                 f" WHERE k.phrase IN ({','.join('?' * len(phrases))})")
+        params: List[Any] = list(phrases)
+        if machine_type:
+            query += (" AND EXISTS (SELECT 1 FROM part_machine_types m"
+                      " WHERE m.machine_type = ? AND m.part_id = k.part_id)")
+            params.append(machine_type.lower())
+        query += " GROUP BY k.part_id ORDER BY hits DESC, p.quantity <= 0, k.part_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        results = []
+        for row in conn.execute(query, params):
+            part = _part(row)
+            part.pop("hits")
+            part["matched_keywords"] = sorted(part.pop("matched").split("|"))
+            results.append(part)
+        return results
+
+    def find_available_technicians(self, skills: List[str]) -> List[Dict[str, Any]]:
+        query = "SELECT t.* FROM technicians t WHERE t.availability = 'available'"
+        params: List[Any] = []
+        for skill in skills:
+            query += (" AND EXISTS (SELECT 1 FROM technician_skills s"
+                      " WHERE s.skill = ? AND s.technician_id = t.id)")
+            params.append(skill.lower())
+        query += " ORDER BY t.id"
+        return [_technician(row) for row in self._connection().execute(query, params)]
+
+    # --- Bulk loading ---
+
+    def load_records(self, machines: Iterable[Dict[str, Any]] = (),
+                     machine_details: Iterable[Dict[str, Any]] = (),
+                     inventory: Iterable[Dict[str, Any]] = (),
+                     human_resources: Iterable[Dict[str, Any]] = ()) -> None:
+        """Bulk-inserts (or replaces in place, by `id`) records in a single transaction."""
+        inventory = list(inventory)
+        human_resources = list(human_resources)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(_upsert("machines", MACHINE_COLUMNS),
+                             ([m.get(c) for c in MACHINE_COLUMNS] for m in machines))
+            conn.executemany(_upsert("machine_details", DETAIL_COLUMNS),
+                             ([d.get(c) for c in DETAIL_COLUMNS] for d in machine_details))
+
+            conn.executemany("DELETE FROM part_keywords WHERE part_id = ?", ((p["id"],) for p in inventory))
+            conn.executemany("DELETE FROM part_machine_types WHERE part_id = ?", ((p["id"],) for p in inventory))
+            conn.executemany(
+                _upsert("parts", PART_COLUMNS),
+                ((p["id"], p.get("name"), json.dumps(p.get("keywords", [])), p.get("quantity", 0),
+                  p.get("location"), json.dumps(p.get("applicable_machine_types", [])), p.get("version") or 0)
+                 for p in inventory))
+            part_phrases = [(p["id"], {" ".join(tokenize(k)) for k in p.get("keywords", [])} - {""})
+                            for p in inventory]
+            conn.executemany(
+                "INSERT OR IGNORE INTO keyword_phrases VALUES (?, ?)",
+                ((phrase, phrase.split(" ")[0]) for phrase in set().union(*(ps for _, ps in part_phrases))))
+            conn.executemany(
+                "INSERT INTO part_keywords VALUES (?, ?)",
+                ((phrase, part_id) for part_id, phrases in part_phrases for phrase in phrases))
+            conn.executemany(
+                "INSERT OR IGNORE INTO part_machine_types VALUES (?, ?)",
+                ((t.lower(), p["id"]) for p in inventory for t in p.get("applicable_machine_types", [])))
+
+            conn.executemany("DELETE FROM technician_skills WHERE technician_id = ?",
+                             ((t["id"],) for t in human_resources))
+            conn.executemany(
+                _upsert("technicians", TECHNICIAN_COLUMNS),
+                ((t["id"], t.get("name"), t.get("role"), json.dumps(t.get("skills", [])),
+                  t.get("availability"), t.get("current_assignment"), t.get("version") or 0)
+                 for t in human_resources))
+            conn.executemany(
+                "INSERT OR IGNORE INTO technician_skills VALUES (?, ?)",
+                ((s.lower(), t["id"]) for t in human_resources for s in t.get("skills", [])))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+    # --- Reservations ---
+
+    def _write(self, work):
+        """Runs `work(conn)` in an IMMEDIATE transaction, after releasing expired holds."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(conn, time.time())
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _hold(self, conn: sqlite3.Connection, kind: str, record_id: str, quantity: int,
+              machine_id: Optional[str], hold_seconds: Optional[float], confirm: bool, version: int) -> Dict[str, Any]:
+        expires_at = None if confirm else time.time() + (default_hold_seconds() if hold_seconds is None
+                                                         else hold_seconds)
+        reservation = {"status": CONFIRMED if confirm else HELD, "reservation_id": new_reservation_id(),
+                       "kind": kind, "id": record_id, "quantity": quantity, "machine_id": machine_id,
+                       "expires_at": expires_at, "version": version}
+        conn.execute("INSERT INTO reservations (reservation_id, status, kind, id, quantity, machine_id, expires_at,"
+                     " version) VALUES (:reservation_id, :status, :kind, :id, :quantity, :machine_id, :expires_at,"
+                     " :version)", reservation)
+        return reservation
+
+    def reserve_part(self, part_id: str, quantity: int = 1, machine_id: Optional[str] = None,
+                     hold_seconds: Optional[float] = None, confirm: bool = False,
+                     expected_version: Optional[int] = None) -> Dict[str, Any]:
+        invalid = invalid_quantity(quantity)
+        if invalid:
+            return invalid
+
+        def work(conn):
+            row = conn.execute(
+                "UPDATE parts SET quantity = quantity - ?, version = version + 1"
+                " WHERE id = ? AND quantity >= ? AND (? IS NULL OR version = ?) RETURNING version",
+                (quantity, part_id, quantity, expected_version, expected_version)).fetchone()
+            if row is None:
+                current = conn.execute("SELECT quantity, version FROM parts WHERE id = ?", (part_id,)).fetchone()
+                if current is None:
+                    return {"status": "error", "reason": f"Part {part_id} not found"}
+                if expected_version is not None and current["version"] != expected_version:
+                    return conflict("Version changed", current["version"])
+                return conflict("Insufficient stock", current["version"])
+            return self._hold(conn, "part", part_id, quantity, machine_id, hold_seconds, confirm, row[0])
+        return self._write(work)
+
+    def assign_technician(self, technician_id: str, machine_id: str, hold_seconds: Optional[float] = None,
+                          confirm: bool = False, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        def work(conn):
+            row = conn.execute(
+                f"UPDATE technicians SET availability = 'busy', current_assignment = ?, version = version + 1"
+                f" WHERE id = ? AND availability = 'available'"
+                f" AND role NOT IN ({','.join('?' * len(NON_ASSIGNABLE_ROLES))})"
+                f" AND (? IS NULL OR version = ?) RETURNING version",
+                (machine_id, technician_id, *NON_ASSIGNABLE_ROLES, expected_version, expected_version)).fetchone()
+            if row is None:
+                current = conn.execute("SELECT version FROM technicians WHERE id = ?", (technician_id,)).fetchone()
+                if current is None:
+                    return {"status": "error", "reason": f"Technician {technician_id} not found"}
+                if expected_version is not None and current["version"] != expected_version:
+                    return conflict("Version changed", current["version"])
+                return conflict("Technician not available", current["version"])
+            return self._hold(conn, "technician", technician_id, 1, machine_id, hold_seconds, confirm, row[0])
+        return self._write(work)
+
+    def _restore(self, conn: sqlite3.Connection, reservation: sqlite3.Row) -> None:
+        if reservation["kind"] == "part":
+            conn.execute("UPDATE parts SET quantity = quantity + ?, version = version + 1 WHERE id = ?",
+                         (reservation["quantity"], reservation["id"]))
+        else:
+            # Leave the technician alone if they were reassigned since (e.g. by a bulk load).
+            conn.execute("UPDATE technicians SET availability = 'available', current_assignment = NULL,"
+                         " version = version + 1 WHERE id = ? AND current_assignment IS ?",
+                         (reservation["id"], reservation["machine_id"]))
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> int:
+        expired = conn.execute("SELECT * FROM reservations WHERE status = ? AND expires_at <= ?",
+                               (HELD, now)).fetchall()
+        for reservation in expired:
+            self._restore(conn, reservation)
+        conn.executemany("DELETE FROM reservations WHERE reservation_id = ?",
+                         ((r["reservation_id"],) for r in expired))
+        return len(expired)
+
+    def confirm_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        def work(conn):
+            row = conn.execute("UPDATE reservations SET status = ?, expires_at = NULL"
+                               " WHERE reservation_id = ? AND status IN (?, ?) RETURNING *",
+                               (CONFIRMED, reservation_id, HELD, CONFIRMED)).fetchone()
+            if row is None:
+                return {"status": "error", "reason": f"Reservation {reservation_id} not found or expired"}
+            return dict(row)
+        return self._write(work)
+
+    def release_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        def work(conn):
+            row = conn.execute("DELETE FROM reservations WHERE reservation_id = ? AND status IN (?, ?) RETURNING *",
+                               (reservation_id, HELD, CONFIRMED)).fetchone()
+            if row is None:
+                return {"status": "error", "reason": f"Reservation {reservation_id} not found or already ended"}
+            self._restore(conn, row)
+            return dict(row, status=RELEASED)
+        return self._write(work)
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._expire(conn, time.time() if now is None else now)
+            conn.execute("COMMIT")
+            return count
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _part(row: sqlite3.Row) -> Dict[str, Any]:
+    part = dict(row)
+    part["keywords"] = json.loads(part["keywords"])
+    part["applicable_machine_types"] = json.loads(part["applicable_machine_types"])
+    return part
+
+
+def _technician(row: sqlite3.Row) -> Dict[str, Any]:
+    tech = dict(row)
+    tech["skills"] = json.loads(tech["skills"])
+    return tech
@@ -0,0 +1,248 @@
+"""
+Storage Backend Interface for Smart Factory Data.
+
+`FactoryStore` is the interface the agent tools use to read factory data.
+`MockDB` implements it with in-memory dicts and `SQLiteStore` with an on-disk
+SQLite database. Both can be bulk-loaded from record dicts, CSV or Parquet.
+
+Parts and technicians are claimed through reservations, which are
+compare-and-set updates: `reserve_part` only succeeds while enough stock is
+left and `assign_technician` only while the technician is available (and, with
+`expected_version`, unchanged since it was read), so concurrent tickets can
+never take the same last part or the same technician. A reservation is a hold
+that returns its stock or technician when it expires unless it is confirmed;
+holds last `RESERVATION_HOLD_SECONDS` (default 300) unless given otherwise.
+"""
+import csv
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from typing import Container, Dict, Any, Iterable, List, Optional
+
+# Roles that are listed in human_resources but are never assigned maintenance work.
+NON_ASSIGNABLE_ROLES = ("Machine Operator",)
+
+TABLES = ("machines", "machine_details", "inventory", "human_resources")
+
+# Columns holding lists; in CSV files their items are separated by ";".
+LIST_COLUMNS = {
+    "inventory": ("keywords", "applicable_machine_types"),
+    "human_resources": ("skills",),
+}
+# Reservation states; "held" reservations expire, the other states are final.
+HELD, CONFIRMED, RELEASED, EXPIRED = "held", "confirmed", "released", "expired"
+
+NUMERIC_COLUMNS = {
+    "machine_details": {"temperature": float, "vibration": float, "pressure": float},
+    "inventory": {"quantity": int},
+}
+
+
+class FactoryStore(ABC):
+    """Read interface over machines, sensor readings, parts and technicians."""
+
+    @abstractmethod
+    def get_machine_ids(self) -> List[str]:
+        """Returns the IDs of every machine."""
+
+    @abstractmethod
+    def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
+        """Get the latest sensor readings for a specific machine."""
+
+    @abstractmethod
+    def get_inventory(self, machine_type: Optional[str] = None, in_stock_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the inventory list, optionally only parts for a machine type and/or in stock."""
+
+    @abstractmethod
+    def get_technicians(self, available_only: bool = False, assignable_only: bool = False) -> List[Dict[str, Any]]:
+        """Returns the technician list, optionally only available ones and/or without machine operators."""
+
+    @abstractmethod
+    def get_machine_info(self, machine_id: str) -> Dict[str, Any]:
+        """Gets basic info for a machine, like its type."""
+
+    @abstractmethod
+    def find_parts(self, issue_text: str, machine_type: Optional[str] = None,
+                   limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """Finds up to `limit` parts whose keywords appear in the issue text, best matches first."""
+
+    @abstractmethod
+    def find_available_technicians(self, skills: List[str]) -> List[Dict[str, Any]]:
+        """Finds available technicians who have every one of the given skills."""
+
+    @abstractmethod
+    def reserve_part(self, part_id: str, quantity: int = 1, machine_id: Optional[str] = None,
+                     hold_seconds: Optional[float] = None, confirm: bool = False,
+                     expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Atomically takes `quantity` of a part out of stock if that much is left.
+
+        Args:
+            part_id: The part to reserve.
+            quantity: Units to take.
+            machine_id: The machine the part is for, recorded on the reservation.
+            hold_seconds: Seconds until the hold expires and the stock returns unless
+                confirmed. Defaults to `default_hold_seconds()`.
+            confirm: Confirm the reservation at once instead of holding it.
+            expected_version: Only reserve if the part's `version` still equals this.
+
+        Returns:
+            The reservation (`status` "held" or "confirmed", `reservation_id`, `kind`,
+            `id`, `quantity`, `machine_id`, `expires_at`, `version`), or
+            `{"status": "conflict", "reason", "version"}` if the stock or version
+            check failed, or `{"status": "error", "reason"}` if the part is unknown
+            or `quantity` is not positive.
+        """
+
+    @abstractmethod
+    def assign_technician(self, technician_id: str, machine_id: str, hold_seconds: Optional[float] = None,
+                          confirm: bool = False, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Atomically marks an available technician busy with `machine_id`.
+
+        Machine operators are never assigned. Arguments and result are as for
+        `reserve_part`; the conflict reasons are "Technician not available" and
+        "Version changed".
+        """
+
+    @abstractmethod
+    def confirm_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Makes a held reservation permanent; returns it, or an `error` if it is unknown or has expired."""
+
+    @abstractmethod
+    def release_reservation(self, reservation_id: str) -> Dict[str, Any]:
+        """Cancels a held or confirmed reservation and returns its stock or technician."""
+
+    @abstractmethod
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Releases every held reservation whose hold has run out; returns how many."""
+
+    @abstractmethod
+    def load_records(self, machines: Iterable[Dict[str, Any]] = (),
+                     machine_details: Iterable[Dict[str, Any]] = (),
+                     inventory: Iterable[Dict[str, Any]] = (),
+                     human_resources: Iterable[Dict[str, Any]] = ()) -> None:
+        """Bulk-inserts (or replaces, by `id`) records into the store."""
+
+    def for_machine(self, machine_id: str) -> "FactoryStore":
+        """The store to search for a machine's parts and technicians; a store without plants is its own."""
+        return self
+
+
+def default_hold_seconds() -> float:
+    """How long an unconfirmed reservation is held: `RESERVATION_HOLD_SECONDS`, default 300."""
+    return float(os.getenv("RESERVATION_HOLD_SECONDS") or 300)
+
+
+def new_reservation_id() -> str:
+    return f"res-{uuid.uuid4().hex[:16]}"
+
+
+def conflict(reason: str, version: Optional[int]) -> Dict[str, Any]:
+    return {"status": "conflict", "reason": reason, "version": version}
+
+
+def invalid_quantity(quantity: int) -> Optional[Dict[str, Any]]:
+    """The `error` result for a reservation of no or negative units, which would add stock; None if valid."""
+    if quantity <= 0:
+        return {"status": "error", "reason": f"Quantity must be positive, got {quantity}"}
+    return None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cases text and splits it into words."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def matching_phrases(tokens: List[str], phrases_by_first_token: Dict[str, Iterable[str]]) -> List[str]:
+    """Returns the keyword phrases that occur in a tokenized text."""
+    text = " " + " ".join(tokens) + " "
+    matched = []
+    for token in set(tokens):
+        for phrase in phrases_by_first_token.get(token, ()):
+            if phrase == token or f" {phrase} " in text:
+                matched.append(phrase)
+    return sorted(matched)
+
+
+def rank_part_matches(hit_counts: Dict[str, int], in_stock: Container[str],
+                      limit: Optional[int] = None) -> List[str]:
+    """
+    Orders matched part IDs by number of keyword hits, in-stock parts first on ties.
+
+    Parts are bucketed by hit count and only as many buckets as needed to fill
+    `limit` are sorted, so large match sets are never fully ranked.
+    """
+    ranked: List[str] = []
+    for hits in range(max(hit_counts.values(), default=0), 0, -1):
+        bucket = [part_id for part_id, n in hit_counts.items() if n == hits]
+        if not bucket:
+            continue
+        available = sorted(part_id for part_id in bucket if part_id in in_stock)
+        ranked.extend(available)
+        ranked.extend(sorted(part_id for part_id in bucket if part_id not in in_stock))
+        if limit is not None and len(ranked) >= limit:
+            return ranked[:limit]
+    return ranked
+
+def seed_sample_data(store: FactoryStore) -> None:
+    """Loads the built-in sample dataset into a store."""
+    from factory_agents_v2.MockDB import MockDB
+
+    sample = MockDB()
+    store.load_records(
+        machines=sample.machines.values(),
+        machine_details=sample.machine_details.values(),
+        inventory=sample.inventory.values(),
+        human_resources=sample.human_resources.values(),
+    )
+
+
+def _normalize_record(table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    record = dict(record)
+    for column in LIST_COLUMNS.get(table, ()):
+        value = record.get(column)
+        if value is None:
+            record[column] = []
+        elif isinstance(value, str):
+            record[column] = [item.strip() for item in value.split(";") if item.strip()]
+        else:
+            record[column] = list(value)
+    for column, cast in NUMERIC_COLUMNS.get(table, {}).items():
+        if record.get(column) not in (None, ""):
+            record[column] = cast(record[column])
+    if table == "human_resources" and not record.get("current_assignment"):
+        record["current_assignment"] = None
+    return record
+
+
+def load_csv(store: FactoryStore, table: str, path: str) -> int:
+    """
+    Bulk-loads one table from a CSV file with a header row.
+
+    Args:
+        store: The store to load into.
+        table: One of "machines", "machine_details", "inventory", "human_resources".
+        path: Path to the CSV file. List columns use ";" between items.
+
+    Returns:
+        The number of records loaded.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {TABLES}")
+    with open(path, newline="", encoding="utf-8") as f:
+        records = [_normalize_record(table, row) for row in csv.DictReader(f)]
+    store.load_records(**{table: records})
+    return len(records)
+
+
+def load_parquet(store: FactoryStore, table: str, path: str) -> int:
+    """Bulk-loads one table from a Parquet file (requires pandas with a Parquet engine)."""
+    import pandas as pd
+
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {TABLES}")
+    records = [_normalize_record(table, row) for row in pd.read_parquet(path).to_dict("records")]
+    store.load_records(**{table: records})
+    return len(records)
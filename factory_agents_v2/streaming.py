@@ -0,0 +1,255 @@
+"""
+Streaming Sensor Ingestion for Smart Factory Operations.
+
+Reads live sensor readings from an asyncio source, micro-batches them by size
+and time, scores each batch with the maintenance model in one call, and emits
+an alert only when a machine flips from healthy to needing maintenance. Every
+scored reading is also recorded in the sensor history (`get_history()` unless
+another one is given), which the MaintenanceAgent's trend aggregates read.
+Batches are scored on the inference service's executor (see `inference`), so
+the event loop keeps reading the source meanwhile. The
+orchestrator can then be run for those machines alone instead of polling the
+whole fleet.
+"""
+import asyncio
+import collections
+import inspect
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from factory_agents_v2.inference import InferenceService, get_inference_service
+from factory_agents_v2.predictor import MaintenancePredictor
+from factory_agents_v2.sensor_history import SensorHistory, get_history
+
+logger = logging.getLogger(__name__)
+
+
+# --- Sources ---
+
+async def iterate_readings(readings: Iterable[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Wraps a plain iterable of readings as an async source (useful in tests and replays)."""
+    for reading in readings:
+        yield reading
+
+
+async def read_jsonl(reader: asyncio.StreamReader) -> AsyncIterator[Dict[str, Any]]:
+    """Yields one reading per newline-delimited JSON line from a stream."""
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+async def socket_source(host: str, port: int) -> AsyncIterator[Dict[str, Any]]:
+    """Connects to a local socket that publishes newline-delimited JSON readings."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async for reading in read_jsonl(reader):
+            yield reading
+    finally:
+        writer.close()
+
+
+async def tail_file(path: str, poll_interval: float = 0.2,
+                    from_start: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Follows a JSONL file like `tail -f`, yielding readings as lines are appended."""
+    with open(path, "r", encoding="utf-8") as f:
+        if not from_start:
+            f.seek(0, 2)
+        pending = ""
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                await asyncio.sleep(poll_interval)
+                continue
+            pending += chunk
+            if not pending.endswith("\n"):
+                continue
+            line, pending = pending.strip(), ""
+            if line:
+                yield json.loads(line)
+
+
+# --- Pipeline ---
+
+class StreamMetrics:
+    """Throughput and end-to-end latency counters for a running pipeline."""
+
+    def __init__(self, latency_samples: int = 10000):
+        self.started = time.perf_counter()
+        self.readings_received = 0
+        self.readings_scored = 0
+        self.batches = 0
+        self.alerts = 0
+        self.errors = 0
+        self._latencies = collections.deque(maxlen=latency_samples)
+
+    def observe_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the current counters, readings/sec since start and latency percentiles in ms."""
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {
+            "readings_received": self.readings_received,
+            "readings_scored": self.readings_scored,
+            "batches": self.batches,
+            "alerts": self.alerts,
+            "errors": self.errors,
+            "mean_batch_size": self.readings_scored / self.batches if self.batches else 0.0,
+            "readings_per_sec": self.readings_scored / elapsed if elapsed else 0.0,
+            "latency_p50_ms": pct(50),
+            "latency_p99_ms": pct(99),
+        }
+
+
+class StreamingScorer:
+    """Micro-batching scorer that turns a stream of readings into maintenance alerts."""
+
+    def __init__(self, on_alert: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 predictor: Optional[MaintenancePredictor] = None, batch_size: int = 512,
+                 max_batch_delay: float = 0.05, queue_size: int = 10000,
+                 history: Optional[SensorHistory] = None, record_history: bool = True,
+                 service: Optional[InferenceService] = None):
+        """
+        Args:
+            on_alert: Called (or awaited, if it is a coroutine function) with one
+                dict per machine that flips to maintenance required.
+            predictor: Scores the batches on a single-thread inference service of
+                the scorer's own; without it (and `service`), batches go to the
+                process-wide inference service.
+            batch_size: Largest number of readings scored in one model call.
+            max_batch_delay: Seconds to wait for a batch to fill before scoring it anyway.
+            queue_size: Bound on buffered readings; the source is paused when it is full.
+            history: The `SensorHistory` new readings are recorded in; defaults to `get_history()`.
+            record_history: Record readings at all; False leaves every history untouched.
+            service: The inference service to score on.
+        """
+        self.on_alert = on_alert
+        self.predictor = predictor
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.queue_size = queue_size
+        self.history = history
+        self.record_history = record_history
+        self.service = service
+        self._own_service: Optional[InferenceService] = None
+        self.metrics = StreamMetrics()
+        # Last prediction per machine; alerts fire on the False -> True edge only.
+        self.state: Dict[str, bool] = {}
+
+    async def run(self, source: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Consumes `source` until it is exhausted and returns the final metrics.
+
+        If the source raises, the readings it delivered are still scored and its
+        exception is then raised from here; `metrics` keeps the counters.
+        """
+        self.metrics = StreamMetrics()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._produce(source, queue))
+        try:
+            await self._consume(queue)
+        finally:
+            producer.cancel()
+            if self._own_service is not None:
+                self._own_service.shutdown()
+        (outcome,) = await asyncio.gather(producer, return_exceptions=True)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return self.metrics.snapshot()
+
+    def _get_service(self) -> InferenceService:
+        if self.service is not None:
+            return self.service
+        if self.predictor is None:
+            return get_inference_service()
+        if self._own_service is None:
+            self._own_service = InferenceService(self.predictor, workers=1, max_batch_delay=0.0)
+        return self._own_service
+
+    async def _produce(self, source: AsyncIterator[Dict[str, Any]], queue: asyncio.Queue) -> None:
+        try:
+            async for reading in source:
+                # Blocks while the queue is full, which applies backpressure to the source.
+                await queue.put((time.perf_counter(), reading))
+                self.metrics.readings_received += 1
+        except Exception:
+            logger.exception("Sensor source failed; stopping the stream")
+            self.metrics.errors += 1
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            await self._score(batch)
+
+    async def _score(self, batch: List[Any]) -> None:
+        readings = [reading for _, reading in batch]
+        try:
+            predictions = await self._get_service().score(readings)
+        except Exception as e:
+            if len(batch) > 1:
+                # Score the readings one by one, so only the malformed ones are dropped.
+                for item in batch:
+                    await self._score([item])
+                return
+            logger.warning("Dropping a reading that could not be scored: %s", e)
+            self.metrics.errors += 1
+            return
+
+        now = time.perf_counter()
+        self.metrics.batches += 1
+        self.metrics.readings_scored += len(batch)
+        history = (self.history or get_history()) if self.record_history else None
+        for (enqueued, reading), prediction in zip(batch, predictions):
+            self.metrics.observe_latency(now - enqueued)
+            machine_id = reading.get("machine_id") or reading.get("id")
+            if history is not None and "timestamp" in reading:
+                history.observe(machine_id, reading)
+            flagged = prediction["maintenance_required"]
+            previously = self.state.get(machine_id, False)
+            self.state[machine_id] = flagged
+            if flagged and not previously:
+                self.metrics.alerts += 1
+                await self._emit(dict(prediction, machine_id=machine_id, readings=reading))
+
+    async def _emit(self, alert: Dict[str, Any]) -> None:
+        if self.on_alert is None:
+            return
+        result = self.on_alert(alert)
+        if inspect.isawaitable(result):
+            await result
@@ -0,0 +1,393 @@
+"""
+Tracing and Metrics for Smart Factory Agents.
+
+Every tool function is wrapped with `@instrumented_tool`, every agent gets the
+`before/after_agent_callback`s from `agent_callbacks()`, the shared LLM client
+reports each model hop, and slow internals (model load, database construction,
+SMTP handshake) are wrapped in `span(...)`. Each of these records one span:
+wall time, CPU time, payload bytes, prompt/completion tokens and whether it
+failed. Spans feed in-process counters and latency histograms, labelled by
+`kind` ("tool", "agent", "llm" or "internal") and `name`, and are passed to the
+registered exporters.
+
+Configuration comes from the environment: `TELEMETRY_JSONL` (file that every
+span is appended to), `TELEMETRY_PROMETHEUS_PORT` (serves the metrics in
+Prometheus text format on `/metrics`) and `TELEMETRY_PROFILE` ("1" profiles
+every agent request with cProfile; otherwise only requests whose session state
+has `profile` set are profiled), with `.prof` files written to
+`TELEMETRY_PROFILE_DIR`. cProfile records everything that runs on the event
+loop's thread, so a request is only profiled if no other request is running
+when it starts; if another one starts before it ends, the profile covers both
+and is written as `<invocation_id>.loop.prof`, with the span's `profile_scope`
+set to "loop" instead of "invocation". An agent run that raises gets no after-agent callback
+(ADK has no error callback); the next agent run to start closes it and writes
+its profile, without recording a span.
+"""
+import bisect
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+
+Labels = Tuple[str, str]
+
+
+# --- Metrics ---
+
+class MetricsRegistry:
+    """Counters and latency histograms per (kind, name)."""
+
+    COUNTERS = ("calls", "errors", "cpu_seconds", "payload_bytes", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Labels, Dict[str, float]] = {}
+        self._histograms: Dict[Labels, Dict[str, Any]] = {}
+
+    def record(self, span: Dict[str, Any]) -> None:
+        labels = (span["kind"], span["name"])
+        with self._lock:
+            counters = self._counters.setdefault(labels, dict.fromkeys(self.COUNTERS, 0))
+            counters["calls"] += 1
+            counters["errors"] += 1 if span.get("error") else 0
+            for key in self.COUNTERS[2:]:
+                counters[key] += span.get(key) or 0
+            histogram = self._histograms.setdefault(
+                labels, {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0})
+            histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS, span["wall_seconds"])] += 1
+            histogram["sum"] += span["wall_seconds"]
+            histogram["count"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns `{"<kind>:<name>": counters + wall-time histogram}`."""
+        bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        with self._lock:
+            return {
+                f"{kind}:{name}": dict(
+                    self._counters[(kind, name)],
+                    wall_seconds_sum=self._histograms[(kind, name)]["sum"],
+                    wall_seconds_buckets=dict(zip(bounds, self._histograms[(kind, name)]["buckets"])),
+                )
+                for kind, name in self._counters
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for counter in self.COUNTERS:
+                metric = f"factory_{counter}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (kind, name), counters in sorted(self._counters.items()):
+                    lines.append(f'{metric}{{kind="{kind}",name="{name}"}} {counters[counter]}')
+            metric = "factory_wall_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (kind, name), histogram in sorted(self._histograms.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                cumulative = 0
+                for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# --- Exporters ---
+
+class SpanExporter(ABC):
+    """Receives every finished span."""
+
+    @abstractmethod
+    def export(self, span: Dict[str, Any]) -> None:
+        """Handles one span; must not raise."""
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlExporter(SpanExporter):
+    """Appends each span as one JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter(SpanExporter):
+    """Serves the registry in Prometheus text format on `http://<host>:<port>/metrics`."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None):
+        registry = registry or metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, name="PrometheusExporter", daemon=True).start()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        # Metrics are read from the registry when scraped.
+        pass
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+metrics = MetricsRegistry()
+_exporters: List[SpanExporter] = []
+_exporters_lock = threading.Lock()
+_configured = False
+
+
+def _configure() -> None:
+    global _configured
+    if _configured:
+        return
+    with _exporters_lock:
+        if _configured:
+            return
+        _configured = True
+        if os.getenv("TELEMETRY_JSONL"):
+            _exporters.append(JsonlExporter(os.getenv("TELEMETRY_JSONL")))
+        if os.getenv("TELEMETRY_PROMETHEUS_PORT"):
+            _exporters.append(PrometheusExporter(int(os.getenv("TELEMETRY_PROMETHEUS_PORT"))))
+
+
+def add_exporter(exporter: SpanExporter) -> None:
+    """Registers an exporter for all spans finished from now on."""
+    _configure()
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def remove_exporter(exporter: SpanExporter) -> None:
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def record_span(kind: str, name: str, wall_seconds: float, cpu_seconds: Optional[float] = None,
+                payload_bytes: Optional[int] = None, prompt_tokens: Optional[int] = None,
+                completion_tokens: Optional[int] = None, error: Optional[str] = None,
+                **attributes: Any) -> None:
+    """Records one finished operation in the metrics and passes it to the exporters."""
+    _configure()
+    span = {"timestamp": time.time(), "kind": kind, "name": name, "wall_seconds": wall_seconds,
+            "cpu_seconds": cpu_seconds, "payload_bytes": payload_bytes, "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens, "error": error}
+    span.update(attributes)
+    metrics.record(span)
+    for exporter in list(_exporters):
+        try:
+            exporter.export(span)
+        except Exception:
+            pass
+
+
+def _payload_size(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    try:
+        return len(json.dumps(result, separators=(",", ":"), default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any):
+    """Times the enclosed block (wall and thread CPU time) as one span."""
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record_span(kind, name, time.perf_counter() - start, time.thread_time() - cpu_start,
+                    error=error, **attributes)
+
+
+def instrumented_tool(fn: Callable) -> Callable:
+    """
+    Records a "tool" span for every call of `fn`, with the size of its result.
+
+    The wrapper keeps `fn`'s name, docstring and signature, so ADK builds the
+    same function declaration for it. For async tools the CPU time also covers
+    other tasks that ran on the event loop while the tool was awaiting.
+    """
+    name = fn.__name__
+
+    def finish(start: float, cpu_start: float, result: Any, error: Optional[str]) -> None:
+        record_span("tool", name, time.perf_counter() - start, time.thread_time() - cpu_start,
+                    payload_bytes=_payload_size(result) if error is None else None, error=error)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                finish(start, cpu_start, None, f"{type(e).__name__}: {e}")
+                raise
+            finish(start, cpu_start, result, None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            finish(start, cpu_start, None, f"{type(e).__name__}: {e}")
+            raise
+        finish(start, cpu_start, result, None)
+        return result
+    return wrapper
+
+
+# --- Agent callbacks and profiling ---
+
+# Start wall and CPU time, profiler and a weak reference to the invocation context of each running agent.
+_running: Dict[Tuple[str, str], Tuple[float, float, Optional[cProfile.Profile], Callable[[], Any]]] = {}
+_running_lock = threading.Lock()
+# cProfile cannot profile two requests at once, so concurrent requests skip profiling.
+_profiler_lock = threading.Lock()
+# The invocation being profiled, and whether another one ran on the loop meanwhile (guarded by _running_lock).
+_profiled: Dict[str, Any] = {"invocation_id": None, "shared": False}
+# A run still open after this long is treated as abandoned even if its invocation context is still alive.
+STALE_RUN_SECONDS = 600.0
+
+
+def _profiling_requested(callback_context) -> bool:
+    if os.getenv("TELEMETRY_PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return bool(callback_context.state.get("profile"))
+    except Exception:
+        return False
+
+
+def _invocation_ref(callback_context) -> Callable[[], Any]:
+    try:
+        return weakref.ref(callback_context._invocation_context)
+    except (AttributeError, TypeError):
+        return lambda: True
+
+
+def _close_stale_runs() -> None:
+    """Closes the runs that ended without an after-agent callback, so their profiler stops and frees the lock."""
+    now = time.perf_counter()
+    with _running_lock:
+        stale = [key for key, (start, _, _, alive) in _running.items()
+                 if alive() is None or now - start > STALE_RUN_SECONDS]
+        runs = [(key, _running.pop(key)) for key in stale]
+    for key, (_, _, profiler, _) in runs:
+        if profiler is not None:
+            _stop_profiler(profiler, key[0])
+
+
+def _stop_profiler(profiler: cProfile.Profile, invocation_id: str) -> Tuple[str, str]:
+    """Stops and saves a profile; returns its path and scope, "loop" if another request overlapped it."""
+    profiler.disable()
+    with _running_lock:
+        scope = "loop" if _profiled["shared"] else "invocation"
+        _profiled.update(invocation_id=None, shared=False)
+    _profiler_lock.release()
+    directory = os.getenv("TELEMETRY_PROFILE_DIR") or DEFAULT_PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{invocation_id}.loop.prof" if scope == "loop" else f"{invocation_id}.prof")
+    profiler.dump_stats(path)
+    return path, scope
+
+
+def _before_agent(callback_context) -> None:
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    profiler = None
+    _close_stale_runs()
+    # Only the outermost agent of a request is profiled; sub-agents run inside it. A request that
+    # starts while others run is not profiled: their work on the loop would end up in its profile.
+    with _running_lock:
+        running = {invocation for invocation, _ in _running}
+        outermost = key[0] not in running
+        if outermost and _profiled["invocation_id"] is not None:
+            _profiled["shared"] = True
+    if (outermost and not running and _profiling_requested(callback_context)
+            and _profiler_lock.acquire(blocking=False)):
+        with _running_lock:
+            _profiled.update(invocation_id=key[0], shared=False)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with _running_lock:
+        _running[key] = (time.perf_counter(), time.process_time(), profiler, _invocation_ref(callback_context))
+    return None
+
+
+def _after_agent(callback_context) -> None:
+    key = (callback_context.invocation_id, callback_context.agent_name)
+    with _running_lock:
+        started = _running.pop(key, None)
+    if started is None:
+        return None
+    start, cpu_start, profiler, _ = started
+    attributes = {"invocation_id": key[0]}
+    if profiler is not None:
+        attributes["profile"], attributes["profile_scope"] = _stop_profiler(profiler, key[0])
+    # Process CPU time: agent runs interleave on the event loop and tools may use threads.
+    record_span("agent", key[1], time.perf_counter() - start, time.process_time() - cpu_start, **attributes)
+    return None
+
+
+def agent_callbacks() -> Dict[str, Callable]:
+    """Keyword arguments that make an `LlmAgent` record one "agent" span per invocation."""
+    return {"before_agent_callback": _before_agent, "after_agent_callback": _after_agent}
+
+
+def telemetry_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Returns the current counters and histograms; see `MetricsRegistry.snapshot`."""
+    return metrics.snapshot()
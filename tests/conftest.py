@@ -0,0 +1,66 @@
+import pytest
+
+from factory_agents_v2.MockDB import MockDB, reset_db, set_db
+from factory_agents_v2.sqlite_store import SQLiteStore
+from factory_agents_v2.storage import seed_sample_data
+
+BACKENDS = ["mock", "sqlite"]
+
+
+def make_store(backend, tmp_path, seed=True):
+    store = MockDB(sample_data=False) if backend == "mock" else SQLiteStore(str(tmp_path / f"{backend}.db"))
+    if seed:
+        seed_sample_data(store)
+    return store
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path):
+    """Each backend, loaded with the sample dataset."""
+    store = make_store(request.param, tmp_path)
+    yield store
+    if isinstance(store, SQLiteStore):
+        store.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def empty_store(request, tmp_path):
+    """Each backend, with no data."""
+    store = make_store(request.param, tmp_path, seed=False)
+    yield store
+    if isinstance(store, SQLiteStore):
+        store.close()
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """Both backends side by side, each loaded with the sample dataset."""
+    stores = {backend: make_store(backend, tmp_path) for backend in BACKENDS}
+    yield stores
+    stores["sqlite"].close()
+
+
+@pytest.fixture(params=BACKENDS)
+def shard_factory(request, tmp_path):
+    """Creates empty stores of each backend, one per plant of a `ShardedStore`."""
+    created = []
+
+    def create():
+        directory = tmp_path / f"plant-{len(created)}"
+        directory.mkdir()
+        created.append(make_store(request.param, directory, seed=False))
+        return created[-1]
+
+    yield create
+    for store in created:
+        if isinstance(store, SQLiteStore):
+            store.close()
+
+
+@pytest.fixture
+def shared_db():
+    """A fresh sample MockDB as the process-wide `get_db()` store the tools use."""
+    db = MockDB()
+    set_db(db)
+    yield db
+    reset_db()
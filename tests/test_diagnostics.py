@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import shutil
+
+from factory_agents_v2.diagnostics import DiagnosticCache, diagnose_machines, rank_by_risk
+from factory_agents_v2.predictor import DEFAULT_MODEL_PATH, MaintenancePredictor
+
+MACHINES = ["PUMP-A-01", "MOTOR-B-02", "COMPRESSOR-D-04"]
+
+
+class CountingPredictor:
+    """Flags readings hotter than 80 degrees and records which machines it scored."""
+
+    model_version = "v1"
+
+    def __init__(self):
+        self.scored = []
+
+    def predict_batch(self, readings, explain=False):
+        self.scored.extend(reading["id"] for reading in readings)
+        return [{"maintenance_required": reading["temperature"] > 80,
+                 "failure_probability": 0.9 if reading["temperature"] > 80 else 0.1,
+                 "main_factor": "temperature"} for reading in readings]
+
+
+def diagnose(store, predictor, cache, machine_ids=MACHINES):
+    return diagnose_machines(machine_ids, db=store, predictor=predictor, cache=cache)
+
+
+def update_reading(store, machine_id, **values):
+    store.load_records(machine_details=[dict(store.get_machine_details(machine_id), **values)])
+
+
+def test_a_diagnosis_is_reused_until_the_reading_changes(store):
+    predictor, cache = CountingPredictor(), DiagnosticCache()
+    first = diagnose(store, predictor, cache)
+    assert diagnose(store, predictor, cache) == first
+    assert predictor.scored == MACHINES
+    assert cache.stats()["hits"] == 3
+
+    update_reading(store, "PUMP-A-01", temperature=95.0)
+    # Same sensor values, new timestamp: still a new reading.
+    update_reading(store, "MOTOR-B-02", timestamp="2024-08-02 09:00:00")
+    second = diagnose(store, predictor, cache)
+    assert predictor.scored == MACHINES + ["PUMP-A-01", "MOTOR-B-02"]
+    assert second[0]["maintenance_required"] and second[0]["issue_description"] == "High temperature of 95.0 °C"
+    assert second[1]["readings"]["timestamp"] == "2024-08-02 09:00:00"
+    assert second[2] == first[2]
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_a_new_model_version_rescores_every_machine(store):
+    predictor, cache = CountingPredictor(), DiagnosticCache()
+    diagnose(store, predictor, cache)
+    predictor.model_version = "v2"
+    diagnose(store, predictor, cache)
+    assert predictor.scored == MACHINES * 2
+
+
+def test_cached_diagnoses_look_like_fresh_ones(store):
+    predictor, cache = CountingPredictor(), DiagnosticCache()
+    fresh = diagnose(store, predictor, cache)
+    # The tool results the model reads must not change with cache hits.
+    assert all("cached" not in diagnosis for diagnosis in fresh)
+    fresh[0]["readings"]["temperature"] = -1.0
+    fresh[0]["edited"] = True
+    cached = diagnose(store, predictor, cache)
+    assert cached[0]["readings"]["temperature"] == 70.5 and "edited" not in cached[0]
+    assert [d["machine_id"] for d in rank_by_risk(cached)] == ["MOTOR-B-02", "COMPRESSOR-D-04", "PUMP-A-01"]
+
+
+def test_unknown_machines_are_reported_not_cached(store):
+    cache = DiagnosticCache()
+    assert diagnose(store, CountingPredictor(), cache, ["NO-SUCH"]) == [
+        {"machine_id": "NO-SUCH", "error": "Machine NO-SUCH not found"}]
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = DiagnosticCache(max_entries=2)
+    cache.put("A", ("v1",), {"machine_id": "A"})
+    cache.put("B", ("v1",), {"machine_id": "B"})
+    assert cache.get("A", ("v1",)) == {"machine_id": "A"}
+    cache.put("C", ("v1",), {"machine_id": "C"})
+    assert cache.get("B", ("v1",)) is None
+    assert cache.get("A", ("v1",)) is not None and cache.get("C", ("v1",)) is not None
+    assert cache.stats() == {"hits": 3, "misses": 1, "invalidations": 0, "size": 2, "max_entries": 2}
+
+    # A lookup with another version drops the entry.
+    assert cache.get("A", ("v2",)) is None and cache.stats()["size"] == 1
+    cache.invalidate()
+    assert cache.stats()["size"] == 0 and cache.stats()["invalidations"] == 2
+
+
+def test_a_reloaded_model_invalidates_the_cache(store, tmp_path):
+    model_path = str(tmp_path / "maintenance_model.joblib")
+    shutil.copy(DEFAULT_MODEL_PATH, model_path)
+    artifact = os.path.splitext(DEFAULT_MODEL_PATH)[0] + ".npz"
+    if os.path.exists(artifact):
+        shutil.copy(artifact, tmp_path / "maintenance_model.npz")
+    predictor, cache = MaintenancePredictor(model_path), DiagnosticCache()
+    first = diagnose(store, predictor, cache)
+    diagnose(store, predictor, cache)
+    assert predictor.prediction_count == 3
+
+    mtime = os.path.getmtime(model_path) + 10
+    for path in tmp_path.iterdir():
+        os.utime(path, (mtime, mtime))
+    assert diagnose(store, predictor, cache) == first
+    assert predictor.load_count == 2 and predictor.prediction_count == 6
+
+
+def test_diagnosis_tool_payload_is_the_same_on_a_cache_hit(shared_db, monkeypatch):
+    from factory_agents_v2 import diagnostics
+    from factory_agents_v2.agent import get_machine_diagnosis
+
+    monkeypatch.setattr(diagnostics, "_cache", DiagnosticCache())
+    first = asyncio.run(get_machine_diagnosis("MOTOR-B-02"))
+    assert asyncio.run(get_machine_diagnosis("MOTOR-B-02")) == first
+    assert diagnostics._cache.stats()["hits"] == 1
+    assert "cached" not in json.loads(first) and json.loads(first)["maintenance_required"] is True
+
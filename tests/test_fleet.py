@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+from google.genai import types
+
+from benchmarks.fake_llm import ScriptedLlm
+from factory_agents_v2.fleet import APP_NAME, diagnose_fleet, get_runner
+from factory_agents_v2.MockDB import MockDB, reset_db, set_db
+
+UNHEALTHY = ["COMPRESSOR-D-04", "GEARBOX-F-03", "MOTOR-B-02"]
+
+
+class SlowLlm(ScriptedLlm):
+    """
+    Scripted model that takes a moment per turn and records how many turns overlap.
+
+    Its final answer also transfers back to the orchestrator, as the agent's instruction asks.
+    """
+
+    in_flight: int = 0
+    peak: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        async for response in super().generate_content_async(llm_request, stream):
+            if response.content.parts[0].text:
+                response.content.parts.append(types.Part(function_call=types.FunctionCall(
+                    name="transfer_to_agent", args={"agent_name": "OrchestratorAgent"})))
+            yield response
+
+
+def logistics_script(user_text, results):
+    ticket = json.loads(user_text)
+    if "find_available_technicians" not in results:
+        return ("call", "find_available_technicians", {"required_skills": ticket["required_skills"]})
+    technicians = [tech["id"] for tech in results["find_available_technicians"]]
+    return ("text", json.dumps({"status": "failure", "reason": "No matching part",
+                                "machine_id": ticket["machine_id"], "technicians": technicians}))
+
+
+@pytest.fixture
+def no_parts_db():
+    # Without a catalog no ticket can be settled by the scheduler, so every one goes to the agent.
+    sample = MockDB()
+    db = MockDB(sample_data=False)
+    db.load_records(machines=sample.machines.values(), machine_details=sample.machine_details.values(),
+                    human_resources=sample.human_resources.values())
+    set_db(db)
+    yield db
+    reset_db()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    runner = get_runner()
+    logistics = SlowLlm(script=logistics_script)
+    orchestrator = ScriptedLlm(script=lambda user_text, results: ("text", "unexpected"))
+    monkeypatch.setattr(runner.agent, "model", logistics)
+    monkeypatch.setattr(runner.agent.parent_agent, "model", orchestrator)
+    return logistics, orchestrator
+
+
+def test_concurrent_fleet_diagnostics(no_parts_db, models):
+    logistics, orchestrator = models
+
+    async def run_two():
+        return await asyncio.gather(diagnose_fleet(), diagnose_fleet(concurrency=2))
+
+    for report in asyncio.run(run_two()):
+        tickets = {ticket["machine_id"]: ticket["logistics"] for ticket in report["maintenance_required"]}
+        assert sorted(tickets) == UNHEALTHY
+        # Each ticket got the answer of its own agent run.
+        assert {machine_id: (logistics["machine_id"], logistics["technicians"])
+                for machine_id, logistics in tickets.items()} == {
+            "COMPRESSOR-D-04": ("COMPRESSOR-D-04", ["tech-001"]),
+            "GEARBOX-F-03": ("GEARBOX-F-03", ["tech-003"]),
+            "MOTOR-B-02": ("MOTOR-B-02", ["tech-001", "tech-003"]),
+        }
+    assert logistics.calls == 2 * len(UNHEALTHY) * 2
+    assert logistics.peak > 1
+    # The hand-back is not followed: the fleet report replaces the orchestrator's follow-up.
+    assert orchestrator.calls == 0
+
+
+def test_fleet_runs_share_one_runner(no_parts_db, models):
+    runner = get_runner()
+    assert runner.agent.parent_agent.name == "OrchestratorAgent"
+    asyncio.run(diagnose_fleet(UNHEALTHY[:1]))
+    assert get_runner() is runner
+    # Every ticket's session is dropped once its report is in.
+    assert runner.session_service.list_sessions(app_name=APP_NAME, user_id="fleet").sessions == []
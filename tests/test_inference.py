@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from factory_agents_v2.inference import InferenceService
+from factory_agents_v2.predictor import MaintenancePredictor
+
+READINGS = [{"temperature": 92.3, "vibration": 7.8, "pressure": 95.0},
+            {"temperature": 71.2, "vibration": 2.1, "pressure": 120.5},
+            {"temperature": 78.0, "vibration": 1.0, "pressure": 149.8}]
+
+
+class EchoPredictor:
+    """Scores a reading by its `id`, records the batches and fails any batch with a reading marked bad."""
+
+    model_version = "echo"
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, readings, explain=False):
+        self.batches.append([reading["id"] for reading in readings])
+        if any(reading.get("bad") for reading in readings):
+            raise ValueError("malformed reading")
+        results = [{"maintenance_required": False, "id": reading["id"]} for reading in readings]
+        if explain:
+            for result in results:
+                result["main_factor"] = "vibration"
+        return results
+
+
+def gather(service, *requests):
+    async def run():
+        return await asyncio.gather(*(service.predict(readings, **kwargs) for readings, kwargs in requests),
+                                    return_exceptions=True)
+    return asyncio.run(run())
+
+
+def request(*ids, explain=False, bad=()):
+    return [{"id": i, "bad": i in bad} for i in ids], {"explain": explain}
+
+
+def ids(results):
+    return [result["id"] for result in results]
+
+
+def test_concurrent_requests_are_coalesced():
+    predictor = EchoPredictor()
+    service = InferenceService(predictor, workers=1, max_batch_delay=0.01)
+    results = gather(service, request(1, 2), request(3), request(4, 5, 6))
+    assert [ids(each) for each in results] == [[1, 2], [3], [4, 5, 6]]
+    assert predictor.batches == [[1, 2, 3, 4, 5, 6]]
+    assert service.stats()["requests"] == 3 and service.stats()["batches"] == 1
+    service.shutdown()
+
+
+def test_batches_never_exceed_the_batch_size():
+    predictor = EchoPredictor()
+    service = InferenceService(predictor, workers=1, batch_size=3, max_batch_delay=0.01)
+    gather(service, request(1, 2), request(3), request(4, 5), request(6, 7, 8, 9))
+    # A larger request is never split.
+    assert predictor.batches == [[1, 2, 3], [4, 5], [6, 7, 8, 9]]
+    service.shutdown()
+
+
+def test_a_failed_batch_is_rescored_per_request():
+    predictor = EchoPredictor()
+    service = InferenceService(predictor, workers=1, max_batch_delay=0.01)
+    first, second, third = gather(service, request(1), request(2, 3, bad={3}), request(4))
+    assert (ids(first), ids(third)) == ([1], [4])
+    assert isinstance(second, ValueError)
+    assert predictor.batches == [[1, 2, 3, 4], [1], [2, 3], [4]]
+    service.shutdown()
+
+
+def test_explanations_go_only_to_requests_that_asked():
+    predictor = EchoPredictor()
+    service = InferenceService(predictor, executor="inline", max_batch_delay=0.01)
+    plain, explained = gather(service, request(1), request(2, explain=True))
+    assert predictor.batches == [[1, 2]]
+    assert "main_factor" not in plain[0] and explained[0]["main_factor"] == "vibration"
+
+
+def test_score_runs_one_batch_as_is():
+    predictor = EchoPredictor()
+    service = InferenceService(predictor, executor="inline")
+    assert ids(asyncio.run(service.score([{"id": 1}, {"id": 2}]))) == [1, 2]
+    assert service.stats()["requests"] == 0 and service.stats()["mean_batch_size"] == 2.0
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        InferenceService(executor="gpu")
+
+
+@pytest.mark.parametrize("executor", ["inline", "thread", "process"])
+def test_executors_match_the_predictor(executor):
+    predictor = MaintenancePredictor()
+    expected = predictor.predict_batch(READINGS, explain=True)
+    service = InferenceService(predictor, executor=executor)
+    try:
+        service.start()
+        results = gather(service, (READINGS[:1], {}), (READINGS[1:], {"explain": True}))
+        assert results[0] == [{key: expected[0][key] for key in ("maintenance_required", "failure_probability")}]
+        assert results[1] == expected[1:]
+        assert asyncio.run(service.score(READINGS, explain=True)) == expected
+    finally:
+        service.shutdown()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from benchmarks.fake_llm import FakeLLMServer
+from factory_agents_v2.llm import MemoryResponseCache, create_llm_model, request_key
+from factory_agents_v2.MockDB import MockDB, set_db
+
+MACHINE = "MOTOR-B-02"
+ISSUE = "High vibration and bearing noise"
+
+
+def llm_request(*contents):
+    return LlmRequest(model="gpt-4o", contents=list(contents))
+
+
+def tool_result(name, payload):
+    return types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+        name=name, response={"result": json.dumps(payload)}))])
+
+
+def hold(reservation_ids, expires_at):
+    return {"status": "success", "part_id": "part-brg-001", "technician_id": "tech-001",
+            "reservation_ids": reservation_ids, "hold_expires_at": expires_at}
+
+
+def test_key_ignores_volatile_tool_result_fields():
+    ask = types.Content(role="user", parts=[types.Part(text=f"Run diagnostics on {MACHINE}")])
+    first = llm_request(ask, tool_result("resolve", hold(["res-aaaa", "res-bbbb"], 1700000000.5)),
+                        tool_result("diagnose", {"failure_probability": 0.9, "cached": False}))
+    second = llm_request(ask, tool_result("resolve", hold(["res-cccc", "res-dddd"], 1700000600.25)),
+                         tool_result("diagnose", {"failure_probability": 0.9, "cached": True}))
+    key, values = request_key("gpt-4o", first)
+    assert request_key("gpt-4o", second) == (key, ["res-cccc", "res-dddd", "1700000600.25"])
+    assert values == ["res-aaaa", "res-bbbb", "1700000000.5"]
+
+    # Anything else in the result still counts.
+    failed = llm_request(ask, tool_result("resolve", dict(hold(["res-cccc", "res-dddd"], 1.0), status="failure")),
+                         tool_result("diagnose", {"failure_probability": 0.9}))
+    assert request_key("gpt-4o", failed)[0] != key
+
+
+def test_key_abstracts_volatile_values_passed_on():
+    # The same hold IDs in a later call's arguments and in a replayed answer are abstracted too.
+    def conversation(ids):
+        return llm_request(
+            types.Content(role="user", parts=[types.Part(text="go")]),
+            tool_result("resolve", hold(ids, 5.5)),
+            types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(
+                name="send_email", args={"reservation_ids": ids}))]),
+            types.Content(role="user", parts=[types.Part(text=f"[Inventory] said: {json.dumps(hold(ids, 5.5))}")]),
+        )
+
+    key = request_key("m", conversation(["res-3", "res-4"]))[0]
+    assert request_key("m", conversation(["res-1", "res-2"]))[0] == key
+    # Only whole values: "res-1" is not abstracted inside "res-12".
+    other = conversation(["res-1", "res-2"])
+    other.contents[0].parts[0].text = "res-12"
+    assert request_key("m", other)[0] != key
+
+
+# --- Round trip through LiteLLM against the fake endpoint ---
+
+confirmed = []
+
+
+def confirm_holds(reservation_ids: list[str]) -> dict:
+    """Confirms the held part and technician and notifies the maintenance team."""
+    from factory_agents_v2.MockDB import get_db
+
+    statuses = [get_db().confirm_reservation(reservation_id)["status"] for reservation_id in reservation_ids]
+    confirmed.append((list(reservation_ids), statuses))
+    return {"status": "queued", "message_id": f"msg-{uuid.uuid4().hex[:8]}"}
+
+
+def responder(request):
+    # Plays the model: resolve logistics, confirm the holds it got, then answer.
+    messages = request["messages"]
+    last = messages[-1]
+    if last["role"] == "user":
+        args = {"machine_id": MACHINE, "issue_description": ISSUE, "required_skills": ["Motor"]}
+        return {"tool_calls": [{"id": "call-1", "type": "function", "function": {
+            "name": "resolve_maintenance_logistics", "arguments": json.dumps(args)}}]}
+    called = messages[-2]["tool_calls"][0]["function"]["name"]
+    if called == "resolve_maintenance_logistics":
+        # ADK sends the tool's JSON string wrapped as {"result": ...}.
+        report = json.loads(json.loads(last["content"])["result"])
+        return {"tool_calls": [{"id": "call-2", "type": "function", "function": {
+            "name": "confirm_holds", "arguments": json.dumps({"reservation_ids": report["reservation_ids"]})}}]}
+    return {"content": f"Maintenance for {MACHINE} is scheduled."}
+
+
+async def diagnose(runner):
+    session = runner.session_service.create_session(app_name=runner.app_name, user_id="test")
+    message = types.Content(role="user", parts=[types.Part(text=f"Run diagnostics on {MACHINE}")])
+    events = [event async for event in runner.run_async(user_id="test", session_id=session.id,
+                                                        new_message=message)]
+    return events[-1].content.parts[0].text
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    with FakeLLMServer(responder=responder) as server:
+        monkeypatch.setenv("LITELLM_URL", server.url)
+        monkeypatch.delenv("MODEL_NAME", raising=False)
+        yield server
+
+
+def test_tool_call_round_trip_is_cached(fake_llm, shared_db):
+    from google.adk.agents import Agent
+    from google.adk.runners import InMemoryRunner
+    from factory_agents_v2.inventory_and_resource_agent import resolve_maintenance_logistics
+
+    agent = Agent(name="OrchestratorAgent", model=create_llm_model("test", cache=MemoryResponseCache()),
+                  instruction="Schedule maintenance.", tools=[resolve_maintenance_logistics, confirm_holds])
+    runner = InMemoryRunner(agent)
+    confirmed.clear()
+
+    assert asyncio.run(diagnose(runner)) == f"Maintenance for {MACHINE} is scheduled."
+    assert fake_llm.requests == 3
+
+    # Same stock and staff, but new reservation IDs, expiry time and message ID.
+    set_db(MockDB())
+    assert asyncio.run(diagnose(runner)) == f"Maintenance for {MACHINE} is scheduled."
+    assert fake_llm.requests == 3
+    (first_ids, first_statuses), (second_ids, second_statuses) = confirmed
+    assert first_ids != second_ids
+    # The cached reply passed on this run's holds, not the first run's.
+    assert first_statuses == second_statuses == ["confirmed", "confirmed"]
+
+    # The first run's technician is now taken, so the same ticket is a new request.
+    asyncio.run(diagnose(runner))
+    assert fake_llm.requests > 3
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from factory_agents_v2.model_export import (LeanModel, compile_model, export_model, file_sha256, parity_samples,
+                                            verify_parity)
+from factory_agents_v2.predictor import DEFAULT_MODEL_PATH
+
+joblib = pytest.importorskip("joblib")
+pytest.importorskip("sklearn")
+
+# The parity samples are plain arrays; sklearn warns that the model was fitted on named columns.
+pytestmark = pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+
+
+def assert_same_model(model, lean, X):
+    verify_parity(model, lean, X)
+    np.testing.assert_array_equal(lean.predict(X), model.predict(X))
+    np.testing.assert_allclose(lean.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-9)
+
+
+@pytest.fixture(scope="module")
+def maintenance_model():
+    return joblib.load(DEFAULT_MODEL_PATH)
+
+
+def synthetic_model(kind):
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.tree import DecisionTreeClassifier
+
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(400, 4))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1)
+    if kind == "linear":
+        return LogisticRegression(max_iter=500).fit(X, y)
+    # Trees learn where rows with a missing value go.
+    X[rng.random(X.shape) < 0.05] = np.nan
+    model = {"tree": DecisionTreeClassifier(max_depth=6, random_state=0),
+             "forest": RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+             "extra_trees": ExtraTreesClassifier(n_estimators=10, max_depth=6, random_state=0)}[kind]
+    return model.fit(X, y)
+
+
+def test_maintenance_model_parity(maintenance_model):
+    lean = LeanModel(compile_model(maintenance_model))
+    assert_same_model(maintenance_model, lean, parity_samples(maintenance_model, 5000))
+
+
+@pytest.mark.parametrize("kind", ["tree", "forest", "extra_trees", "linear"])
+def test_synthetic_model_parity(kind):
+    model = synthetic_model(kind)
+    lean = LeanModel(compile_model(model))
+    assert lean.kind == ("linear" if kind == "linear" else "tree")
+    assert_same_model(model, lean, parity_samples(model, 5000, seed=2))
+
+
+def test_verify_parity_rejects_a_different_model():
+    model = synthetic_model("forest")
+    other = LeanModel(compile_model(synthetic_model("tree")))
+    with pytest.raises(AssertionError):
+        verify_parity(model, other, parity_samples(model, 2000))
+
+
+def test_compile_model_rejects_unsupported_models():
+    from sklearn.neighbors import KNeighborsClassifier
+
+    model = KNeighborsClassifier().fit(np.arange(10.0).reshape(-1, 1), np.arange(10) % 2)
+    with pytest.raises(TypeError):
+        compile_model(model)
+
+
+def test_export_round_trip(maintenance_model, tmp_path):
+    out = tmp_path / "model.npz"
+    report = export_model(DEFAULT_MODEL_PATH, str(out), samples=2000)
+    assert report["artifact"] == str(out)
+    lean = LeanModel.load(str(out))
+    assert lean.source_sha256 == file_sha256(DEFAULT_MODEL_PATH)
+    assert_same_model(maintenance_model, lean, parity_samples(maintenance_model, 2000, seed=3))
+
+
+def test_shipped_artifact_matches_model():
+    artifact = DEFAULT_MODEL_PATH.rsplit(".", 1)[0] + ".npz"
+    assert LeanModel.load(artifact).source_sha256 == file_sha256(DEFAULT_MODEL_PATH)
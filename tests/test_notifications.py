@@ -0,0 +1,127 @@
+import email
+import smtplib
+import socket
+
+import pytest
+
+from factory_agents_v2.notifications import EmailDispatcher
+
+pytest.importorskip("aiosmtpd")
+
+
+class Inbox:
+    """aiosmtpd handler that keeps every message and can refuse the first few."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.refuse = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        if self.refuse:
+            self.refuse -= 1
+            return "451 Try again later"
+        self.messages.append((envelope.rcpt_tos, email.message_from_bytes(envelope.content)))
+        return "250 OK"
+
+
+@pytest.fixture
+def inbox():
+    from aiosmtpd.controller import Controller
+
+    # The controller checks it is up by connecting, so it needs a real port rather than 0.
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = Inbox()
+    handler.port = port
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def dispatcher(inbox, monkeypatch):
+    monkeypatch.delenv("ALERT_RECIPIENT_OVERRIDE", raising=False)
+    dispatchers = []
+
+    def make(**kwargs):
+        kwargs = {"digest_window": 0.0, "backoff": 0.01, **kwargs}
+        dispatchers.append(EmailDispatcher(host="127.0.0.1", port=inbox.port, sender="factory@example.com",
+                                           password="", use_starttls=False, **kwargs))
+        return dispatchers[-1]
+
+    yield make
+    for each in dispatchers:
+        each.stop(5)
+
+
+def subjects(inbox):
+    return sorted((rcpt_tos[0], message["Subject"]) for rcpt_tos, message in inbox.messages)
+
+
+def test_connection_is_reused(inbox, dispatcher):
+    sender = dispatcher()
+    ids = [sender.enqueue(f"tech-{n}@example.com", f"Alert {n}", "body") for n in range(3)]
+    assert sender.flush(5)
+    sender.enqueue("tech-0@example.com", "Alert 3", "body")
+    assert sender.flush(5)
+    assert [sender.status(message_id) for message_id in ids] == ["sent"] * 3
+    assert len(inbox.messages) == 4 and sender.sent_messages == 4
+    assert sender.connections_opened == 1 and len(inbox.sessions) == 1
+
+
+def test_alerts_to_one_recipient_are_sent_as_a_digest(inbox, dispatcher):
+    sender = dispatcher(digest_window=60.0)
+    sender.enqueue("alice@example.com", "Motor overheating", "Motor body")
+    sender.enqueue("bob@example.com", "Pump leaking", "Pump body")
+    sender.enqueue("alice@example.com", "Gearbox noise", "Gearbox body")
+    assert sender.flush(5)
+    assert subjects(inbox) == [("alice@example.com", "2 maintenance alerts"), ("bob@example.com", "Pump leaking")]
+    digest = next(message for rcpt_tos, message in inbox.messages if rcpt_tos == ["alice@example.com"])
+    body = digest.get_payload()[0].get_payload()
+    assert "Motor overheating" in body and "Gearbox body" in body
+    assert sender.sent_messages == 3
+
+
+def test_failed_sends_are_retried_on_a_new_connection(inbox, dispatcher):
+    sender = dispatcher(max_retries=2)
+    inbox.refuse = 2
+    message_id = sender.enqueue("alice@example.com", "Motor overheating", "body")
+    assert sender.flush(5)
+    assert sender.status(message_id) == "sent"
+    assert subjects(inbox) == [("alice@example.com", "Motor overheating")]
+    assert sender.connections_opened == 3
+
+
+def test_message_fails_once_retries_run_out(inbox, dispatcher):
+    sender = dispatcher(max_retries=1)
+    inbox.refuse = 2
+    message_id = sender.enqueue("alice@example.com", "Motor overheating", "body")
+    assert sender.flush(5)
+    assert sender.status(message_id) == "failed"
+    assert (sender.sent_messages, sender.failed_messages, inbox.messages) == (0, 1, [])
+    # The worker carries on.
+    assert sender.status(sender.enqueue("alice@example.com", "Pump leaking", "body")) != "unknown"
+    assert sender.flush(5) and len(inbox.messages) == 1
+
+
+def test_connection_is_closed_when_setup_fails(inbox, dispatcher, monkeypatch):
+    opened = []
+
+    class SMTP(smtplib.SMTP):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(smtplib, "SMTP", SMTP)
+    # The stand-in server does not offer STARTTLS.
+    sender = dispatcher(max_retries=1)
+    sender.use_starttls = True
+    message_id = sender.enqueue("alice@example.com", "Motor overheating", "body")
+    assert sender.flush(5)
+    assert sender.status(message_id) == "failed"
+    assert len(opened) == 2 and all(server.sock is None for server in opened)
+    assert sender.connections_opened == 0
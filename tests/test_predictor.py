@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_factory
+from factory_agents_v2.predictor import FEATURE_ORDER, MaintenancePredictor, to_feature_array
+
+READINGS = generate_factory(300, 1, 1, seed=3, unhealthy_fraction=0.3)["machine_details"]
+
+
+@pytest.fixture(params=["lean", "sklearn"])
+def predictor(request):
+    return MaintenancePredictor(model_format=request.param)
+
+
+def test_feature_array_follows_feature_order():
+    features = to_feature_array([{"pressure": 3, "temperature": 1, "vibration": 2, "id": "X"},
+                                 {"temperature": 4.5}])
+    assert features.shape == (2, 3) and features.dtype == np.float64 and features.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(features[0], [1.0, 2.0, 3.0])
+    assert features[1, 0] == 4.5 and np.isnan(features[1, 1:]).all()
+    assert to_feature_array([]).shape == (0, 3)
+
+
+def test_batch_matches_one_reading_at_a_time(predictor):
+    batch = predictor.predict_batch(READINGS)
+    assert batch == [predictor.predict_batch([reading])[0] for reading in READINGS]
+    assert [result["maintenance_required"] for result in batch] == [predictor.predict(r) for r in READINGS]
+    assert any(result["maintenance_required"] for result in batch)
+    assert not all(result["maintenance_required"] for result in batch)
+    assert predictor.predict_batch([]) == []
+
+
+def test_batch_matches_the_per_row_dataframe_path():
+    pd = pytest.importorskip("pandas")
+    predictor = MaintenancePredictor(model_format="sklearn")
+    model = predictor.model
+    # What `predict_maintenance` did before batching: a one-row DataFrame per reading.
+    expected = [bool(model.predict(pd.DataFrame([reading])[FEATURE_ORDER])[0]) for reading in READINGS]
+    assert [result["maintenance_required"] for result in predictor.predict_batch(READINGS)] == expected
+
+
+def test_backends_agree():
+    lean, sklearn = MaintenancePredictor(model_format="lean"), MaintenancePredictor(model_format="sklearn")
+    assert lean.predict_batch(READINGS) == sklearn.predict_batch(READINGS)
+    assert (lean.backend, sklearn.backend) == ("lean", "sklearn")
+
+
+def test_batch_tool_matches_the_single_reading_tool(shared_db):
+    from factory_agents_v2.maintenance_agent import predict_maintenance, predict_maintenance_batch
+
+    machine_ids = shared_db.get_machine_ids()
+    batch = json.loads(asyncio.run(predict_maintenance_batch(machine_ids + ["NO-SUCH"])))
+    assert sorted(entry["machine_id"] for entry in batch) == sorted(machine_ids + ["NO-SUCH"])
+    assert batch[-1] == {"machine_id": "NO-SUCH", "error": "Machine NO-SUCH not found"}
+    for entry in batch[:-1]:
+        single = json.loads(asyncio.run(predict_maintenance(shared_db.get_machine_details(entry["machine_id"]))))
+        assert (entry["maintenance_required"], entry["failure_probability"]) == (
+            single["maintenance_required"], single["failure_probability"])
+    flagged = sorted(entry["machine_id"] for entry in batch if entry.get("maintenance_required"))
+    assert flagged == ["COMPRESSOR-D-04", "GEARBOX-F-03", "MOTOR-B-02"]
+    assert len(json.loads(asyncio.run(predict_maintenance_batch(machine_ids, top_n=2)))) == 2
+
+
+# --- Probabilities and explanations ---
+
+EXPLAINED_FIELDS = {"maintenance_required", "failure_probability", "threshold", "contributions", "main_factor",
+                    "deviations"}
+
+
+def test_failure_probability_is_the_models():
+    pd = pytest.importorskip("pandas")
+    predictor = MaintenancePredictor(model_format="sklearn")
+    model = predictor.model
+    expected = model.predict_proba(pd.DataFrame(READINGS)[FEATURE_ORDER])[:, list(model.classes_).index(True)]
+    np.testing.assert_allclose([r["failure_probability"] for r in predictor.predict_batch(READINGS)], expected,
+                               atol=5e-5)
+
+
+def test_threshold_decides_the_verdict(monkeypatch):
+    default = MaintenancePredictor().predict_batch(READINGS, explain=True)
+    assert {result["threshold"] for result in default} == {0.5}
+    assert [r["maintenance_required"] for r in default] == [r["failure_probability"] >= 0.5 for r in default]
+    # The shipped tree's leaves are pure, so only the extremes move the verdict.
+    for threshold, flagged in ((0.0, len(READINGS)), (1.01, 0)):
+        results = MaintenancePredictor(threshold=threshold).predict_batch(READINGS, explain=True)
+        assert sum(r["maintenance_required"] for r in results) == flagged
+        assert {r["threshold"] for r in results} == {threshold}
+    monkeypatch.setenv("MAINTENANCE_THRESHOLD", "1.01")
+    assert not any(r["maintenance_required"] for r in MaintenancePredictor().predict_batch(READINGS))
+    assert MaintenancePredictor(threshold=0.0).predict_batch(READINGS[:1])[0]["maintenance_required"]
+
+
+def test_explanations(predictor):
+    results = predictor.predict_batch(READINGS, explain=True)
+    assert all(set(result) == EXPLAINED_FIELDS for result in results)
+    assert set(predictor.predict_batch(READINGS[:1])[0]) == {"maintenance_required", "failure_probability"}
+    # Contributions add up, with the model's prior, to the failure probability.
+    priors = [r["failure_probability"] - sum(r["contributions"].values()) for r in results]
+    assert max(priors) - min(priors) < 1e-3
+    for result in results:
+        top = max(result["contributions"], key=result["contributions"].get)
+        assert result["main_factor"] == (top if result["contributions"][top] > 0 else None)
+    # Explaining a prediction does not change it.
+    assert [r["maintenance_required"] for r in results] == [r["maintenance_required"]
+                                                             for r in predictor.predict_batch(READINGS)]
+
+
+def test_explanations_agree_across_backends():
+    lean = MaintenancePredictor(model_format="lean").predict_batch(READINGS, explain=True)
+    assert MaintenancePredictor(model_format="sklearn").predict_batch(READINGS, explain=True) == lean
+
+
+def test_range_deviations(predictor):
+    hot, cold, missing = predictor.predict_batch([
+        {"temperature": 92.3, "vibration": 8.7, "pressure": 145.2},
+        {"temperature": 40.0, "vibration": 1.0, "pressure": 100.0},
+        {"temperature": 70.0, "pressure": 100.0},
+    ], explain=True)
+    assert hot["deviations"] == {"temperature": 12.3, "vibration": 5.7}
+    assert cold["deviations"] == {"temperature": -10.0, "vibration": 0.0}
+    assert missing["deviations"] == {"temperature": 0.0, "vibration": None}
+    assert hot["maintenance_required"] and hot["main_factor"] in ("temperature", "vibration")
+
+
+def test_prediction_tool_explains_the_verdict():
+    from factory_agents_v2.maintenance_agent import predict_maintenance
+
+    result = json.loads(asyncio.run(predict_maintenance({"temperature": 92.3, "vibration": 8.7, "pressure": 145.2})))
+    assert set(result) == EXPLAINED_FIELDS
+    assert result["maintenance_required"] is True and result["failure_probability"] >= result["threshold"]
@@ -0,0 +1,167 @@
+import threading
+import time
+
+import pytest
+
+BEARING = "part-brg-001"  # 12 in stock
+GEAR_SET = "part-gr-set-007"  # out of stock
+
+
+def quantity(store, part_id):
+    return next(part["quantity"] for part in store.get_inventory() if part["id"] == part_id)
+
+
+def technician(store, technician_id):
+    return next(tech for tech in store.get_technicians() if tech["id"] == technician_id)
+
+
+def without_ids(result):
+    return {key: value for key, value in result.items() if key not in ("reservation_id", "expires_at")}
+
+
+def test_reserve_and_release_part(store):
+    held = store.reserve_part(BEARING, 2, "PUMP-A-01")
+    assert held["status"] == "held"
+    assert (held["kind"], held["id"], held["quantity"], held["machine_id"], held["version"]) == \
+           ("part", BEARING, 2, "PUMP-A-01", 1)
+    assert held["expires_at"] > time.time()
+    assert quantity(store, BEARING) == 10
+
+    assert store.release_reservation(held["reservation_id"])["status"] == "released"
+    assert quantity(store, BEARING) == 12
+    assert store.release_reservation(held["reservation_id"])["status"] == "error"
+
+
+@pytest.mark.parametrize("amount", [0, -5])
+def test_reserve_part_rejects_non_positive_quantities(store, amount):
+    result = store.reserve_part(BEARING, amount)
+    assert result["status"] == "error"
+    assert quantity(store, BEARING) == 12
+    assert BEARING in [part["id"] for part in store.get_inventory(in_stock_only=True)]
+
+
+def test_reserve_part_conflicts(store):
+    assert store.reserve_part(BEARING, 13) == {"status": "conflict", "reason": "Insufficient stock", "version": 0}
+    assert store.reserve_part(GEAR_SET)["reason"] == "Insufficient stock"
+    assert store.reserve_part("no-such-part")["status"] == "error"
+    assert quantity(store, BEARING) == 12
+
+
+def test_reserve_part_compare_and_set(store):
+    version = next(part["version"] for part in store.get_inventory() if part["id"] == BEARING)
+    assert store.reserve_part(BEARING, 1, expected_version=version)["status"] == "held"
+    # Another ticket read the part before that reservation.
+    stale = store.reserve_part(BEARING, 1, expected_version=version)
+    assert stale == {"status": "conflict", "reason": "Version changed", "version": version + 1}
+    assert quantity(store, BEARING) == 11
+
+
+def test_last_unit_goes_to_one_ticket(store):
+    assert store.reserve_part(BEARING, 11)["status"] == "held"
+    assert store.reserve_part(BEARING, 1)["status"] == "held"
+    assert store.reserve_part(BEARING, 1)["status"] == "conflict"
+    assert BEARING not in [part["id"] for part in store.get_inventory(in_stock_only=True)]
+
+
+def test_concurrent_reservations_never_oversell(store):
+    results = []
+    start = threading.Barrier(8)
+
+    def reserve():
+        start.wait()
+        for _ in range(3):
+            results.append(store.reserve_part(BEARING, 1)["status"])
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count("held") == 12
+    assert results.count("conflict") == 12
+    assert quantity(store, BEARING) == 0
+
+
+def test_mockdb_writes_records_under_the_read_lock():
+    # Readers copy records under `lock`, so every write to a record must hold it too.
+    from factory_agents_v2.MockDB import MockDB
+
+    db = MockDB()
+    unlocked = []
+
+    class Record(dict):
+        def __setitem__(self, key, value):
+            if not db.lock._is_owned():
+                unlocked.append(key)
+            super().__setitem__(key, value)
+
+    db.inventory[BEARING] = Record(db.inventory[BEARING])
+    db.human_resources["tech-001"] = Record(db.human_resources["tech-001"])
+    part = db.reserve_part(BEARING, 2)
+    tech = db.assign_technician("tech-001", "PUMP-A-01")
+    db.release_reservation(part["reservation_id"])
+    db.release_reservation(tech["reservation_id"])
+    db.reserve_part(BEARING, 1, hold_seconds=0)
+    db.expire_holds()
+    assert unlocked == []
+    assert quantity(db, BEARING) == 12
+
+
+def test_expired_holds_return_stock(store):
+    held = store.reserve_part(BEARING, 3, hold_seconds=60)
+    confirmed = store.reserve_part(BEARING, 2, confirm=True)
+    assert confirmed["status"] == "confirmed" and confirmed["expires_at"] is None
+    assert store.expire_holds(now=time.time() + 30) == 0
+    assert store.expire_holds(now=time.time() + 120) == 1
+    assert quantity(store, BEARING) == 10
+    assert store.confirm_reservation(held["reservation_id"])["status"] == "error"
+
+
+def test_confirmed_hold_survives_expiry(store):
+    held = store.reserve_part(BEARING, 3, hold_seconds=60)
+    assert store.confirm_reservation(held["reservation_id"])["status"] == "confirmed"
+    assert store.expire_holds(now=time.time() + 120) == 0
+    assert quantity(store, BEARING) == 9
+
+
+def test_assign_and_release_technician(store):
+    held = store.assign_technician("tech-001", "PUMP-A-01")
+    assert (held["status"], held["kind"], held["id"]) == ("held", "technician", "tech-001")
+    tech = technician(store, "tech-001")
+    assert (tech["availability"], tech["current_assignment"]) == ("busy", "PUMP-A-01")
+    assert [t["id"] for t in store.find_available_technicians(["Motor"])] == ["tech-003"]
+    assert store.assign_technician("tech-001", "MOTOR-B-02")["reason"] == "Technician not available"
+
+    assert store.release_reservation(held["reservation_id"])["status"] == "released"
+    tech = technician(store, "tech-001")
+    assert (tech["availability"], tech["current_assignment"]) == ("available", None)
+
+
+def test_assign_technician_conflicts(store):
+    # Busy technicians and machine operators are never assigned.
+    assert store.assign_technician("tech-002", "HVAC-G-11")["status"] == "conflict"
+    assert store.assign_technician("op-001", "PUMP-A-01")["status"] == "conflict"
+    assert store.assign_technician("no-such-tech", "PUMP-A-01")["status"] == "error"
+    assert store.assign_technician("tech-003", "X", expected_version=5)["reason"] == "Version changed"
+
+
+def test_expired_assignment_frees_technician(store):
+    store.assign_technician("tech-003", "TURBINE-C-01", hold_seconds=60)
+    assert store.expire_holds(now=time.time() + 120) == 1
+    assert technician(store, "tech-003")["availability"] == "available"
+
+
+def test_backends_agree_on_reservations(stores):
+    def run(store):
+        part = store.reserve_part(BEARING, 5, "PUMP-A-01")
+        tech = store.assign_technician("tech-001", "PUMP-A-01")
+        results = [part, tech, store.reserve_part(BEARING, 8), store.reserve_part(BEARING, -1),
+                   store.reserve_part(BEARING, 7, expected_version=0), store.reserve_part(BEARING, 7, confirm=True),
+                   store.assign_technician("tech-001", "MOTOR-B-02"), store.confirm_reservation(tech["reservation_id"]),
+                   store.release_reservation(part["reservation_id"])]
+        # The error names the reservation, whose ID differs between runs.
+        released_twice = store.release_reservation(part["reservation_id"])["status"]
+        return ([without_ids(result) for result in results], released_twice,
+                store.get_inventory(), store.get_technicians())
+
+    assert run(stores["mock"]) == run(stores["sqlite"])
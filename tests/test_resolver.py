@@ -0,0 +1,81 @@
+import pytest
+
+from factory_agents_v2.resource_resolver import NEEDS_REVIEW, resolve_maintenance_request
+
+BEARING = {"part_name": "Standard Bearing Assembly", "part_id": "part-brg-001"}
+ALICE = {"technician_name": "Alice Johnson", "technician_id": "tech-001"}
+
+
+def resolve(store, machine_id, issue, skills, **kwargs):
+    return resolve_maintenance_request(machine_id, issue, skills, db=store, **kwargs)
+
+
+def free_operator(store):
+    # op-001 sorts ahead of every technician and has the Pump and Motor skills.
+    operator = next(tech for tech in store.get_technicians() if tech["id"] == "op-001")
+    store.load_records(human_resources=[dict(operator, availability="available", current_assignment=None)])
+
+
+def test_success(store):
+    assert resolve(store, "MOTOR-B-02", "High vibration and bearing noise", ["Motor"]) == {
+        "status": "success", **BEARING, **ALICE}
+
+
+def test_skills_default_to_the_machine_type(store):
+    report = resolve(store, "TURBINE-C-01", "Blade imbalance", [])
+    assert (report["part_id"], report["technician_id"]) == ("part-trb-bld-003", "tech-003")
+
+
+def test_out_of_stock_part(store):
+    assert resolve(store, "GEARBOX-F-03", "Broken tooth on the gear", ["Gearbox"]) == {
+        "status": "failure", "reason": "Part out of stock", "part_name": "Primary Gear Set",
+        "part_id": "part-gr-set-007"}
+
+
+def test_no_available_technician(store):
+    # HVAC's only technician is busy.
+    assert resolve(store, "HVAC-G-11", "Clogged hvac filter", ["HVAC"]) == {
+        "status": "failure", "reason": "No available technician found"}
+
+
+def test_unmatched_issue_needs_review(store):
+    assert resolve(store, "PUMP-A-01", "Strange smell", ["Pump"])["status"] == NEEDS_REVIEW
+
+
+@pytest.mark.parametrize("reserve", [False, True])
+def test_machine_operators_are_never_picked(store, reserve):
+    free_operator(store)
+    assert [tech["id"] for tech in store.find_available_technicians(["Motor"])][0] == "op-001"
+    report = resolve(store, "MOTOR-B-02", "bearing noise", ["Motor"], reserve=reserve)
+    assert (report["status"], report["technician_id"]) == ("success", "tech-001")
+
+    # With every technician taken, an operator is no substitute.
+    store.assign_technician("tech-003", "GEARBOX-F-03")
+    if not reserve:
+        store.assign_technician("tech-001", "PUMP-A-01")
+    assert resolve(store, "PUMP-A-01", "Seal leaking", ["Pump"], reserve=reserve) == {
+        "status": "failure", "reason": "No available technician found"}
+
+
+def test_reserve_holds_part_and_technician(store):
+    report = resolve(store, "MOTOR-B-02", "bearing noise", ["Motor"], reserve=True)
+    assert {key: report[key] for key in ("status", "part_id", "technician_id")} == {
+        "status": "success", "part_id": "part-brg-001", "technician_id": "tech-001"}
+    assert len(report["reservation_ids"]) == 2 and report["hold_expires_at"] is not None
+    assert next(part for part in store.get_inventory() if part["id"] == "part-brg-001")["quantity"] == 11
+    # The next ticket gets the next technician.
+    assert resolve(store, "MOTOR-B-02", "bearing noise", ["Motor"], reserve=True)["technician_id"] == "tech-003"
+    assert resolve(store, "MOTOR-B-02", "bearing noise", ["Motor"], reserve=True)["reason"] == \
+        "No available technician found"
+    # Nothing is held for a ticket that failed.
+    assert next(part for part in store.get_inventory() if part["id"] == "part-brg-001")["quantity"] == 10
+
+
+def test_backends_agree(stores):
+    tickets = [("MOTOR-B-02", "High vibration and bearing noise", ["Motor"]), ("TURBINE-C-01", "Blade imbalance", []),
+               ("GEARBOX-F-03", "Broken tooth on the gear", ["Gearbox"]), ("HVAC-G-11", "hvac filter", ["HVAC"]),
+               ("COMPRESSOR-D-04", "overheating, pressure drop", ["Compressor"]), ("NO-SUCH", "bearing", ["Motor"])]
+    for store in stores.values():
+        free_operator(store)
+    assert ([resolve(stores["mock"], *ticket) for ticket in tickets]
+            == [resolve(stores["sqlite"], *ticket) for ticket in tickets])
@@ -0,0 +1,149 @@
+import pytest
+
+from factory_agents_v2.MockDB import MockDB
+from factory_agents_v2.resource_resolver import resolve_maintenance_request
+from factory_agents_v2.scheduler import schedule_tickets
+from factory_agents_v2.sharding import ShardedStore, qualify
+
+pytest.importorskip("scipy")
+
+MACHINES = [{"id": f"{kind.upper()}-{n}", "name": f"{kind} {n}", "type": kind, "status": "operational"}
+            for kind in ("Pump", "Motor", "Turbine") for n in (1, 2, 3)]
+
+
+def part(part_id, quantity, keywords=("bearing",), types=("Pump", "Motor", "Turbine")):
+    return {"id": part_id, "name": part_id.title(), "keywords": list(keywords), "quantity": quantity,
+            "location": "Bin 1", "applicable_machine_types": list(types)}
+
+
+def technician(tech_id, *skills, role="Maintenance Technician", availability="available"):
+    return {"id": tech_id, "name": tech_id.title(), "role": role, "skills": list(skills),
+            "availability": availability, "current_assignment": None}
+
+
+def ticket(machine_id, priority, issue="bearing noise"):
+    return {"machine_id": machine_id, "issue_description": issue,
+            "required_skills": [machine_id.split("-")[0].title()], "failure_probability": priority}
+
+
+@pytest.fixture
+def factory(empty_store):
+    def load(parts, technicians):
+        empty_store.load_records(machines=MACHINES, inventory=parts, human_resources=technicians)
+        return empty_store
+    return load
+
+
+def assigned(reports):
+    return [report.get("technician_id") for report in reports]
+
+
+def test_assignment_serves_every_ticket_greedy_would_not(factory):
+    # The generalist sorts first, so one-at-a-time matching spends it on the motor.
+    db = factory([part("bearing", 5)], [technician("tech-a", "Pump", "Motor"), technician("tech-b", "Motor")])
+    tickets = [ticket("MOTOR-1", 0.9), ticket("PUMP-1", 0.5)]
+    greedy = [resolve_maintenance_request(t["machine_id"], t["issue_description"], t["required_skills"], db=db)
+              for t in tickets]
+    assert assigned(greedy) == ["tech-a", "tech-a"]
+
+    reports = schedule_tickets(tickets, db=db)
+    assert [report["status"] for report in reports] == ["success", "success"]
+    assert assigned(reports) == ["tech-b", "tech-a"]
+
+
+def test_highest_priority_wins_a_short_technician(factory):
+    db = factory([part("bearing", 5)], [technician("tech-a", "Motor")])
+    reports = schedule_tickets([ticket("MOTOR-1", 0.2), ticket("MOTOR-2", 0.8), ticket("MOTOR-3", 0.5)], db=db)
+    assert assigned(reports) == [None, "tech-a", None]
+    assert reports[0] == reports[2] == {"status": "failure", "reason": "No available technician found"}
+
+
+def test_highest_priority_wins_a_short_part(factory):
+    db = factory([part("bearing", 1)], [technician("tech-a", "Motor"), technician("tech-b", "Motor")])
+    reports = schedule_tickets([ticket("MOTOR-1", 0.3), ticket("MOTOR-2", 0.7)], db=db)
+    assert reports[0] == {"status": "failure", "reason": "Part out of stock", "part_name": "Bearing",
+                          "part_id": "bearing"}
+    assert reports[1]["status"] == "success"
+
+
+def test_unserved_ticket_passes_its_part_on(factory):
+    # The urgent turbine ticket gets the only unit first, but no one can repair turbines.
+    db = factory([part("bearing", 1)], [technician("tech-a", "Motor")])
+    reports = schedule_tickets([ticket("TURBINE-1", 0.9), ticket("MOTOR-1", 0.1)], db=db)
+    assert reports[0]["reason"] == "No available technician found"
+    assert (reports[1]["status"], reports[1]["part_id"]) == ("success", "bearing")
+
+
+def test_specialist_is_preferred_on_a_tie(factory):
+    db = factory([part("bearing", 5)], [technician("tech-a", "Motor", "Pump", "Turbine"),
+                                        technician("tech-b", "Motor", "Pump"), technician("tech-c", "Motor")])
+    assert assigned(schedule_tickets([ticket("MOTOR-1", 0.5)], db=db)) == ["tech-c"]
+    # Priority still outweighs breadth: the urgent ticket is served whichever technician is left.
+    assert assigned(schedule_tickets([ticket("MOTOR-1", 0.1), ticket("PUMP-1", 0.9)], db=db)) == ["tech-c", "tech-b"]
+
+
+def test_operators_and_busy_staff_are_never_assigned(factory):
+    db = factory([part("bearing", 5)], [technician("op-1", "Motor", role="Machine Operator"),
+                                        technician("tech-a", "Motor", availability="busy")])
+    assert schedule_tickets([ticket("MOTOR-1", 0.9)], db=db) == [
+        {"status": "failure", "reason": "No available technician found"}]
+
+
+def test_unmatched_issue_needs_review(factory):
+    db = factory([part("bearing", 5)], [technician("tech-a", "Motor")])
+    assert schedule_tickets([ticket("MOTOR-1", 0.9, issue="strange smell")], db=db)[0]["status"] == "needs_review"
+
+
+def test_reserve_holds_the_assignment(factory):
+    db = factory([part("bearing", 2)], [technician("tech-a", "Motor"), technician("tech-b", "Pump")])
+    reports = schedule_tickets([ticket("MOTOR-1", 0.5), ticket("PUMP-1", 0.5)], db=db, reserve=True)
+    assert all(len(report["reservation_ids"]) == 2 for report in reports)
+    assert db.get_inventory()[0]["quantity"] == 0
+    assert db.find_available_technicians(["Motor"]) == []
+    # Nothing is left for a second batch.
+    assert schedule_tickets([ticket("MOTOR-2", 0.9)], db=db, reserve=True)[0]["reason"] == "Part out of stock"
+
+
+# --- Per-plant rounds on a sharded store ---
+
+def plant(machines, parts, technicians):
+    def load(store):
+        store.load_records(machines=[m for m in MACHINES if m["id"] in machines], inventory=parts,
+                           human_resources=technicians)
+    return load
+
+
+@pytest.fixture
+def plants():
+    db = ShardedStore(shard_factory=lambda: MockDB(sample_data=False))
+    db.add_plant("north", plant({"MOTOR-1", "MOTOR-2"}, [part("bearing", 5)], [technician("tech-n", "Motor")]),
+                 machine_ids=["MOTOR-1", "MOTOR-2"], neighbors=["east", "south"])
+    db.add_plant("east", plant({"PUMP-1"}, [part("bearing", 5)], [technician("tech-e", "Pump")]),
+                 machine_ids=["PUMP-1"])
+    db.add_plant("south", plant({"MOTOR-3"}, [part("bearing", 5)],
+                                [technician("tech-s1", "Motor"), technician("tech-s2", "Motor")]),
+                 machine_ids=["MOTOR-3"])
+    return db
+
+
+def test_plants_serve_their_own_tickets_first(plants):
+    reports = schedule_tickets([ticket("MOTOR-1", 0.5), ticket("MOTOR-3", 0.5)], db=plants)
+    assert assigned(reports) == ["tech-n", "tech-s1"]
+    assert [report["part_id"] for report in reports] == ["bearing", "bearing"]
+
+
+def test_overflow_goes_to_fallback_plants_in_rounds(plants):
+    # North has one motor technician for two tickets; east, its first fallback, has none.
+    tickets = [ticket("MOTOR-1", 0.9), ticket("MOTOR-2", 0.8), ticket("MOTOR-3", 0.1)]
+    reports = schedule_tickets(tickets, db=plants)
+    assert assigned(reports) == ["tech-n", qualify("south", "tech-s2"), "tech-s1"]
+    assert reports[1]["part_id"] == qualify("south", "bearing")
+
+
+def test_overflow_comes_after_the_plants_own_tickets(plants):
+    # South's own ticket takes its last technician, though the overflow ticket is more urgent.
+    tickets = [ticket("MOTOR-1", 0.9), ticket("MOTOR-2", 0.8), ticket("MOTOR-3", 0.5)]
+    plants.shard("south").assign_technician("tech-s2", "MOTOR-3")
+    reports = schedule_tickets(tickets, db=plants)
+    assert assigned(reports) == ["tech-n", None, "tech-s1"]
+    assert reports[1] == {"status": "failure", "reason": "No available technician found"}
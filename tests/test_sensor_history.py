@@ -0,0 +1,128 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from factory_agents_v2.sensor_history import SensorHistory, parse_timestamp
+from factory_agents_v2.streaming import StreamingScorer, iterate_readings
+
+T0 = parse_timestamp("2025-08-01T00:00:00")
+
+
+def reading(minute, temperature=70.0, vibration=2.0, pressure=100.0, machine_id="PUMP-A-01"):
+    return {"machine_id": machine_id, "timestamp": T0 + 60.0 * minute, "temperature": temperature,
+            "vibration": vibration, "pressure": pressure}
+
+
+def fill(history, minutes, machine_id="PUMP-A-01"):
+    for minute in minutes:
+        history.append(machine_id, reading(minute, temperature=60.0 + minute, vibration=2.0))
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("2025-08-01T00:01:00") == T0 + 60
+    assert parse_timestamp("2025-08-01T02:01:00+02:00") == T0 + 60
+    assert parse_timestamp(T0) == T0
+
+
+def test_ring_keeps_the_latest_readings_in_order():
+    history = SensorHistory(capacity=5)
+    fill(history, range(12))
+    timestamps, values = history.window("PUMP-A-01", minutes=60)
+    np.testing.assert_array_equal(timestamps, T0 + 60.0 * np.arange(7, 12))
+    np.testing.assert_array_equal(values[:, 0], 60.0 + np.arange(7, 12))
+    # Exactly at capacity, before wrapping.
+    history = SensorHistory(capacity=5)
+    fill(history, range(5))
+    np.testing.assert_array_equal(history.window("PUMP-A-01", minutes=60)[0], T0 + 60.0 * np.arange(5))
+
+
+def test_window_bounds():
+    history = SensorHistory(capacity=100)
+    fill(history, range(0, 30, 2))
+    timestamps, _ = history.window("PUMP-A-01", minutes=10)
+    np.testing.assert_array_equal(timestamps, T0 + 60.0 * np.arange(18, 30, 2))
+    # Ending earlier, both ends included.
+    timestamps, _ = history.window("PUMP-A-01", minutes=4, now=T0 + 60.0 * 10)
+    np.testing.assert_array_equal(timestamps, T0 + 60.0 * np.array([6, 8, 10]))
+    assert len(history.window("NO-SUCH-MACHINE", minutes=10)[0]) == 0
+
+
+def test_out_of_order_readings_are_rejected():
+    history = SensorHistory(capacity=10)
+    fill(history, [0, 5])
+    with pytest.raises(ValueError):
+        history.append("PUMP-A-01", reading(3))
+    assert not history.observe("PUMP-A-01", reading(3))
+    assert not history.observe("PUMP-A-01", reading(5))
+    assert history.observe("PUMP-A-01", reading(6))
+    timestamps, _ = history.window("PUMP-A-01", minutes=60)
+    assert list(np.diff(timestamps) > 0) == [True, True]
+    # Machines are independent.
+    history.append("MOTOR-B-02", reading(1))
+
+
+def test_aggregates():
+    history = SensorHistory(capacity=100)
+    fill(history, range(10))
+    aggregates = history.aggregates("PUMP-A-01", minutes=60, ewma_halflife_minutes=1e9)
+    assert aggregates["count"] == 10 and aggregates["window_minutes"] == 60
+    assert aggregates["temperature"] == {"mean": 64.5, "max": 69.0, "slope_per_minute": 1.0, "ewma": 64.5}
+    assert aggregates["vibration"]["slope_per_minute"] == 0.0
+    # A short half-life weighs the latest readings most.
+    assert 68.0 < history.aggregates("PUMP-A-01", minutes=60, ewma_halflife_minutes=0.5)["temperature"]["ewma"] < 69.0
+    assert history.aggregates("PUMP-A-01", minutes=60, now=T0 - 3600) == {"window_minutes": 60, "count": 0}
+    # One reading has no slope.
+    single = SensorHistory(capacity=10)
+    single.append("PUMP-A-01", reading(0))
+    assert single.aggregates("PUMP-A-01", 10)["temperature"]["slope_per_minute"] == 0.0
+
+
+def test_history_survives_a_restart(tmp_path):
+    history = SensorHistory(str(tmp_path), capacity=4)
+    fill(history, range(6))
+    history.flush()
+    reopened = SensorHistory(str(tmp_path), capacity=4)
+    np.testing.assert_array_equal(reopened.window("PUMP-A-01", 60)[0], T0 + 60.0 * np.arange(2, 6))
+    with pytest.raises(ValueError):
+        reopened.append("PUMP-A-01", reading(1))
+
+
+class HealthyPredictor:
+    def predict_batch(self, readings, explain=False):
+        return [{"maintenance_required": False, "failure_probability": 0.0} for _ in readings]
+
+
+def test_streaming_records_scored_readings(monkeypatch):
+    from factory_agents_v2 import sensor_history
+
+    history = SensorHistory(capacity=10)
+    monkeypatch.setattr(sensor_history, "_history", history)
+    readings = [reading(minute, machine_id=machine_id) for minute in range(3) for machine_id in ("A", "B")]
+    scorer = StreamingScorer(predictor=HealthyPredictor(), max_batch_delay=0.0)
+    asyncio.run(scorer.run(iterate_readings(readings + [reading(1, machine_id="A")])))
+    # The late duplicate is skipped.
+    for machine_id in ("A", "B"):
+        np.testing.assert_array_equal(history.window(machine_id, 60)[0], T0 + 60.0 * np.arange(3))
+
+    other = SensorHistory(capacity=10)
+    asyncio.run(StreamingScorer(predictor=HealthyPredictor(), history=other).run(iterate_readings(readings[:2])))
+    assert len(other.window("A", 60)[0]) == 1
+    asyncio.run(StreamingScorer(predictor=HealthyPredictor(), record_history=False).run(
+        iterate_readings([reading(5, machine_id="A")])))
+    assert len(history.window("A", 60)[0]) == 3
+
+
+def test_fetching_readings_records_them(shared_db, monkeypatch):
+    import json
+
+    from factory_agents_v2 import sensor_history
+    from factory_agents_v2.maintenance_agent import fetch_machine_readings
+
+    history = SensorHistory(capacity=10)
+    monkeypatch.setattr(sensor_history, "_history", history)
+    readings = json.loads(fetch_machine_readings("MOTOR-B-02"))
+    assert "aggregates" not in readings
+    assert len(history.window("MOTOR-B-02", 60)[0]) == 1
+    aggregates = json.loads(fetch_machine_readings("MOTOR-B-02", window_minutes=60))["aggregates"]
+    assert aggregates["count"] == 1 and aggregates["temperature"]["max"] == 92.3
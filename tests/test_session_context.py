@@ -0,0 +1,259 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+types = pytest.importorskip("google.genai.types")
+from google.adk.events.event import Event  # noqa: E402
+from google.adk.flows.llm_flows.contents import _convert_foreign_event  # noqa: E402
+
+from factory_agents_v2.session_context import (FOREIGN_PREFIX, SUMMARY_PREFIX, ContextCompactor,  # noqa: E402
+                                               compact_request, is_compacted, is_request, set_compactor,
+                                               summarize_episode, summary_text)
+from factory_agents_v2.session_service import CompactingSessionService  # noqa: E402
+
+ORCHESTRATOR = "OrchestratorAgent"
+INVENTORY = "InventoryAndResourceAgent"
+
+
+# --- Synthetic ADK contents ---
+
+def request(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def call(name, **args):
+    return types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))])
+
+
+def result(name, payload):
+    # Tools return JSON strings, which ADK wraps as {"result": ...}.
+    response = {"result": json.dumps(payload)} if not isinstance(payload, str) else {"result": payload}
+    return types.Content(role="user", parts=[types.Part(
+        function_response=types.FunctionResponse(name=name, response=response))])
+
+
+def reply(text):
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def foreign(author, content):
+    """Another agent's turn as ADK replays it to this one: a "For context:" user message."""
+    return _convert_foreign_event(Event(author=author, invocation_id="inv", content=content)).content
+
+
+DIAGNOSIS = {"machine_id": "MOTOR-B-02", "maintenance_required": True, "failure_probability": 0.93,
+             "issue_description": "High temperature of 92.3 C, high vibration of 8.7 mm/s"}
+LOGISTICS = {"status": "success", "part_id": "part-brg-001", "part_name": "Standard Bearing Assembly",
+             "technician_id": "tech-001", "technician_name": "Alice Johnson",
+             "reservation_ids": ["res-0123456789abcdef", "res-fedcba9876543210"]}
+
+
+def orchestrator_episode(machine_id="MOTOR-B-02"):
+    """A diagnosis with logistics resolved by the sub-agent, as the orchestrator's model sees it."""
+    diagnosis = dict(DIAGNOSIS, machine_id=machine_id)
+    return [
+        request(f"Run diagnostics on {machine_id}"),
+        call("get_machine_diagnosis", machine_id=machine_id),
+        result("get_machine_diagnosis", diagnosis),
+        call("transfer_to_agent", agent_name=INVENTORY),
+        result("transfer_to_agent", {}),
+        foreign(INVENTORY, call("resolve_maintenance_logistics", machine_id=machine_id,
+                                issue_description=diagnosis["issue_description"], required_skills=["Motor"])),
+        foreign(INVENTORY, types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            name="resolve_maintenance_logistics", response={"result": json.dumps(LOGISTICS)}))])),
+        foreign(INVENTORY, reply(json.dumps(LOGISTICS))),
+        call("send_email", receiver_email="maintenance@example.com", subject=f"Maintenance for {machine_id}",
+             body="..."),
+        result("send_email", {"status": "queued", "message_id": "msg-1"}),
+        reply(f"Maintenance for {machine_id} is scheduled with Alice Johnson."),
+    ]
+
+
+def healthy_episode(machine_id):
+    return [
+        request(f"Run diagnostics on {machine_id}"),
+        call("get_machine_diagnosis", machine_id=machine_id),
+        result("get_machine_diagnosis", {"machine_id": machine_id, "maintenance_required": False,
+                                         "failure_probability": 0.02}),
+        reply(f"Machine {machine_id} is healthy; no maintenance is required."),
+    ]
+
+
+def texts(contents):
+    return [part.text for content in contents for part in content.parts if part.text]
+
+
+# --- Episodes and summaries ---
+
+def test_is_request():
+    assert is_request(request("Run diagnostics on PUMP-A-01"))
+    assert not is_request(foreign(INVENTORY, reply("done")))
+    assert not is_request(result("get_machine_diagnosis", DIAGNOSIS))
+    assert not is_request(reply("Run diagnostics"))
+
+
+def test_summarize_episode_reads_own_and_replayed_steps():
+    assert summarize_episode(orchestrator_episode()) == {
+        "machine": "MOTOR-B-02", "maintenance_required": True, "failure_probability": 0.93,
+        "issue": DIAGNOSIS["issue_description"], "logistics": "success", "part": "part-brg-001",
+        "technician": "Alice Johnson", "alert": "queued",
+        "answer": "Maintenance for MOTOR-B-02 is scheduled with Alice Johnson.",
+    }
+
+
+def test_summarize_episode_as_the_sub_agent_sees_it():
+    # The sub-agent sees the orchestrator's turns replayed and its own steps as calls and results.
+    episode = [
+        request("Run diagnostics on MOTOR-B-02"),
+        foreign(ORCHESTRATOR, call("get_machine_diagnosis", machine_id="MOTOR-B-02")),
+        foreign(ORCHESTRATOR, types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            name="get_machine_diagnosis", response={"result": json.dumps(DIAGNOSIS)}))])),
+        call("resolve_maintenance_logistics", machine_id="MOTOR-B-02", issue_description="x",
+             required_skills=["Motor"]),
+        result("resolve_maintenance_logistics", {"status": "failure", "reason": "No matching part in stock"}),
+        reply(json.dumps({"status": "failure", "reason": "No matching part in stock"})),
+    ]
+    summary = summarize_episode(episode)
+    assert summary["machine"] == "MOTOR-B-02" and summary["failure_probability"] == 0.93
+    assert (summary["logistics"], summary["reason"]) == ("failure", "No matching part in stock")
+
+
+def test_summarize_episode_keeps_errors_and_shortens_answers():
+    episode = [request("Run diagnostics on NOPE"), call("get_machine_diagnosis", machine_id="NOPE"),
+               result("get_machine_diagnosis", {"error": "Machine NOPE not found"}), reply("x" * 500)]
+    summary = summarize_episode(episode)
+    assert summary["error"] == "Machine NOPE not found"
+    assert summary["machine"] == "NOPE"
+    assert summary["answer"] == "x" * 200 + "..."
+
+
+def test_summary_text_is_recognized_as_compacted():
+    text = summary_text(orchestrator_episode())
+    assert text.startswith(SUMMARY_PREFIX)
+    assert json.loads(text[len(SUMMARY_PREFIX):])["part"] == "part-brg-001"
+    assert is_compacted([request("Run diagnostics on MOTOR-B-02"), reply(text)])
+    # Also when another agent's summary is replayed.
+    assert is_compacted([request("Run diagnostics on MOTOR-B-02"), foreign(ORCHESTRATOR, reply(text))])
+    assert not is_compacted(orchestrator_episode())
+
+
+# --- Request compaction ---
+
+def test_compact_summarizes_completed_episodes_and_keeps_the_current_one():
+    current = orchestrator_episode("PUMP-A-01")[:3]
+    contents = orchestrator_episode("MOTOR-B-02") + healthy_episode("TURBINE-C-01") + current
+    before = [content.model_copy(deep=True) for content in contents]
+    compacted = ContextCompactor(tool_result_chars=10_000).compact(contents)
+
+    assert contents == before
+    assert len(compacted) == 2 + 2 + len(current)
+    assert texts(compacted[:2])[0] == "Run diagnostics on MOTOR-B-02"
+    assert json.loads(texts(compacted[1:2])[0][len(SUMMARY_PREFIX):])["technician"] == "Alice Johnson"
+    assert json.loads(texts(compacted[3:4])[0][len(SUMMARY_PREFIX):])["maintenance_required"] is False
+    assert compacted[4:] == current
+    # Compacting again changes nothing.
+    assert ContextCompactor(tool_result_chars=10_000).compact(compacted) == compacted
+
+
+def test_compact_keeps_the_most_recent_episodes():
+    contents = [c for i in range(5) for c in healthy_episode(f"M-{i}")] + [request("Run diagnostics on M-9")]
+    compacted = ContextCompactor(max_episodes=2).compact(contents)
+    assert [t for t in texts(compacted) if t.startswith("Run")] == [
+        "Run diagnostics on M-3", "Run diagnostics on M-4", "Run diagnostics on M-9"]
+    assert ContextCompactor(max_episodes=0).compact(contents) == [request("Run diagnostics on M-9")]
+
+
+def test_compact_drops_oldest_summaries_over_the_token_budget():
+    contents = [c for i in range(10) for c in healthy_episode(f"M-{i}")] + [request("Run diagnostics on M-9")]
+    full = ContextCompactor(max_tokens=1_000_000).compact(contents)
+    tight = ContextCompactor(max_tokens=150).compact(contents)
+    assert len(full) == 21
+    assert 1 < len(tight) < len(full)
+    assert len(tight) % 2 == 1 and tight[-1] == contents[-1]
+    # The newest completed episode is kept.
+    assert texts(tight)[-3] == "Run diagnostics on M-9"
+
+
+def test_current_episode_drops_replayed_transfers_and_cuts_long_results():
+    long_result = {"inventory": [{"id": f"part-{i}", "name": "x" * 20} for i in range(50)]}
+    transfer = types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": ORCHESTRATOR}))])
+    current = [
+        request("Run diagnostics on PUMP-A-01"),
+        foreign(INVENTORY, call("get_inventory", machine_type="Pump")),
+        foreign(INVENTORY, types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            name="get_inventory", response={"result": json.dumps(long_result)}))])),
+        foreign(INVENTORY, transfer),
+        call("get_machine_diagnosis", machine_id="PUMP-A-01"),
+        result("get_machine_diagnosis", long_result),
+    ]
+    compacted = ContextCompactor(tool_result_chars=100).compact(current)
+    # The replayed transfer is dropped with its now empty message; the agent's own result is untouched.
+    assert len(compacted) == len(current) - 1
+    replayed = texts(compacted[2:3])
+    assert replayed[0] == FOREIGN_PREFIX
+    assert replayed[1].endswith("... (truncated)") and len(replayed[1]) == 100 + len("... (truncated)")
+    assert compacted[-1] == current[-1]
+    assert not any("transfer_to_agent" in text for text in texts(compacted))
+
+
+def test_disabled_compactor_returns_contents_unchanged():
+    contents = orchestrator_episode() + [request("next")]
+    assert ContextCompactor(enabled=False).compact(contents) is contents
+
+
+def test_compact_request_rewrites_the_model_request():
+    contents = healthy_episode("M-1") + healthy_episode("M-2")
+    llm_request = SimpleNamespace(contents=list(contents))
+    set_compactor(ContextCompactor())
+    try:
+        assert compact_request(SimpleNamespace(agent_name=ORCHESTRATOR), llm_request) is None
+    finally:
+        set_compactor(None)
+    assert len(llm_request.contents) == 2 + len(healthy_episode("M-2"))
+    assert texts(llm_request.contents)[1].startswith(SUMMARY_PREFIX)
+
+
+# --- Opt-in compacting session storage ---
+
+def event(author, content, invocation):
+    return Event(author=author, invocation_id=invocation, content=content)
+
+
+def append_episode(service, session, machine_id, invocation):
+    service.append_event(session, event("user", request(f"Run diagnostics on {machine_id}"), invocation))
+    for content in healthy_episode(machine_id)[1:]:
+        author = "user" if content.role == "user" else ORCHESTRATOR
+        service.append_event(session, event(author, content, invocation))
+
+
+def stored(service, session):
+    return service.get_session(app_name=session.app_name, user_id=session.user_id, session_id=session.id)
+
+
+def test_compacting_session_service_stores_summaries():
+    service = CompactingSessionService(max_episodes=2)
+    session = service.create_session(app_name="factory", user_id="u")
+    for i in range(4):
+        append_episode(service, session, f"M-{i}", f"inv-{i}")
+
+    events = stored(service, session).events
+    # Two summarized episodes (request and summary), then the last episode whole.
+    assert len(events) == 2 * 2 + len(healthy_episode("M-3"))
+    assert [texts([e.content])[0] for e in events[:4:2]] == ["Run diagnostics on M-1", "Run diagnostics on M-2"]
+    summary = events[1]
+    assert summary.author == ORCHESTRATOR
+    assert texts([summary.content])[0].startswith(SUMMARY_PREFIX)
+    assert [e.content for e in events[4:]] == healthy_episode("M-3")
+    assert events == session.events
+
+
+def test_stock_session_service_keeps_full_history():
+    from google.adk.sessions import InMemorySessionService
+
+    service = InMemorySessionService()
+    session = service.create_session(app_name="factory", user_id="u")
+    for i in range(3):
+        append_episode(service, session, f"M-{i}", f"inv-{i}")
+    assert len(stored(service, session).events) == 3 * len(healthy_episode("M-0"))
@@ -0,0 +1,172 @@
+import csv
+
+import pytest
+
+from factory_agents_v2.sharding import ShardedStore, load_plants, qualify
+
+
+def machine(machine_id, kind):
+    return {"id": machine_id, "name": machine_id.title(), "type": kind, "status": "operational"}
+
+
+def part(part_id, quantity, *keywords, types=("Motor", "Pump")):
+    return {"id": part_id, "name": part_id.title(), "keywords": list(keywords) or ["bearing"], "quantity": quantity,
+            "location": "Bin 1", "applicable_machine_types": list(types)}
+
+
+def technician(tech_id, *skills, role="Maintenance Technician"):
+    return {"id": tech_id, "name": tech_id.title(), "role": role, "skills": list(skills),
+            "availability": "available", "current_assignment": None}
+
+
+PLANTS = {
+    "north": ([machine("MOTOR-N1", "Motor")], [part("part-brg", 0), part("part-belt", 3, "belt slipping")],
+              [technician("tech-1", "Motor")]),
+    "east": ([machine("PUMP-E1", "Pump")], [part("part-brg", 4), part("part-seal", 2, "seal leaking")],
+             [technician("tech-1", "Pump"), technician("tech-2", "Motor", "Pump")]),
+    "south": ([machine("MOTOR-S1", "Motor")], [part("part-brg", 6)],
+              [technician("tech-9", "Motor"), technician("op-1", "Motor", role="Machine Operator")]),
+}
+
+
+def loader(plant):
+    machines, inventory, technicians = PLANTS[plant]
+    return lambda store: store.load_records(machines=machines, inventory=inventory, human_resources=technicians)
+
+
+def directory(plant):
+    """What `load_plants` reads up front for a plant."""
+    machines, inventory, technicians = PLANTS[plant]
+    return {"machine_ids": [m["id"] for m in machines],
+            "keywords": [keyword for p in inventory for keyword in p["keywords"]],
+            "skills": [skill for tech in technicians for skill in tech["skills"]]}
+
+
+@pytest.fixture
+def plants(shard_factory):
+    db = ShardedStore(shard_factory=shard_factory)
+    for plant in PLANTS:
+        db.add_plant(plant, loader(plant), **directory(plant))
+    return db
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def test_qualify():
+    assert qualify("north", "tech-1") == "north:tech-1"
+    with pytest.raises(ValueError):
+        ShardedStore().add_plant("north:east")
+
+
+def test_machines_are_routed_without_loading_other_plants(plants):
+    assert plants.get_machine_ids() == ["MOTOR-N1", "PUMP-E1", "MOTOR-S1"]
+    assert plants.loaded_plants() == []
+    assert plants.get_machine_info("PUMP-E1")["plant"] == "east"
+    assert plants.loaded_plants() == ["east"]
+    assert plants.get_machine_info("NO-SUCH")["error"] == "Machine not found"
+    assert plants.loaded_plants() == ["east"]
+
+
+def test_machine_queries_are_answered_locally_first(plants):
+    north = plants.for_machine("MOTOR-N1")
+    assert ids(north.find_available_technicians(["Motor"])) == ["tech-1"]
+    assert ids(north.find_parts("belt slipping", "Motor")) == ["part-belt"]
+    assert plants.loaded_plants() == ["north"] and plants.fallbacks == 0
+    # The same local IDs in another plant are other records.
+    assert ids(plants.for_machine("PUMP-E1").find_available_technicians(["Pump"])) == ["tech-1", "tech-2"]
+
+
+def test_exhausted_plants_fall_back_to_the_next_plants(plants):
+    north = plants.for_machine("MOTOR-N1")
+    # North's bearing is out of stock; east, the next plant, has it.
+    assert ids(north.find_parts("bearing noise", "Motor")) == [qualify("east", "part-brg")]
+    reservation = north.reserve_part(qualify("east", "part-brg"), machine_id="MOTOR-N1")
+    assert reservation["status"] == "held" and reservation["reservation_id"].startswith("east:")
+    assert next(p for p in plants.shard("east").get_inventory() if p["id"] == "part-brg")["quantity"] == 3
+    assert plants.release_reservation(reservation["reservation_id"])["status"] == "released"
+    assert next(p for p in plants.shard("east").get_inventory() if p["id"] == "part-brg")["quantity"] == 4
+
+    assert north.assign_technician("tech-1", "MOTOR-N1")["status"] == "held"
+    assert ids(north.find_available_technicians(["Motor"])) == [qualify("east", "tech-2")]
+    assert plants.fallbacks == 2
+
+
+def test_fallbacks_skip_plants_that_cannot_match(plants):
+    south = plants.for_machine("MOTOR-S1")
+    south.assign_technician("tech-9", "MOTOR-S1")
+    # South's operator does not count; north, the next plant, has motor staff.
+    assert ids(south.find_available_technicians(["Motor"])) == [qualify("north", "tech-1")]
+    # Only east stocks seals: north is never loaded to look.
+    plants = ShardedStore(shard_factory=plants.shard_factory)
+    for plant in PLANTS:
+        plants.add_plant(plant, loader(plant), **directory(plant))
+    assert ids(plants.for_machine("MOTOR-S1").find_parts("seal leaking")) == [qualify("east", "part-seal")]
+    assert plants.loaded_plants() == ["east", "south"]
+
+
+def test_neighbors_and_fallback_limit(shard_factory):
+    db = ShardedStore(shard_factory=shard_factory, max_fallback_plants=1)
+    for plant in PLANTS:
+        db.add_plant(plant, loader(plant), neighbors=["south", "east"] if plant == "north" else None,
+                     **directory(plant))
+    assert db.fallback_order("north") == ["south"]
+    assert db.fallback_order("east") == ["south"]
+    assert db.fallback_order("south") == ["north"]
+    north = db.for_plant("north")
+    north.assign_technician("tech-1", "MOTOR-N1")
+    assert ids(north.find_available_technicians(["Motor"])) == [qualify("south", "op-1"), qualify("south", "tech-9")]
+    db.shard("south").assign_technician("tech-9", "MOTOR-S1")
+    # East, outside the limit, is not searched.
+    assert north.find_available_technicians(["Motor"]) == []
+    # Without fallback a view only ever answers from its plant.
+    assert ids(db.for_plant("north", fallback=False).find_parts("bearing")) == ["part-brg"]
+
+
+def test_global_searches_load_only_plants_that_can_match(plants):
+    assert ids(plants.find_parts("seal leaking")) == [qualify("east", "part-seal")]
+    assert plants.loaded_plants() == ["east"]
+    assert ids(plants.find_available_technicians(["Pump"])) == [qualify("east", "tech-1"), qualify("east", "tech-2")]
+    assert plants.loaded_plants() == ["east"]
+    assert plants.find_parts("strange smell") == []
+    assert plants.loaded_plants() == ["east"]
+    # Bearings are everywhere; in-stock parts rank first.
+    assert ids(plants.find_parts("bearing", limit=None)) == [
+        qualify("east", "part-brg"), qualify("south", "part-brg"), qualify("north", "part-brg")]
+
+
+def test_plants_without_a_directory_are_loaded_to_search(shard_factory):
+    db = ShardedStore(shard_factory=shard_factory)
+    for plant in PLANTS:
+        db.add_plant(plant, loader(plant))
+    assert ids(db.find_parts("seal leaking")) == [qualify("east", "part-seal")]
+    assert db.loaded_plants() == list(PLANTS)
+    # Once loaded, their directory is known.
+    assert db.may_match_parts("north", "belt slipping") and not db.may_match_parts("south", "belt slipping")
+
+
+def write_plants(root):
+    for plant, (machines, inventory, technicians) in PLANTS.items():
+        directory = root / plant
+        directory.mkdir()
+        for table, records in (("machines", machines), ("inventory", inventory), ("human_resources", technicians)):
+            with open(directory / f"{table}.csv", "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(records[0]))
+                writer.writeheader()
+                for record in records:
+                    writer.writerow({key: ";".join(value) if isinstance(value, list) else value
+                                     for key, value in record.items()})
+
+
+def test_load_plants_reads_the_directory_up_front(tmp_path, monkeypatch):
+    write_plants(tmp_path)
+    (tmp_path / "empty").mkdir()
+    monkeypatch.setenv("FACTORY_FALLBACK_PLANTS", "1")
+    db = load_plants(str(tmp_path))
+    assert db.plants == ["east", "empty", "north", "south"] and db.max_fallback_plants == 1
+    assert db.get_machine_ids() == ["PUMP-E1", "MOTOR-N1", "MOTOR-S1"]
+    assert ids(db.find_parts("belt slipping")) == [qualify("north", "part-belt")]
+    assert ids(db.find_available_technicians(["Motor", "Pump"])) == [qualify("east", "tech-2")]
+    assert db.loaded_plants() == ["east", "north"]
+    assert db.get_machine_details("MOTOR-S1") is not None and db.loaded_plants() == ["east", "north", "south"]
@@ -0,0 +1,14 @@
+import pytest
+
+from benchmarks.bench_startup import HEAVY_MODULES, STEPS, run_step
+
+# Same budget as `python -m benchmarks.bench_startup --budget 1.0`; the lazy import takes ~0.1s.
+IMPORT_BUDGET_SECONDS = 1.0
+
+
+@pytest.mark.parametrize("step", ["import_package", "import_tool"])
+def test_import_is_lazy(step):
+    # A fresh interpreter per run, with FACTORY_WARMUP=0 so no warm-up thread imports anything.
+    result = run_step(STEPS[step], runs=3)
+    assert result["imported"] == [], f"{step} imported {result['imported']} (checked: {HEAVY_MODULES})"
+    assert result["min_seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,225 @@
+import csv
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.synthetic import KEYWORDS, MACHINE_TYPES, generate_factory
+from factory_agents_v2.sqlite_store import SQLiteStore
+from factory_agents_v2.storage import load_csv, seed_sample_data, tokenize
+
+ISSUES = [
+    ("bearing vibration grinding noise", None),
+    ("High vibration and grinding noise", "Gearbox"),
+    ("overheating filter clogged", None),
+    ("Seal leaking, fluid loss", "Pump"),
+    ("seal leak", "Compressor"),
+    ("nothing matches this", None),
+    ("", None),
+]
+SKILLS = [["Motor"], ["Pump", "Motor"], ["Gearbox"], ["HVAC"], ["Robotics", "HVAC"], [], ["Welding"]]
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def test_machine_lookups_match(stores):
+    mock, sqlite = stores["mock"], stores["sqlite"]
+    assert mock.get_machine_ids() == sqlite.get_machine_ids()
+    for machine_id in mock.get_machine_ids() + ["NO-SUCH-MACHINE"]:
+        assert mock.get_machine_details(machine_id) == sqlite.get_machine_details(machine_id)
+        assert mock.get_machine_info(machine_id) == sqlite.get_machine_info(machine_id)
+
+
+@pytest.mark.parametrize("issue_text,machine_type", ISSUES)
+@pytest.mark.parametrize("limit", [None, 1, 10])
+def test_find_parts_match(stores, issue_text, machine_type, limit):
+    assert (stores["mock"].find_parts(issue_text, machine_type, limit)
+            == stores["sqlite"].find_parts(issue_text, machine_type, limit))
+
+
+@pytest.mark.parametrize("skills", SKILLS)
+def test_find_available_technicians_match(stores, skills):
+    assert stores["mock"].find_available_technicians(skills) == stores["sqlite"].find_available_technicians(skills)
+
+
+def test_listings_match(stores):
+    mock, sqlite = stores["mock"], stores["sqlite"]
+    for machine_type in (None, "Pump", "Gearbox"):
+        for in_stock_only in (False, True):
+            assert mock.get_inventory(machine_type, in_stock_only) == sqlite.get_inventory(machine_type, in_stock_only)
+    for available_only in (False, True):
+        for assignable_only in (False, True):
+            assert (mock.get_technicians(available_only, assignable_only)
+                    == sqlite.get_technicians(available_only, assignable_only))
+
+
+def test_machine_lookups(store):
+    details = store.get_machine_details("MOTOR-B-02")
+    assert details["temperature"] == 92.3 and details["vibration"] == 8.7
+    assert store.get_machine_info("MOTOR-B-02")["type"] == "Motor"
+    assert "error" in store.get_machine_details("NO-SUCH-MACHINE")
+    assert "error" in store.get_machine_info("NO-SUCH-MACHINE")
+
+
+def test_find_parts_ranks_in_stock_matches_first(store):
+    # The out-of-stock gear set matches "grinding" too, but is ranked after the bearing.
+    assert ids(store.find_parts("bearing vibration grinding noise")) == ["part-brg-001", "part-gr-set-007"]
+    assert ids(store.find_parts("Seal leaking, fluid loss", "Pump")) == ["part-pmp-seal-004"]
+    assert store.find_parts("nothing matches this") == []
+
+
+def test_find_available_technicians_skips_busy_staff_and_operators(store):
+    assert ids(store.find_available_technicians(["Motor"])) == ["tech-001", "tech-003"]
+    assert ids(store.find_available_technicians(["Pump", "Motor"])) == ["tech-001"]
+    assert store.find_available_technicians(["HVAC"]) == []
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    inventory = tmp_path / "inventory.csv"
+    with open(inventory, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "keywords", "quantity", "location", "applicable_machine_types"])
+        writer.writerow(["part-cpl-100", "Flexible Coupling", "coupling; misalignment;vibration", "4", "Bin 9",
+                         "Motor;Pump"])
+        writer.writerow(["part-brg-001", "Standard Bearing Assembly", "bearing;noise", "0", "Bin 3", "Motor"])
+    technicians = tmp_path / "technicians.csv"
+    with open(technicians, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "role", "skills", "availability", "current_assignment"])
+        writer.writerow(["tech-100", "Frank Moore", "Maintenance Technician", "Motor;Pump", "available", ""])
+        writer.writerow(["tech-001", "Alice Johnson", "Maintenance Technician", "Pump", "busy", "PUMP-A-01"])
+    return {"inventory": str(inventory), "human_resources": str(technicians)}
+
+
+def test_load_csv_matches(stores, csv_files):
+    for store in stores.values():
+        assert load_csv(store, "inventory", csv_files["inventory"]) == 2
+        assert load_csv(store, "human_resources", csv_files["human_resources"]) == 2
+    mock, sqlite = stores["mock"], stores["sqlite"]
+    assert mock.get_inventory() == sqlite.get_inventory()
+    assert mock.get_technicians() == sqlite.get_technicians()
+    for issue_text, machine_type in ISSUES + [("misalignment and vibration", "Pump")]:
+        assert mock.find_parts(issue_text, machine_type) == sqlite.find_parts(issue_text, machine_type)
+    for skills in SKILLS:
+        assert mock.find_available_technicians(skills) == sqlite.find_available_technicians(skills)
+
+
+def test_load_csv(store, csv_files):
+    load_csv(store, "inventory", csv_files["inventory"])
+    load_csv(store, "human_resources", csv_files["human_resources"])
+    coupling = next(part for part in store.get_inventory() if part["id"] == "part-cpl-100")
+    assert coupling["keywords"] == ["coupling", "misalignment", "vibration"]
+    assert coupling["quantity"] == 4
+    assert coupling["applicable_machine_types"] == ["Motor", "Pump"]
+    assert ids(store.find_parts("misalignment and vibration", "Pump")) == ["part-cpl-100"]
+    # Loading replaces records by ID, in place: the bearing is now out of stock and Alice is busy.
+    assert ids(store.get_inventory())[0] == "part-brg-001"
+    assert "part-brg-001" not in ids(store.get_inventory(in_stock_only=True))
+    assert ids(store.find_parts("vibration", "Pump")) == ["part-cpl-100"]
+    assert ids(store.find_available_technicians(["Pump"])) == ["tech-100"]
+    assert next(t for t in store.get_technicians() if t["id"] == "tech-100")["current_assignment"] is None
+
+
+def test_load_csv_rejects_unknown_table(store, csv_files):
+    with pytest.raises(ValueError):
+        load_csv(store, "machines_typo", csv_files["inventory"])
+
+
+def test_empty_store(empty_store):
+    assert empty_store.get_machine_ids() == []
+    assert empty_store.find_parts("bearing vibration") == []
+    assert empty_store.find_available_technicians(["Motor"]) == []
+
+
+def test_sqlite_pool_drops_connections_of_finished_threads(tmp_path):
+    store = SQLiteStore(str(tmp_path / "pool.db"))
+    seed_sample_data(store)
+    results = []
+    for _ in range(20):
+        thread = threading.Thread(target=lambda: results.append(store.get_machine_ids()))
+        thread.start()
+        thread.join()
+    # This thread's and the last finished thread's, which the next new thread will close.
+    assert len(store._connections) == 2
+    with ThreadPoolExecutor(4) as pool:
+        results.extend(pool.map(lambda _: store.get_machine_ids(), range(40)))
+        assert len(store._connections) <= 1 + 4 + 1
+    assert all(ids == store.get_machine_ids() for ids in results)
+    store.close()
+    assert store._connections == []
+
+
+# --- Index lookups against a linear scan of the records ---
+
+def scan_parts(inventory, issue_text, machine_type=None, limit=10):
+    """`find_parts` the slow way: every part, every keyword."""
+    text = " " + " ".join(tokenize(issue_text)) + " "
+    matches = []
+    for part in inventory:
+        if machine_type and machine_type.lower() not in [t.lower() for t in part["applicable_machine_types"]]:
+            continue
+        phrases = sorted({phrase for phrase in (" ".join(tokenize(keyword)) for keyword in part["keywords"])
+                          if phrase and f" {phrase} " in text})
+        if phrases:
+            matches.append((-len(phrases), part["quantity"] <= 0, part["id"], phrases))
+    return [(part_id, phrases) for _, _, part_id, phrases in sorted(matches)[:limit]]
+
+
+def scan_technicians(technicians, skills):
+    return sorted(tech["id"] for tech in technicians if tech["availability"] == "available"
+                  and all(skill.lower() in [s.lower() for s in tech["skills"]] for skill in skills))
+
+
+@pytest.fixture
+def synthetic_store(empty_store):
+    empty_store.load_records(**generate_factory(50, 2000, 200, seed=5))
+    return empty_store
+
+
+def synthetic_issues():
+    rng = random.Random(7)
+    issues = [(" and ".join(rng.sample(KEYWORDS, rng.randint(1, 4))).upper(), rng.choice(MACHINE_TYPES + [None]))
+              for _ in range(40)]
+    return issues + ISSUES + [("grinding, grinding noise", "Motor")]
+
+
+def assert_indexes_match_a_scan(store):
+    inventory, technicians = store.get_inventory(), store.get_technicians()
+    for issue_text, machine_type in synthetic_issues():
+        expected = scan_parts(inventory, issue_text, machine_type, limit=None)
+        for limit in (1, 10, None):
+            found = [(part["id"], part["matched_keywords"]) for part in store.find_parts(issue_text, machine_type, limit)]
+            assert found == expected[:limit], (issue_text, machine_type, limit)
+    for skills in SKILLS + [[kind] for kind in MACHINE_TYPES] + [["motor", "PUMP"]]:
+        assert ids(store.find_available_technicians(skills)) == scan_technicians(technicians, skills)
+    for machine_type in MACHINE_TYPES + [None]:
+        for in_stock_only in (False, True):
+            expected = sorted(part["id"] for part in inventory if (
+                (not machine_type or machine_type in part["applicable_machine_types"])
+                and (not in_stock_only or part["quantity"] > 0)))
+            assert sorted(ids(store.get_inventory(machine_type, in_stock_only))) == expected
+    assert ids(store.get_technicians(available_only=True)) == sorted(
+        tech["id"] for tech in technicians if tech["availability"] == "available")
+
+
+def test_indexed_lookups_match_a_linear_scan(synthetic_store):
+    assert_indexes_match_a_scan(synthetic_store)
+
+
+def test_indexes_follow_reservations_and_reloads(synthetic_store):
+    # Empty a few parts and take a few technicians, then replace some records outright.
+    in_stock = [part for part in synthetic_store.get_inventory(in_stock_only=True)][:30]
+    for part in in_stock:
+        synthetic_store.reserve_part(part["id"], part["quantity"], confirm=True)
+    for tech in synthetic_store.get_technicians(available_only=True, assignable_only=True)[:20]:
+        synthetic_store.assign_technician(tech["id"], "PUMP-000000", confirm=True)
+    synthetic_store.load_records(
+        inventory=[dict(part, keywords=["coupling", "misalignment"], quantity=3) for part in in_stock[:5]],
+        human_resources=[dict(tech, availability="available", skills=["Welding"])
+                         for tech in synthetic_store.get_technicians()[:5]])
+    assert_indexes_match_a_scan(synthetic_store)
+    assert ids(synthetic_store.find_parts("misalignment"))[:5] == sorted(part["id"] for part in in_stock[:5])
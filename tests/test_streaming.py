@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from factory_agents_v2.streaming import StreamingScorer, iterate_readings
+
+
+class ThresholdPredictor:
+    """Flags readings hotter than 80 degrees, records batch sizes and rejects readings without a temperature."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict_batch(self, readings, explain=False):
+        self.batches.append(len(readings))
+        time.sleep(self.delay)
+        return [{"maintenance_required": reading["temperature"] > 80, "failure_probability": 0.5}
+                for reading in readings]
+
+
+def reading(machine_id, temperature=70.0):
+    return {"machine_id": machine_id, "temperature": temperature, "vibration": 2.0, "pressure": 100.0}
+
+
+def scorer(predictor, **kwargs):
+    return StreamingScorer(predictor=predictor, record_history=False, **kwargs)
+
+
+def run(scorer, source):
+    return asyncio.run(scorer.run(source))
+
+
+def test_readings_are_scored_in_micro_batches():
+    predictor = ThresholdPredictor()
+    metrics = run(scorer(predictor, batch_size=4), iterate_readings([reading("A")] * 10))
+    assert predictor.batches == [4, 4, 2]
+    assert (metrics["readings_received"], metrics["readings_scored"], metrics["batches"]) == (10, 10, 3)
+    assert metrics["mean_batch_size"] == 10 / 3
+
+
+def test_a_partial_batch_is_scored_after_the_delay():
+    async def trickle():
+        yield reading("A")
+        yield reading("B")
+        await asyncio.sleep(0.2)
+        yield reading("C")
+
+    predictor = ThresholdPredictor()
+    run(scorer(predictor, batch_size=100, max_batch_delay=0.02), trickle())
+    assert predictor.batches == [2, 1]
+
+
+def test_a_full_queue_pauses_the_source():
+    def lagging_source(stream, lag):
+        # Records how many readings the source is ahead of the scorer each time it is asked for one.
+        async def source():
+            for _ in range(30):
+                lag.append(stream.metrics.readings_received - stream.metrics.readings_scored)
+                yield reading("A")
+        return source()
+
+    bounded, bounded_lag = scorer(ThresholdPredictor(delay=0.005), batch_size=2, queue_size=3), []
+    run(bounded, lagging_source(bounded, bounded_lag))
+    # At most a full queue plus the batch being scored.
+    assert max(bounded_lag) <= 3 + 2
+    assert bounded.metrics.readings_scored == 30
+
+    unbounded, unbounded_lag = scorer(ThresholdPredictor(delay=0.005), batch_size=2, queue_size=1000), []
+    run(unbounded, lagging_source(unbounded, unbounded_lag))
+    assert max(unbounded_lag) > 20
+
+
+def test_alerts_fire_only_when_a_machine_turns_unhealthy():
+    alerts = []
+
+    async def on_alert(alert):
+        alerts.append(alert)
+
+    temperatures = {"A": [70, 90, 95, 70, 85], "B": [90, 90], "C": [60, 65]}
+    readings = [reading(machine_id, t) for machine_id, ts in temperatures.items() for t in ts]
+    stream = scorer(ThresholdPredictor(), on_alert=on_alert, batch_size=3)
+    metrics = run(stream, iterate_readings(readings))
+    assert [(alert["machine_id"], alert["readings"]["temperature"]) for alert in alerts] == [
+        ("A", 90), ("A", 85), ("B", 90)]
+    assert metrics["alerts"] == 3
+    assert stream.state == {"A": True, "B": True, "C": False}
+
+    # The state carries over to the next run: a machine still unhealthy is not alerted again.
+    alerts.clear()
+    run(stream, iterate_readings([reading("B", 99), reading("C", 99)]))
+    assert [alert["machine_id"] for alert in alerts] == ["C"]
+
+
+def test_a_malformed_reading_only_drops_itself():
+    predictor = ThresholdPredictor()
+    readings = [reading("A", 90), {"machine_id": "B"}, reading("C", 90)]
+    alerts = []
+    metrics = run(scorer(predictor, on_alert=alerts.append), iterate_readings(readings))
+    assert predictor.batches == [3, 1, 1, 1]
+    assert [alert["machine_id"] for alert in alerts] == ["A", "C"]
+    assert (metrics["readings_scored"], metrics["errors"]) == (2, 1)
+
+
+def test_a_failing_source_still_scores_what_it_delivered():
+    async def failing():
+        yield reading("A", 90)
+        yield reading("B", 90)
+        raise ConnectionError("sensor gateway went away")
+
+    alerts = []
+    stream = scorer(ThresholdPredictor(), on_alert=alerts.append)
+    with pytest.raises(ConnectionError):
+        run(stream, failing())
+    assert [alert["machine_id"] for alert in alerts] == ["A", "B"]
+    assert stream.metrics.errors == 1
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from factory_agents_v2 import telemetry
+from factory_agents_v2.telemetry import SpanExporter, add_exporter, agent_callbacks, remove_exporter
+
+
+class Context:
+    """Stands in for ADK's callback context."""
+
+    def __init__(self, invocation_id, agent_name="OrchestratorAgent"):
+        self.invocation_id = invocation_id
+        self.agent_name = agent_name
+        self.state = {}
+        self._invocation_context = self
+
+
+class Collect(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("TELEMETRY_PROFILE", "1")
+    monkeypatch.setenv("TELEMETRY_PROFILE_DIR", str(tmp_path))
+    exporter = Collect()
+    add_exporter(exporter)
+    yield exporter
+    remove_exporter(exporter)
+    telemetry._running.clear()
+
+
+callbacks = agent_callbacks()
+before, after = callbacks["before_agent_callback"], callbacks["after_agent_callback"]
+
+
+def profiles(exporter):
+    return {span["invocation_id"]: (os.path.basename(span["profile"]), span["profile_scope"])
+            for span in exporter.spans if "profile" in span}
+
+
+def test_a_lone_request_is_profiled(profiling):
+    request, sub_agent = Context("inv-1"), Context("inv-1", "InventoryAndResourceAgent")
+    before(request)
+    before(sub_agent)
+    after(sub_agent)
+    after(request)
+    assert profiles(profiling) == {"inv-1": ("inv-1.prof", "invocation")}
+    assert os.path.exists(profiling.spans[-1]["profile"])
+
+
+def test_requests_that_overlap_are_labelled_loop_wide(profiling):
+    first, second = Context("inv-1"), Context("inv-2")
+    before(first)
+    # The second request starts while the first runs: it is not profiled, and the first one's profile
+    # now also covers the second one's work on the loop.
+    before(second)
+    after(first)
+    after(second)
+    assert profiles(profiling) == {"inv-1": ("inv-1.loop.prof", "loop")}
+
+    # Each request on its own again gets its own profile.
+    third = Context("inv-3")
+    before(third)
+    after(third)
+    assert profiles(profiling)["inv-3"] == ("inv-3.prof", "invocation")
+
+
+def test_a_request_that_starts_during_another_is_not_profiled(profiling, monkeypatch):
+    first, second = Context("inv-1"), Context("inv-2")
+    monkeypatch.setenv("TELEMETRY_PROFILE", "")
+    before(first)
+    monkeypatch.setenv("TELEMETRY_PROFILE", "1")
+    before(second)
+    after(second)
+    after(first)
+    assert profiles(profiling) == {}
+    assert [span["invocation_id"] for span in profiling.spans] == ["inv-2", "inv-1"]